@@ -294,11 +294,11 @@ const CampaignsPage = () => {
             style={{ marginTop: 20 }}
           />
 
-          {pagination.totalCampaigns > 0 && (
+          {pagination.pagedTotal > 0 && (
             <Pagination
                 current={pagination.currentPage}
                 pageSize={pagination.pageSize}
-                total={pagination.totalCampaigns}
+                total={pagination.pagedTotal}
                 onChange={handlePaginationChange}
                 showSizeChanger
                 style={{ marginTop: 20, textAlign: 'right' }}
@@ -250,7 +250,7 @@ const ContactsPage = () => {
           />
           {error && <Alert message="Page Error" description={typeof error === 'object' ? JSON.stringify(error) : error} type="error" showIcon closable style={{ marginBottom: 16 }} />}
           <Table columns={columns} dataSource={contacts} rowKey="id" loading={isLoading} pagination={false} scroll={{ x: 1000 }} style={{ marginTop: 20 }}/>
-          <Pagination current={pagination.currentPage} pageSize={pagination.pageSize} total={pagination.totalContacts} onChange={handlePaginationChange} showSizeChanger onShowSizeChange={handlePaginationChange} style={{ marginTop: 20, textAlign: 'right' }} disabled={isLoading}/>
+          <Pagination current={pagination.currentPage} pageSize={pagination.pageSize} total={pagination.pagedTotal} onChange={handlePaginationChange} showSizeChanger onShowSizeChange={handlePaginationChange} style={{ marginTop: 20, textAlign: 'right' }} disabled={isLoading}/>
         </Card>
       </Content>
 
@@ -301,7 +301,13 @@ const ContactsPage = () => {
             />
           </div>
         )}
-         {uploadStatus.isLoading && <Text>Upload in progress, please wait...</Text>}
+         {uploadStatus.isLoading && (
+            <Text>
+              {uploadStatus.jobId
+                ? `Importing in the background, ${uploadStatus.rowsProcessed} rows processed so far...`
+                : 'Upload in progress, please wait...'}
+            </Text>
+         )}
          {!uploadStatus.isLoading && uploadStatus.error && !uploadStatus.errorDetails && ( // General error not covered by details
             <Alert message={uploadStatus.error} type="error" showIcon style={{marginTop: 10}}/>
          )}
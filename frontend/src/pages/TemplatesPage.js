@@ -131,11 +131,11 @@ const TemplatesPage = () => {
             style={{ marginTop: 20 }}
           />
 
-          {pagination.totalTemplates > 0 && (
+          {pagination.pagedTotal > 0 && (
             <Pagination
                 current={pagination.currentPage}
                 pageSize={pagination.pageSize}
-                total={pagination.totalTemplates}
+                total={pagination.pagedTotal}
                 onChange={handlePaginationChange}
                 showSizeChanger
                 onShowSizeChange={handlePaginationChange} // Antd calls onChange with (current, size)
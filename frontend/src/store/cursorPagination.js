@@ -0,0 +1,48 @@
+// Helpers for the cursor-paginated list endpoints (contacts, campaigns, templates).
+// The API answers `{ next, results }`: `next` is the URL of the following page with a
+// `?cursor=` parameter, or null on the last page. There is no total count and no `page`
+// parameter, so the slices remember the cursor of every page visited so far
+// (`cursors[n - 1]` loads page n) and the page links reach at most one page past them.
+
+export const initialCursorPagination = (pageSize = 10) => ({
+  currentPage: 1,
+  pageSize,
+  cursors: [null], // Page 1 has no cursor
+  hasNext: false,
+  pagedTotal: 0, // Rows the page links can reach: loaded pages plus one more when `next` is set
+});
+
+// Forgets the cursors, e.g. when the page size, search term or filters change.
+export const resetCursorPagination = (pagination) => {
+  pagination.currentPage = 1;
+  pagination.cursors = [null];
+  pagination.hasNext = false;
+};
+
+// Query params for `page`: its cursor if known, otherwise page 1.
+export const cursorPageParams = (pagination, page, pageSize) => {
+  const params = new URLSearchParams();
+  const known = pageSize === pagination.pageSize && page - 1 < pagination.cursors.length;
+  const cursor = known ? pagination.cursors[page - 1] : null;
+  params.append('page_size', pageSize);
+  if (cursor) params.append('cursor', cursor);
+  return { params, page: known ? page : 1 };
+};
+
+const cursorFromNext = (next) => {
+  if (!next) return null;
+  return new URL(next, window.location.origin).searchParams.get('cursor');
+};
+
+// Stores a fetched page: `payload` is `{ next, results, currentPage, pageSize }`.
+export const applyCursorPage = (pagination, payload) => {
+  const { next, results, currentPage, pageSize } = payload;
+  if (pageSize !== pagination.pageSize) pagination.cursors = [null];
+  const nextCursor = cursorFromNext(next);
+  pagination.cursors = pagination.cursors.slice(0, currentPage);
+  if (nextCursor) pagination.cursors.push(nextCursor);
+  pagination.currentPage = currentPage;
+  pagination.pageSize = pageSize;
+  pagination.hasNext = Boolean(nextCursor);
+  pagination.pagedTotal = (currentPage - 1) * pageSize + results.length + (nextCursor ? pageSize : 0);
+};
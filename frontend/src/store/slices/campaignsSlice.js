@@ -1,5 +1,6 @@
 import { createSlice, createAsyncThunk } from '@reduxjs/toolkit';
 import apiClient from '../../services/api';
+import { initialCursorPagination, resetCursorPagination, cursorPageParams, applyCursorPage } from '../cursorPagination';
 
 const getErrorMessage = (error) => {
   return error.response?.data?.detail || error.response?.data?.error || error.response?.data?.message || error.message || 'An unexpected error occurred.';
@@ -15,14 +16,7 @@ const initialWizardData = {
 
 const initialState = {
   campaigns: [],
-  pagination: {
-    currentPage: 1,
-    totalPages: 1,
-    totalCampaigns: 0,
-    pageSize: 10,
-    next: null,
-    previous: null,
-  },
+  pagination: initialCursorPagination(10),
   currentCampaign: null,
   isLoading: false,
   isSubmitting: false,
@@ -42,17 +36,15 @@ const initialState = {
 // Async Thunks (existing thunks like fetchCampaigns, createCampaign etc. remain the same)
 export const fetchCampaigns = createAsyncThunk( /* ... existing code ... */
   'campaigns/fetchCampaigns',
-  async ({ page = 1, pageSize = 10, search = '', filters = {} } = {}, { rejectWithValue }) => {
+  async ({ page = 1, pageSize = 10, search = '', filters = {} } = {}, { getState, rejectWithValue }) => {
     try {
-      const params = new URLSearchParams();
-      params.append('page', page);
-      params.append('page_size', pageSize);
+      const { params, page: loadedPage } = cursorPageParams(getState().campaigns.pagination, page, pageSize);
       if (search) params.append('search', search);
       Object.entries(filters).forEach(([key, value]) => {
         if (value) params.append(key, value);
       });
       const response = await apiClient.get(`/campaigns/campaigns/?${params.toString()}`);
-      return { ...response.data, currentPage: page, pageSize };
+      return { ...response.data, currentPage: loadedPage, pageSize };
     } catch (error) {
       return rejectWithValue(getErrorMessage(error));
     }
@@ -163,9 +155,9 @@ const campaignsSlice = createSlice({
   reducers: {
     // Existing reducers (setCampaignsCurrentPage, etc.)
     setCampaignsCurrentPage(state, action) { state.pagination.currentPage = action.payload; },
-    setCampaignsPageSize(state, action) { state.pagination.pageSize = action.payload; state.pagination.currentPage = 1;},
-    setCampaignsSearchTerm(state, action) { state.searchTerm = action.payload; state.pagination.currentPage = 1; },
-    setCampaignsFilters(state, action) { state.filters = { ...state.filters, ...action.payload }; state.pagination.currentPage = 1; },
+    setCampaignsPageSize(state, action) { state.pagination.pageSize = action.payload; resetCursorPagination(state.pagination); },
+    setCampaignsSearchTerm(state, action) { state.searchTerm = action.payload; resetCursorPagination(state.pagination); },
+    setCampaignsFilters(state, action) { state.filters = { ...state.filters, ...action.payload }; resetCursorPagination(state.pagination); },
     clearCurrentCampaign(state) { state.currentCampaign = null; },
     setWizardStep(state, action) { state.wizardState.currentStep = action.payload; },
     updateWizardData(state, action) { state.wizardState.campaignData = { ...state.wizardState.campaignData, ...action.payload };},
@@ -214,15 +206,7 @@ const campaignsSlice = createSlice({
       .addCase(fetchCampaigns.fulfilled, (state, action) => { /* ... */
         state.isLoading = false;
         state.campaigns = action.payload.results;
-        state.pagination = {
-          ...state.pagination,
-          totalCampaigns: action.payload.count,
-          next: action.payload.next,
-          previous: action.payload.previous,
-          currentPage: action.payload.currentPage,
-          pageSize: action.payload.pageSize,
-          totalPages: Math.ceil(action.payload.count / action.payload.pageSize),
-        };
+        applyCursorPage(state.pagination, action.payload);
       })
       .addCase(fetchCampaigns.rejected, handleRejected)
       .addCase(fetchCampaignById.pending, handlePending)
@@ -247,7 +231,7 @@ const campaignsSlice = createSlice({
       .addCase(deleteCampaign.fulfilled, (state, action) => { /* ... */
         state.isSubmitting = false;
         state.campaigns = state.campaigns.filter(c => c.id !== action.payload);
-        state.pagination.totalCampaigns -= 1;
+        state.pagination.pagedTotal -= 1;
       })
       .addCase(deleteCampaign.rejected, handleRejected)
       .addCase(sendCampaignNow.pending, handleSubmitPending)
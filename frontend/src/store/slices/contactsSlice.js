@@ -1,5 +1,6 @@
 import { createSlice, createAsyncThunk } from '@reduxjs/toolkit';
 import apiClient from '../../services/api';
+import { initialCursorPagination, resetCursorPagination, cursorPageParams, applyCursorPage } from '../cursorPagination';
 
 // Helper to extract error message
 const getErrorMessage = (error) => {
@@ -13,14 +14,7 @@ const getErrorMessage = (error) => {
 
 const initialState = {
   contacts: [],
-  pagination: {
-    currentPage: 1,
-    totalPages: 1,
-    totalContacts: 0,
-    pageSize: 10,
-    next: null,
-    previous: null,
-  },
+  pagination: initialCursorPagination(10),
   currentContact: null,
   isLoading: false,
   isSubmitting: false,
@@ -32,17 +26,21 @@ const initialState = {
     error: null, // General error message for the upload process
     message: null, // Success or summary message
     errorDetails: null, // Array of row-specific errors or detailed error info
+    jobId: null, // Background import job (/contacts/imports/<id>/) while it runs
+    rowsProcessed: 0,
   }
 };
 
+const IMPORT_POLL_INTERVAL_MS = 2000;
+const IMPORT_POLL_TIMEOUT_MS = 10 * 60 * 1000;
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
 // Async Thunks (fetchContacts, fetchContactById, createContact, updateContact, deleteContact remain unchanged from previous correct version)
 export const fetchContacts = createAsyncThunk(
   'contacts/fetchContacts',
-  async ({ page = 1, pageSize = 10, search = '', filters = {} }, { rejectWithValue }) => {
+  async ({ page = 1, pageSize = 10, search = '', filters = {} }, { getState, rejectWithValue }) => {
     try {
-      const params = new URLSearchParams();
-      params.append('page', page);
-      params.append('page_size', pageSize);
+      const { params, page: loadedPage } = cursorPageParams(getState().contacts.pagination, page, pageSize);
       if (search) {
         params.append('search', search);
       }
@@ -52,10 +50,8 @@ export const fetchContacts = createAsyncThunk(
       const response = await apiClient.get(`/contacts/contacts/?${params.toString()}`);
       return {
         results: response.data.results,
-        count: response.data.count,
         next: response.data.next,
-        previous: response.data.previous,
-        currentPage: page,
+        currentPage: loadedPage,
         pageSize: pageSize,
       };
     } catch (error) {
@@ -114,15 +110,26 @@ export const deleteContact = createAsyncThunk(
 
 export const uploadContactsFile = createAsyncThunk(
   'contacts/uploadContactsFile',
-  async (formData, { rejectWithValue }) => {
+  async (formData, { dispatch, rejectWithValue }) => {
     try {
       const response = await apiClient.post('/contacts/contacts/upload/', formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
         },
       });
-      // Expect response like { message: "...", success_count: X, failure_count: Y, errors: [...] }
-      return response.data;
+      // 202 { job_id, status, status_url }: the import runs in the background, poll the job until it finishes
+      const jobId = response.data.job_id;
+      dispatch(setImportJobProgress({ jobId, rowsProcessed: 0 }));
+      const deadline = Date.now() + IMPORT_POLL_TIMEOUT_MS;
+      while (Date.now() < deadline) {
+        await sleep(IMPORT_POLL_INTERVAL_MS);
+        const { data: job } = await apiClient.get(`/contacts/imports/${jobId}/`);
+        if (job.status === 'completed' || job.status === 'failed') {
+          return job; // { status, contacts_created, rows_skipped, errors, error_message, ... }
+        }
+        dispatch(setImportJobProgress({ jobId, rowsProcessed: job.rows_processed }));
+      }
+      return rejectWithValue(`The import is still running (job ${jobId}); reload the contacts later to see the results.`);
     } catch (error) {
       // If error.response.data exists, it might contain structured error details from the backend
       const errorPayload = error.response && error.response.data ? error.response.data : getErrorMessage(error);
@@ -141,21 +148,25 @@ const contactsSlice = createSlice({
     },
     setPageSize(state, action) {
       state.pagination.pageSize = action.payload;
-      state.pagination.currentPage = 1;
+      resetCursorPagination(state.pagination);
     },
     setSearchTerm(state, action) {
       state.searchTerm = action.payload;
-      state.pagination.currentPage = 1;
+      resetCursorPagination(state.pagination);
     },
     setFilters(state, action) {
       state.filters = action.payload;
-      state.pagination.currentPage = 1;
+      resetCursorPagination(state.pagination);
     },
     clearCurrentContact(state) {
       state.currentContact = null;
     },
     clearUploadStatus(state) {
-        state.uploadStatus = { isLoading: false, error: null, message: null, errorDetails: null };
+        state.uploadStatus = { isLoading: false, error: null, message: null, errorDetails: null, jobId: null, rowsProcessed: 0 };
+    },
+    setImportJobProgress(state, action) {
+        state.uploadStatus.jobId = action.payload.jobId;
+        state.uploadStatus.rowsProcessed = action.payload.rowsProcessed;
     }
   },
   extraReducers: (builder) => {
@@ -168,12 +179,7 @@ const contactsSlice = createSlice({
       .addCase(fetchContacts.fulfilled, (state, action) => {
         state.isLoading = false;
         state.contacts = action.payload.results;
-        state.pagination.totalContacts = action.payload.count;
-        state.pagination.next = action.payload.next;
-        state.pagination.previous = action.payload.previous;
-        state.pagination.currentPage = action.payload.currentPage;
-        state.pagination.pageSize = action.payload.pageSize;
-        state.pagination.totalPages = Math.ceil(action.payload.count / action.payload.pageSize);
+        applyCursorPage(state.pagination, action.payload);
       })
       .addCase(fetchContacts.rejected, (state, action) => {
         state.isLoading = false;
@@ -201,7 +207,7 @@ const contactsSlice = createSlice({
       .addCase(deleteContact.fulfilled, (state, action) => {
         state.isSubmitting = false;
         state.contacts = state.contacts.filter(c => c.id !== action.payload);
-        state.pagination.totalContacts -= 1;
+        state.pagination.pagedTotal -= 1;
       })
       .addCase(deleteContact.rejected, (state, action) => { state.isSubmitting = false; state.error = action.payload; })
       // uploadContactsFile - REFINED
@@ -212,16 +218,23 @@ const contactsSlice = createSlice({
         state.uploadStatus.errorDetails = null;
       })
       .addCase(uploadContactsFile.fulfilled, (state, action) => {
+        // action.payload is the finished ImportJob, errors as [{row, email, error}] (capped server-side)
+        const job = action.payload;
         state.uploadStatus.isLoading = false;
-        // Assuming action.payload is the response object from the backend
-        // e.g., { message: "Processed X entries.", success_count: Y, failure_count: Z, errors: [{row: 1, error: "..."}] }
-        state.uploadStatus.message = action.payload.message ||
-                                     `Successfully imported: ${action.payload.success_count || 0}. Failed: ${action.payload.failure_count || 0}.`;
-        state.uploadStatus.errorDetails = action.payload.errors || null; // Store detailed errors if provided
-        state.uploadStatus.error = action.payload.failure_count > 0 ? "Some contacts could not be imported." : null;
+        state.uploadStatus.jobId = null;
+        state.uploadStatus.rowsProcessed = job.rows_processed;
+        state.uploadStatus.errorDetails = job.errors && job.errors.length > 0 ? job.errors : null;
+        if (job.status === 'failed') {
+          state.uploadStatus.message = 'File upload failed.';
+          state.uploadStatus.error = job.error_message || 'The import failed.';
+        } else {
+          state.uploadStatus.message = `Successfully imported: ${job.contacts_created}. Failed: ${job.rows_skipped}.`;
+          state.uploadStatus.error = job.rows_skipped > 0 ? "Some contacts could not be imported." : null;
+        }
       })
       .addCase(uploadContactsFile.rejected, (state, action) => {
         state.uploadStatus.isLoading = false;
+        state.uploadStatus.jobId = null;
         // action.payload could be a string from getErrorMessage or an object from backend (e.g. validation errors on file itself)
         if (typeof action.payload === 'string') {
             state.uploadStatus.error = action.payload;
@@ -244,6 +257,7 @@ export const {
   setFilters,
   clearCurrentContact,
   clearUploadStatus,
+  setImportJobProgress,
 } = contactsSlice.actions;
 
 // Selectors (no change from previous version)
@@ -1,5 +1,6 @@
 import { createSlice, createAsyncThunk } from '@reduxjs/toolkit';
 import apiClient from '../../services/api';
+import { initialCursorPagination, resetCursorPagination, cursorPageParams, applyCursorPage } from '../cursorPagination';
 
 // Helper to extract error message
 const getErrorMessage = (error) => {
@@ -8,14 +9,7 @@ const getErrorMessage = (error) => {
 
 const initialState = {
   templates: [],
-  pagination: {
-    currentPage: 1,
-    totalPages: 1,
-    totalTemplates: 0,
-    pageSize: 10, // Default page size
-    next: null,
-    previous: null,
-  },
+  pagination: initialCursorPagination(10), // Default page size
   currentTemplate: null,
   isLoading: false, // For fetching lists or single template
   isSubmitting: false, // For CUD operations on templates
@@ -28,18 +22,14 @@ const initialState = {
 // Async Thunks
 export const fetchTemplates = createAsyncThunk(
   'templates/fetchTemplates',
-  async ({ page = 1, pageSize = 10 } = {}, { rejectWithValue }) => { // Provide default empty object
+  async ({ page = 1, pageSize = 10 } = {}, { getState, rejectWithValue }) => { // Provide default empty object
     try {
-      const params = new URLSearchParams();
-      params.append('page', page);
-      params.append('page_size', pageSize);
+      const { params, page: loadedPage } = cursorPageParams(getState().templates.pagination, page, pageSize);
       const response = await apiClient.get(`/templates/templates/?${params.toString()}`);
       return {
         results: response.data.results,
-        count: response.data.count,
         next: response.data.next,
-        previous: response.data.previous,
-        currentPage: page,
+        currentPage: loadedPage,
         pageSize: pageSize,
       };
     } catch (error) {
@@ -128,7 +118,7 @@ const templatesSlice = createSlice({
     },
     setTemplatesPageSize(state, action) {
         state.pagination.pageSize = action.payload;
-        state.pagination.currentPage = 1;
+        resetCursorPagination(state.pagination);
     },
   },
   extraReducers: (builder) => {
@@ -141,12 +131,7 @@ const templatesSlice = createSlice({
       .addCase(fetchTemplates.fulfilled, (state, action) => {
         state.isLoading = false;
         state.templates = action.payload.results;
-        state.pagination.totalTemplates = action.payload.count;
-        state.pagination.next = action.payload.next;
-        state.pagination.previous = action.payload.previous;
-        state.pagination.currentPage = action.payload.currentPage;
-        state.pagination.pageSize = action.payload.pageSize;
-        state.pagination.totalPages = Math.ceil(action.payload.count / action.payload.pageSize);
+        applyCursorPage(state.pagination, action.payload);
       })
       .addCase(fetchTemplates.rejected, (state, action) => {
         state.isLoading = false;
@@ -174,7 +159,7 @@ const templatesSlice = createSlice({
       .addCase(createTemplate.fulfilled, (state, action) => {
         state.isSubmitting = false;
         // state.templates.unshift(action.payload); // Optionally add to list, or rely on re-fetch
-        // state.pagination.totalTemplates += 1;
+        // state.pagination.pagedTotal += 1;
       })
       .addCase(createTemplate.rejected, (state, action) => {
         state.isSubmitting = false;
@@ -205,7 +190,7 @@ const templatesSlice = createSlice({
       .addCase(deleteTemplate.fulfilled, (state, action) => {
         state.isSubmitting = false;
         state.templates = state.templates.filter(t => t.id !== action.payload);
-        state.pagination.totalTemplates -= 1;
+        state.pagination.pagedTotal -= 1;
       })
       .addCase(deleteTemplate.rejected, (state, action) => {
         state.isSubmitting = false;
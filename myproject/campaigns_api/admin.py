@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Campaign, CampaignAnalytics # Import CampaignAnalytics
+from .models import Campaign, CampaignAnalytics, CampaignArchivePartition, CampaignLinkStats, CampaignStats # Import CampaignAnalytics
 
 @admin.register(Campaign)
 class CampaignAdmin(admin.ModelAdmin):
@@ -73,7 +73,7 @@ class CampaignAdmin(admin.ModelAdmin):
 @admin.register(CampaignAnalytics)
 class CampaignAnalyticsAdmin(admin.ModelAdmin):
     list_display = ('campaign_name', 'contact_email', 'event_type_display', 'event_timestamp', 'ses_message_id')
-    list_filter = ('event_type', 'campaign__name', 'event_timestamp') # Filter by campaign name
+    list_filter = ('event_type', 'bounce_type', 'campaign__name', 'event_timestamp') # Filter by campaign name
     search_fields = ('campaign__name', 'contact__email', 'ses_message_id', 'details')
     readonly_fields = ('event_timestamp',) # Assuming event_timestamp is auto_now_add or default=now
 
@@ -82,7 +82,7 @@ class CampaignAnalyticsAdmin(admin.ModelAdmin):
             'fields': ('campaign', 'contact', 'event_type', 'ses_message_id')
         }),
         ('Event Details', {
-            'fields': ('details', 'event_timestamp')
+            'fields': ('bounce_type', 'bounce_sub_type', 'click_url', 'link', 'user_agent', 'details', 'event_timestamp')
         }),
     )
 
@@ -103,4 +103,26 @@ class CampaignAnalyticsAdmin(admin.ModelAdmin):
     event_type_display.admin_order_field = 'event_type'
 
     # Make related fields like campaign and contact raw_id_fields for performance if there are many.
-    raw_id_fields = ('campaign', 'contact')
+    raw_id_fields = ('campaign', 'contact', 'link')
+
+
+@admin.register(CampaignStats)
+class CampaignStatsAdmin(admin.ModelAdmin):
+    list_display = ('campaign', 'unique_sent', 'unique_delivered', 'unique_opened', 'unique_clicked',
+                    'unique_bounced', 'unique_complaints', 'has_archive', 'updated_at')
+    readonly_fields = ('updated_at',)
+    raw_id_fields = ('campaign',)
+
+
+@admin.register(CampaignArchivePartition)
+class CampaignArchivePartitionAdmin(admin.ModelAdmin):
+    list_display = ('campaign', 'month', 'row_count', 'min_timestamp', 'max_timestamp', 'path', 'created_at')
+    list_filter = ('month',)
+    readonly_fields = ('campaign', 'month', 'path', 'row_count', 'min_timestamp', 'max_timestamp', 'created_at')
+
+
+@admin.register(CampaignLinkStats)
+class CampaignLinkStatsAdmin(admin.ModelAdmin):
+    list_display = ('campaign', 'link', 'total_clicks', 'unique_clicks', 'updated_at')
+    readonly_fields = ('updated_at',)
+    raw_id_fields = ('campaign', 'link')
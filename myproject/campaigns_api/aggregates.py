@@ -0,0 +1,316 @@
+"""
+Incrementally maintained campaign aggregates.
+
+Every time a new CampaignAnalytics row is written (send task, webhook, SQS consumer)
+`record_event` bumps the matching CampaignStats counter, but only the first time a
+contact reaches that event type in the campaign, so counters equal the
+`COUNT(DISTINCT contact_id)` that campaign_stats used to compute per request.
+It also bumps hourly and daily CampaignEventRollup rows, which back the timeline API,
+and the HyperLogLog sketches behind approximate unique counts (see sketches.py).
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .archive import archived_campaign_ids, archived_event_exists, load_archived_events
+from .models import CampaignAnalytics, CampaignEventRollup, CampaignStats
+from .links import record_link_click
+from .report_cache import bump_events_version_on_commit
+from .sketches import update_sketches
+
+# CampaignAnalytics.event_type -> CampaignStats counter
+STATS_FIELD_BY_EVENT_TYPE = {
+    'sent': 'unique_sent',
+    'delivered': 'unique_delivered',
+    'opened': 'unique_opened',
+    'clicked': 'unique_clicked',
+    'bounced': 'unique_bounced',
+    'complaint': 'unique_complaints',
+}
+
+
+ROLLUP_GRANULARITIES = ('hour', 'day')
+
+
+def bucket_start(moment, granularity):
+    """Truncates an aware datetime to the start of its UTC hour/day bucket."""
+    moment = moment.astimezone(dt_timezone.utc)
+    if granularity == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _bump_rollups(analytics_event, first_time):
+    for granularity in ROLLUP_GRANULARITIES:
+        rollup, _ = CampaignEventRollup.objects.get_or_create(
+            campaign_id=analytics_event.campaign_id,
+            granularity=granularity,
+            bucket_start=bucket_start(analytics_event.event_timestamp, granularity),
+            event_type=analytics_event.event_type,
+        )
+        updates = {'count': F('count') + 1}
+        if first_time:
+            updates['first_time_count'] = F('first_time_count') + 1
+        CampaignEventRollup.objects.filter(pk=rollup.pk).update(**updates)
+
+
+def record_event(analytics_event):
+    """
+    Updates aggregates (CampaignStats counters, sketches, link clicks, hourly/daily rollups) for a freshly created
+    analytics row. Must run in the same transaction as the insert; the CampaignStats row lock
+    serializes concurrent first-time checks for one campaign so unique counts cannot be
+    double counted. Returns True if this is the contact's first event of this type.
+    """
+    field = STATS_FIELD_BY_EVENT_TYPE.get(analytics_event.event_type)
+    with transaction.atomic():
+        if field:
+            CampaignStats.objects.get_or_create(campaign_id=analytics_event.campaign_id)
+            stats = CampaignStats.objects.select_for_update().get(campaign_id=analytics_event.campaign_id)
+        first_time = not CampaignAnalytics.objects.filter(
+            campaign_id=analytics_event.campaign_id,
+            contact_id=analytics_event.contact_id,
+            event_type=analytics_event.event_type,
+        ).exclude(pk=analytics_event.pk).exists() # Served by the (campaign, contact, event_type) index
+        if first_time and (stats.has_archive if field else True):
+            # Earlier events may have been moved to Parquet (archive.py): an indexed key lookup, no file read
+            first_time = not archived_event_exists(
+                analytics_event.campaign_id, analytics_event.contact_id, analytics_event.event_type)
+        if field and first_time:
+            CampaignStats.objects.filter(pk=stats.pk).update(**{field: F(field) + 1})
+        if field:
+            update_sketches(analytics_event, first_time) # Still under the CampaignStats row lock
+        if analytics_event.event_type == 'clicked' and analytics_event.link_id:
+            record_link_click(analytics_event, check_archive=stats.has_archive)
+        _bump_rollups(analytics_event, first_time)
+    bump_events_version_on_commit(analytics_event.campaign_id) # Cached reports (report_cache.py) go stale
+    return first_time
+
+
+def compute_unique_counts(campaign_ids):
+    """
+    Exact unique-contact counts straight from CampaignAnalytics with one grouped query.
+    Campaigns with archived events are counted over the union of hot rows and Parquet partitions.
+    Returns {campaign_id: {stats_field: count}} with every field present.
+    """
+    counts = {cid: {field: 0 for field in STATS_FIELD_BY_EVENT_TYPE.values()} for cid in campaign_ids}
+    archived_ids = archived_campaign_ids(campaign_ids)
+    rows = (CampaignAnalytics.objects
+            .filter(campaign_id__in=[cid for cid in campaign_ids if cid not in archived_ids],
+                    event_type__in=STATS_FIELD_BY_EVENT_TYPE.keys())
+            .values('campaign_id', 'event_type')
+            .annotate(n=Count('contact_id', distinct=True))
+            .order_by())
+    for row in rows:
+        counts[row['campaign_id']][STATS_FIELD_BY_EVENT_TYPE[row['event_type']]] = row['n']
+
+    if archived_ids:
+        keys = ['campaign_id', 'event_type', 'contact_id']
+        hot = pd.DataFrame.from_records(
+            CampaignAnalytics.objects.filter(campaign_id__in=archived_ids, event_type__in=STATS_FIELD_BY_EVENT_TYPE.keys())
+            .values_list(*keys).distinct().order_by(), columns=keys)
+        archived = load_archived_events(archived_ids, columns=keys)
+        archived = archived[archived['event_type'].isin(list(STATS_FIELD_BY_EVENT_TYPE))]
+        merged = pd.concat([hot, archived], ignore_index=True).drop_duplicates()
+        for (campaign_id, event_type), n in merged.groupby(['campaign_id', 'event_type']).size().items():
+            counts[int(campaign_id)][STATS_FIELD_BY_EVENT_TYPE[event_type]] = int(n)
+    return counts
+
+
+def rebuild_campaign_stats(campaign_ids):
+    """Recomputes CampaignStats rows for the given campaigns from raw events. Returns the rows."""
+    rebuilt = []
+    campaign_ids = list(campaign_ids)
+    counts = compute_unique_counts(campaign_ids)
+    archived_ids = archived_campaign_ids(campaign_ids)
+    with transaction.atomic():
+        for campaign_id, fields in counts.items():
+            stats, _ = CampaignStats.objects.update_or_create(
+                campaign_id=campaign_id, defaults={**fields, 'has_archive': campaign_id in archived_ids})
+            rebuilt.append(stats)
+    return rebuilt
+
+
+def get_campaign_stats(campaign):
+    """
+    Returns the campaign's aggregate row. Read-only: a campaign without one (no events recorded
+    yet; older campaigns were backfilled by migration 0011) gets unsaved zero counters.
+    """
+    try:
+        return CampaignStats.objects.get(campaign=campaign)
+    except CampaignStats.DoesNotExist:
+        return CampaignStats(campaign=campaign)
+
+
+def _rate(numerator, denominator):
+    return round((numerator / denominator) * 100, 2) if denominator > 0 else 0
+
+
+def stats_payload(campaign_id, campaign_name, counts):
+    """
+    Formats counters into the campaign_stats response body.
+    `counts` is anything exposing the CampaignStats field names (model instance or dict).
+    """
+    get = counts.get if isinstance(counts, dict) else lambda name, default=0: getattr(counts, name, default)
+    total_sent = get('unique_sent', 0)
+    total_delivered = get('unique_delivered', 0)
+    total_opened = get('unique_opened', 0)
+    total_clicked = get('unique_clicked', 0)
+    total_bounced = get('unique_bounced', 0)
+    total_complaints = get('unique_complaints', 0)
+
+    if total_sent == 0:
+        return {
+            'campaign_id': campaign_id,
+            'campaign_name': campaign_name,
+            'total_sent': 0,
+            'total_delivered': 0,
+            'total_opened': 0,
+            'total_clicked': 0,
+            'total_bounced': 0,
+            'total_complaints': 0,
+            'open_rate_on_sent': 0,
+            'click_rate_on_sent': 0,
+            'click_rate_on_opened': 0,
+            'bounce_rate_on_sent': 0,
+            'message': 'No emails recorded as sent for this campaign.'
+        }
+
+    # Base for open/click rates can be 'sent' or 'delivered'.
+    # Using 'sent' (our system's attempt to send) as the primary base for now.
+    return {
+        'campaign_id': campaign_id,
+        'campaign_name': campaign_name,
+        'total_sent': total_sent,          # Emails our system attempted to send via Celery task
+        'total_delivered': total_delivered,  # Confirmed deliveries from SES
+        'total_opened': total_opened,        # Unique opens
+        'total_clicked': total_clicked,      # Unique clicks
+        'total_bounced': total_bounced,      # Unique bounces
+        'total_complaints': total_complaints,  # Unique complaints
+        'delivery_rate_on_sent': _rate(total_delivered, total_sent),
+        'open_rate_on_sent': _rate(total_opened, total_sent),
+        'click_rate_on_sent': _rate(total_clicked, total_sent),
+        'click_rate_on_opened': _rate(total_clicked, total_opened), # Often called Click-to-Open Rate (CTOR)
+        'bounce_rate_on_sent': _rate(total_bounced, total_sent),
+    }
+
+
+def rebuild_campaign_rollups(campaign_ids):
+    """
+    Recomputes hourly and daily rollups from raw events, archived ones included (hourly only within the retention window).
+    First-time counts come from each contact's earliest event per type.
+    """
+    campaign_ids = list(campaign_ids)
+    hourly_cutoff = bucket_start(timezone.now() - timedelta(days=hourly_rollup_retention_days()), 'day')
+    rows = {}
+
+    def _add(campaign_id, event_type, moment, count_delta, first_delta):
+        for granularity in ROLLUP_GRANULARITIES:
+            start = bucket_start(moment, granularity)
+            if granularity == 'hour' and start < hourly_cutoff:
+                continue
+            key = (campaign_id, granularity, start, event_type)
+            counts = rows.setdefault(key, [0, 0])
+            counts[0] += count_delta
+            counts[1] += first_delta
+
+    events = (CampaignAnalytics.objects.filter(campaign_id__in=campaign_ids)
+              .values_list('campaign_id', 'event_type', 'event_timestamp').order_by().iterator(chunk_size=5000))
+    for campaign_id, event_type, moment in events:
+        _add(campaign_id, event_type, moment, 1, 0)
+
+    # Archived events count too; a contact's first event may sit in the archive or in the hot table.
+    archived_firsts = {}
+    archived = load_archived_events(campaign_ids, columns=['campaign_id', 'contact_id', 'event_type', 'event_timestamp'])
+    if not archived.empty:
+        for row in archived.itertuples(index=False):
+            _add(int(row.campaign_id), row.event_type, row.event_timestamp.to_pydatetime(), 1, 0)
+        grouped = archived.groupby(['campaign_id', 'contact_id', 'event_type'])['event_timestamp'].min()
+        archived_firsts = {(int(c), int(ct), e): moment.to_pydatetime() for (c, ct, e), moment in grouped.items()}
+
+    firsts = (CampaignAnalytics.objects.filter(campaign_id__in=campaign_ids)
+              .values('campaign_id', 'contact_id', 'event_type').annotate(first=Min('event_timestamp')).order_by())
+    for row in firsts.iterator(chunk_size=5000):
+        key = (row['campaign_id'], row['contact_id'], row['event_type'])
+        if key in archived_firsts:
+            archived_firsts[key] = min(archived_firsts[key], row['first'])
+        else:
+            _add(row['campaign_id'], row['event_type'], row['first'], 0, 1)
+    for (campaign_id, _contact_id, event_type), moment in archived_firsts.items():
+        _add(campaign_id, event_type, moment, 0, 1)
+
+    with transaction.atomic():
+        CampaignEventRollup.objects.filter(campaign_id__in=campaign_ids).delete()
+        CampaignEventRollup.objects.bulk_create([
+            CampaignEventRollup(campaign_id=c, granularity=g, bucket_start=b, event_type=e,
+                                count=counts[0], first_time_count=counts[1])
+            for (c, g, b, e), counts in rows.items()
+        ], batch_size=1000)
+    return len(rows)
+
+
+def hourly_rollup_retention_days():
+    return getattr(settings, 'ANALYTICS_HOURLY_ROLLUP_RETENTION_DAYS', 30)
+
+
+def prune_hourly_rollups(retention_days=None):
+    """
+    Downsamples old data to daily resolution by deleting hourly rows past the retention window;
+    the daily rows for the same period were maintained alongside them. Returns rows deleted.
+    """
+    if retention_days is None:
+        retention_days = hourly_rollup_retention_days()
+    cutoff = bucket_start(timezone.now() - timedelta(days=retention_days), 'day')
+    return CampaignEventRollup.objects.filter(granularity='hour', bucket_start__lt=cutoff).delete()[0]
+
+
+MAX_TIMELINE_BUCKETS = 24 * 90
+
+
+def campaign_timeline(campaign, granularity='hour', start=None, end=None, event_types=None, metric='events'):
+    """
+    Reads a campaign's rollups into a zero-filled series between start and end (inclusive).
+    `metric` is 'events' (all events) or 'unique' (contacts reaching the event type for the first time).
+    Only rollup rows are read, so cost depends on the number of buckets, not on raw event volume.
+    """
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(ROLLUP_GRANULARITIES)}.")
+    if metric not in ('events', 'unique'):
+        raise ValueError("metric must be 'events' or 'unique'.")
+    value_field = 'count' if metric == 'events' else 'first_time_count'
+
+    rollups = CampaignEventRollup.objects.filter(campaign=campaign, granularity=granularity)
+    if event_types:
+        rollups = rollups.filter(event_type__in=event_types)
+    if start:
+        rollups = rollups.filter(bucket_start__gte=bucket_start(start, granularity))
+    if end:
+        rollups = rollups.filter(bucket_start__lte=bucket_start(end, granularity))
+    rows = list(rollups.values_list('bucket_start', 'event_type', value_field))
+
+    step = timedelta(days=1) if granularity == 'day' else timedelta(hours=1)
+    first_bucket = bucket_start(start, granularity) if start else min((r[0] for r in rows), default=None)
+    last_bucket = bucket_start(end, granularity) if end else max((r[0] for r in rows), default=None)
+    types = sorted(set(event_types or []) | {r[1] for r in rows})
+    if first_bucket is None or last_bucket is None or last_bucket < first_bucket:
+        return {'granularity': granularity, 'metric': metric, 'event_types': types, 'buckets': []}
+    if (last_bucket - first_bucket) / step >= MAX_TIMELINE_BUCKETS:
+        raise ValueError(f"Requested range spans more than {MAX_TIMELINE_BUCKETS} buckets; narrow it or use granularity=day.")
+
+    series = {}
+    current = first_bucket
+    while current <= last_bucket:
+        series[current] = {event_type: 0 for event_type in types}
+        current += step
+    for moment, event_type, value in rows:
+        if moment in series:
+            series[moment][event_type] = value
+    return {
+        'granularity': granularity,
+        'metric': metric,
+        'event_types': types,
+        'buckets': [{'bucket_start': moment.isoformat(), **counts} for moment, counts in series.items()],
+    }
@@ -0,0 +1,300 @@
+"""
+Archival of old CampaignAnalytics rows to compressed Parquet files.
+
+`archive_old_events` moves events older than ANALYTICS_ARCHIVE_AFTER_DAYS out of the hot
+table into files under ANALYTICS_ARCHIVE_DIR, partitioned as
+    owner=<id>/campaign=<id>/month=YYYY-MM/part-<uuid>.parquet
+Each file is registered as a CampaignArchivePartition in the same transaction that deletes
+the archived rows. A failed transaction removes the file again, so an event is always in
+exactly one place.
+
+CampaignStats counters, rollups and sketches are not touched by archiving, so the stats and
+timeline endpoints keep answering from them. Code that reads raw events (stats/rollup/sketch
+rebuilds, the event export) merges `load_archived_events` in for campaigns whose requested time
+range reaches into archived partitions. The first-time checks of ingestion never read Parquet:
+the (contact, event type) and (link, contact) keys of archived events are stored in
+ArchivedEventKey / ArchivedLinkClickKey in the same transaction, and looked up by index.
+
+Events whose 'sent' row has been archived can no longer be attributed by the ingestion path,
+so the archive age should be well beyond the window in which opens and clicks still arrive.
+"""
+import heapq
+import json
+import logging
+import os
+import uuid
+import zlib
+from datetime import timedelta, timezone as dt_timezone
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import ArchivedEventKey, ArchivedLinkClickKey, CampaignAnalytics, CampaignArchivePartition, CampaignStats
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: # pyarrow is only needed once archiving is used
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = [
+    'id', 'campaign_id', 'contact_id', 'ses_message_id', 'event_type', 'event_timestamp',
+    'bounce_type', 'bounce_sub_type', 'click_url', 'user_agent', 'link_id', 'details',
+]
+
+
+def _require_pyarrow():
+    if pq is None:
+        raise RuntimeError("Analytics archiving needs pandas and pyarrow (see requirements.txt).")
+
+
+def _archive_schema():
+    return pa.schema([
+        ('id', pa.int64()),
+        ('campaign_id', pa.int64()),
+        ('contact_id', pa.int64()),
+        ('ses_message_id', pa.string()),
+        ('event_type', pa.string()),
+        ('event_timestamp', pa.timestamp('us', tz='UTC')),
+        ('bounce_type', pa.string()),
+        ('bounce_sub_type', pa.string()),
+        ('click_url', pa.string()),
+        ('user_agent', pa.string()),
+        ('link_id', pa.int64()),
+        ('details', pa.string()), # Raw payload as JSON text, from `details` or the compressed side table
+    ])
+
+
+def archive_dir():
+    return str(getattr(settings, 'ANALYTICS_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'analytics_archive')))
+
+
+def archive_after_days():
+    return getattr(settings, 'ANALYTICS_ARCHIVE_AFTER_DAYS', 0)
+
+
+def _next_month(month_start):
+    return (month_start + timedelta(days=32)).replace(day=1)
+
+
+def _details_json(details, compressed):
+    if details is not None:
+        return json.dumps(details, separators=(',', ':'), default=str)
+    if compressed is not None:
+        return zlib.decompress(bytes(compressed)).decode('utf-8')
+    return None
+
+
+def _write_partition(rows, relative_path, batch_size):
+    """Streams the rows into a Parquet file in record batches. Returns (row_count, min_ts, max_ts, max_id)."""
+    schema = _archive_schema()
+    full_path = os.path.join(archive_dir(), relative_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    tmp_path = f"{full_path}.tmp"
+    row_count, min_ts, max_ts, max_id = 0, None, None, None
+    columns = {name: [] for name in schema.names}
+
+    with pq.ParquetWriter(tmp_path, schema, compression=getattr(settings, 'ANALYTICS_ARCHIVE_COMPRESSION', 'zstd')) as writer:
+        def _flush():
+            writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+            for values in columns.values():
+                values.clear()
+
+        for row in rows:
+            row['details'] = _details_json(row['details'], row.pop('raw_payload__data'))
+            for name in schema.names:
+                columns[name].append(row[name])
+            row_count += 1
+            moment = row['event_timestamp']
+            min_ts = moment if min_ts is None or moment < min_ts else min_ts
+            max_ts = moment if max_ts is None or moment > max_ts else max_ts
+            max_id = row['id'] # Rows arrive in id order
+            if len(columns['id']) >= batch_size:
+                _flush()
+        if columns['id']:
+            _flush()
+    os.replace(tmp_path, full_path)
+    return row_count, min_ts, max_ts, max_id
+
+
+def _bulk_insert_keys(model, objects, batch_size):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch, ignore_conflicts=True) # Keys of earlier partitions are kept
+            batch = []
+    model.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def store_archived_keys(campaign_id, events, batch_size=5000):
+    """
+    Records the first-time check keys of `events` (a CampaignAnalytics queryset or a frame of
+    archived rows with contact_id, event_type and link_id) for the campaign.
+    """
+    if isinstance(events, pd.DataFrame):
+        event_keys = events[['contact_id', 'event_type']].drop_duplicates().itertuples(index=False)
+        clicks = events[(events['event_type'] == 'clicked') & events['link_id'].notna()]
+        click_keys = clicks[['link_id', 'contact_id']].drop_duplicates().itertuples(index=False)
+    else:
+        event_keys = events.values_list('contact_id', 'event_type').distinct().order_by().iterator(chunk_size=batch_size)
+        click_keys = (events.filter(event_type='clicked', link__isnull=False).values_list('link_id', 'contact_id')
+                      .distinct().order_by().iterator(chunk_size=batch_size))
+    _bulk_insert_keys(ArchivedEventKey, (
+        ArchivedEventKey(campaign_id=campaign_id, contact_id=int(contact_id), event_type=event_type)
+        for contact_id, event_type in event_keys), batch_size)
+    _bulk_insert_keys(ArchivedLinkClickKey, (
+        ArchivedLinkClickKey(campaign_id=campaign_id, link_id=int(link_id), contact_id=int(contact_id))
+        for link_id, contact_id in click_keys), batch_size)
+
+
+def backfill_archived_keys(campaign_ids=None, batch_size=5000):
+    """
+    Rebuilds the keys of partitions archived before they were recorded, one campaign at a time
+    (`archive_analytics_events --backfill-keys`, a post-deploy step). Returns the campaigns done.
+    """
+    partitions = CampaignArchivePartition.objects.all()
+    if campaign_ids is not None:
+        partitions = partitions.filter(campaign_id__in=list(campaign_ids))
+    archived_ids = sorted(set(partitions.values_list('campaign_id', flat=True)))
+    for campaign_id in archived_ids:
+        events = load_archived_events([campaign_id], columns=['contact_id', 'event_type', 'link_id'])
+        store_archived_keys(campaign_id, events, batch_size)
+    return len(archived_ids)
+
+
+def archive_old_events(older_than_days=None, campaign_ids=None, batch_size=5000):
+    """
+    Moves events older than the cutoff to Parquet, one part file per (campaign, month) per run.
+    Returns {'partitions': files written, 'events': rows archived}. A cutoff of 0 days disables archiving.
+    """
+    days = archive_after_days() if older_than_days is None else older_than_days
+    totals = {'partitions': 0, 'events': 0}
+    if not days or days <= 0:
+        return totals
+    _require_pyarrow()
+    from .aggregates import rebuild_campaign_stats # aggregates imports this module
+    cutoff = timezone.now() - timedelta(days=days)
+
+    old_events = CampaignAnalytics.objects.filter(event_timestamp__lt=cutoff)
+    if campaign_ids is not None:
+        old_events = old_events.filter(campaign_id__in=list(campaign_ids))
+    groups = (old_events.annotate(month=TruncMonth('event_timestamp', tzinfo=dt_timezone.utc))
+              .values_list('campaign_id', 'campaign__owner_id', 'month').distinct().order_by('campaign_id', 'month'))
+
+    for campaign_id, owner_id, month_start in list(groups):
+        window = CampaignAnalytics.objects.filter(
+            campaign_id=campaign_id,
+            event_timestamp__gte=month_start,
+            event_timestamp__lt=min(_next_month(month_start), cutoff),
+        )
+        relative_path = os.path.join(f"owner={owner_id}", f"campaign={campaign_id}",
+                                     f"month={month_start:%Y-%m}", f"part-{uuid.uuid4().hex}.parquet")
+        # Server-side cursor: memory stays bounded by batch_size whatever the partition size.
+        rows = window.order_by('id').values(*ARCHIVE_COLUMNS, 'raw_payload__data').iterator(chunk_size=batch_size)
+        row_count, min_ts, max_ts, max_id = _write_partition(rows, relative_path, batch_size)
+        if not row_count:
+            os.remove(os.path.join(archive_dir(), relative_path))
+            continue
+
+        try:
+            with transaction.atomic():
+                if not CampaignStats.objects.filter(campaign_id=campaign_id).exists():
+                    rebuild_campaign_stats([campaign_id]) # Counters must be built while the rows are still hot
+                CampaignStats.objects.filter(campaign_id=campaign_id).update(has_archive=True)
+                CampaignArchivePartition.objects.create(
+                    campaign_id=campaign_id, month=month_start.date(), path=relative_path,
+                    row_count=row_count, min_timestamp=min_ts, max_timestamp=max_ts,
+                )
+                archived = window.filter(id__lte=max_id) # Rows written after the file was read stay hot
+                store_archived_keys(campaign_id, archived, batch_size) # First-time checks of later events
+                while True:
+                    ids = list(archived.values_list('id', flat=True)[:batch_size])
+                    if not ids:
+                        break
+                    CampaignAnalytics.objects.filter(id__in=ids).delete()
+        except Exception:
+            os.remove(os.path.join(archive_dir(), relative_path))
+            raise
+        totals['partitions'] += 1
+        totals['events'] += row_count
+        logger.info(f"Analytics archive: {row_count} events of campaign {campaign_id} ({month_start:%Y-%m}) -> {relative_path}")
+    return totals
+
+
+def archived_partitions(campaign_ids, start=None, end=None):
+    partitions = CampaignArchivePartition.objects.filter(campaign_id__in=list(campaign_ids))
+    if start:
+        partitions = partitions.filter(max_timestamp__gte=start)
+    if end:
+        partitions = partitions.filter(min_timestamp__lte=end)
+    return partitions
+
+
+def archived_campaign_ids(campaign_ids):
+    return set(CampaignArchivePartition.objects.filter(campaign_id__in=list(campaign_ids))
+               .values_list('campaign_id', flat=True).distinct())
+
+
+def load_archived_events(campaign_ids, start=None, end=None, columns=None, filters=None):
+    """
+    Reads archived events of the given campaigns into a pandas DataFrame ordered by id,
+    optionally limited to [start, end] and to `columns`. `filters` are pyarrow predicates
+    (e.g. [('contact_id', '=', 5)]), pushed down to the row-group statistics.
+    Returns an empty frame when no partition overlaps the range.
+    """
+    columns = list(columns or ARCHIVE_COLUMNS)
+    partitions = list(archived_partitions(campaign_ids, start, end).values_list('path', flat=True))
+    if not partitions:
+        return pd.DataFrame(columns=columns)
+    _require_pyarrow()
+    read_columns = list(dict.fromkeys(columns + ['id', 'event_timestamp']))
+    table = pa.concat_tables([
+        pq.read_table(os.path.join(archive_dir(), path), columns=read_columns, filters=filters)
+        for path in partitions
+    ])
+    frame = table.to_pandas()
+    if start:
+        frame = frame[frame['event_timestamp'] >= pd.Timestamp(start)]
+    if end:
+        frame = frame[frame['event_timestamp'] <= pd.Timestamp(end)]
+    return frame.sort_values('id')[columns].reset_index(drop=True)
+
+
+def archived_event_exists(campaign_id, contact_id, event_type):
+    """True if an archived event of this type exists for the contact in the campaign (indexed lookup)."""
+    return ArchivedEventKey.objects.filter(campaign_id=campaign_id, contact_id=contact_id, event_type=event_type).exists()
+
+
+def archived_click_exists(campaign_id, link_id, contact_id):
+    """True if the contact has an archived click on the link in the campaign (indexed lookup)."""
+    return ArchivedLinkClickKey.objects.filter(campaign_id=campaign_id, link_id=link_id, contact_id=contact_id).exists()
+
+
+
+def _iter_partition(path, columns, batch_size):
+    parquet_file = pq.ParquetFile(os.path.join(archive_dir(), path))
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield from batch.to_pylist()
+
+
+def iter_archived_events(campaign_ids, start=None, end=None, columns=None, batch_size=5000):
+    """
+    Streams archived events as dicts in id order, holding one record batch per partition in memory.
+    Part files are written in id order, so merging their streams keeps the global order.
+    """
+    columns = list(dict.fromkeys(list(columns or ARCHIVE_COLUMNS) + ['id', 'event_timestamp']))
+    partitions = list(archived_partitions(campaign_ids, start, end).values_list('path', flat=True))
+    if not partitions:
+        return
+    _require_pyarrow()
+    streams = [_iter_partition(path, columns, batch_size) for path in partitions]
+    for row in heapq.merge(*streams, key=lambda r: r['id']):
+        if (start and row['event_timestamp'] < start) or (end and row['event_timestamp'] > end):
+            continue
+        yield row
@@ -0,0 +1,143 @@
+"""
+Native async variant of the SES webhook for ASGI deployments (uvicorn/daphne).
+
+SESWebhookView is a synchronous DRF view: a cold certificate cache or an SNS
+SubscriptionConfirmation holds a whole worker while it waits on the network.
+AsyncSESWebhookView performs those requests with httpx.AsyncClient and hands
+verified notifications to the ingestion pipeline without blocking the event loop.
+Signature checking itself is shared with SESWebhookView.
+"""
+import json
+import logging
+from urllib.parse import urlparse
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views import View
+
+from .ingestion import process_ses_event
+from .views import SESWebhookView
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSESWebhookView(View):
+    """
+    Async counterpart of SESWebhookView. Same request/response contract, same status codes.
+    Verification helpers (URL checks, canonical message, RSA verification, cert cache)
+    come from `verifier_class` so both views trust exactly the same certificates.
+    """
+    http_method_names = ['post']
+    verifier_class = SESWebhookView
+    cert_fetch_timeout = 5
+    subscribe_timeout = 10
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True # SNS cannot send a CSRF token; the signature is the authentication
+        return view
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        self.verifier = self.verifier_class()
+
+    async def _fetch_certificate(self, cert_url):
+        cert_cache = self.verifier._cert_cache
+        if cert_url in cert_cache:
+            logger.debug(f"SNS Webhook (async): Using cached certificate for {cert_url}")
+            return cert_cache[cert_url]
+        logger.debug(f"SNS Webhook (async): Fetching certificate from {cert_url}")
+        async with httpx.AsyncClient(timeout=self.cert_fetch_timeout) as client:
+            response = await client.get(cert_url)
+            response.raise_for_status()
+        cert_cache[cert_url] = response.text
+        return response.text
+
+    async def _verify_sns_message_signature(self, payload):
+        cert_url = self.verifier._get_signing_cert_url(payload)
+        if not cert_url:
+            return False
+        try:
+            cert_pem = await self._fetch_certificate(cert_url)
+        except httpx.HTTPError as e:
+            logger.error(f"SNS Webhook (async): Failed to fetch SigningCertURL {cert_url}: {str(e)}")
+            return False
+        try:
+            return self.verifier._verify_signature_with_cert(payload, cert_pem, cert_url)
+        except Exception as e:
+            logger.error(f"SNS Webhook (async): Unexpected error during signature verification process: {str(e)}")
+            return False
+
+    async def _hand_off(self, message_data):
+        """
+        Passes a verified SES event to ingestion. 'inline' runs it on Django's sync thread
+        (thread_sensitive, safe for the ORM) while the event loop keeps serving requests;
+        'celery' only enqueues it, so the response does not wait for any DB work.
+        """
+        if getattr(settings, 'SES_WEBHOOK_ASYNC_INGESTION', 'inline') == 'celery':
+            from .tasks import ingest_ses_event_task
+            await sync_to_async(ingest_ses_event_task.delay)(message_data)
+        else:
+            await sync_to_async(process_ses_event)(message_data)
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            # SNS usually sends JSON as text/plain, so we decode and parse.
+            payload = json.loads(request.body.decode('utf-8'))
+        except json.JSONDecodeError:
+            logger.error("SES Webhook (async): Invalid JSON in request body.")
+            return JsonResponse({"error": "Invalid JSON format."}, status=400)
+        except Exception as e: # Catch other potential errors during body decoding
+            logger.error(f"SES Webhook (async): Error decoding request body: {str(e)}")
+            return JsonResponse({"error": "Error decoding request body."}, status=400)
+
+        if not isinstance(payload, dict) or not await self._verify_sns_message_signature(payload):
+            logger.error("SES Webhook (async): SNS message signature verification failed. Rejecting request.")
+            return JsonResponse({"error": "SNS signature verification failed. Message rejected."}, status=403)
+
+        message_type = payload.get('Type')
+
+        if message_type == 'SubscriptionConfirmation':
+            subscribe_url = payload.get('SubscribeURL')
+            if not subscribe_url:
+                logger.error("SNS Webhook (async): No SubscribeURL in SubscriptionConfirmation.")
+                return JsonResponse({"error": "No SubscribeURL found."}, status=400)
+
+            parsed_subscribe_url = urlparse(subscribe_url)
+            if not (parsed_subscribe_url.scheme == 'https' and (parsed_subscribe_url.hostname or '').endswith('.amazonaws.com')):
+                logger.error(f"SNS Webhook (async): Invalid SubscribeURL domain: {subscribe_url}")
+                return JsonResponse({"error": "Invalid SubscribeURL domain."}, status=400)
+
+            try:
+                async with httpx.AsyncClient(timeout=self.subscribe_timeout) as client:
+                    response = await client.get(subscribe_url)
+                    response.raise_for_status()
+                logger.info(f"SNS Subscription successfully confirmed (async). Status: {response.status_code}")
+                return JsonResponse({'message': 'SNS SubscriptionConfirmation received and confirmed.'}, status=200)
+            except httpx.HTTPError as e:
+                logger.error(f"SNS Subscription confirmation failed for {subscribe_url}: {str(e)}")
+                return JsonResponse({'message': f'SNS SubscriptionConfirmation received but confirmation request failed: {str(e)}'}, status=500)
+
+        elif message_type == 'Notification':
+            try:
+                message_data = json.loads(payload.get('Message', '{}'))
+            except json.JSONDecodeError:
+                logger.error("SES Webhook (async): Invalid JSON in SNS Message field.")
+                return JsonResponse({"error": "Invalid JSON in SNS Message."}, status=400)
+            if not isinstance(message_data, dict):
+                return JsonResponse({"error": "Invalid JSON in SNS Message."}, status=400)
+
+            logger.info(f"SES Webhook (async): Received SNS Notification. Type: {message_data.get('eventType')}, "
+                        f"SES Message ID: {(message_data.get('mail') or {}).get('messageId')}")
+            try:
+                await self._hand_off(message_data)
+            except Exception as e:
+                logger.error(f"SES Webhook (async): Error processing SNS Message: {str(e)}")
+                return JsonResponse({"error": f"Error processing SNS Message: {str(e)}"}, status=400)
+            return JsonResponse({'message': 'SNS Notification received and processed.'}, status=200)
+
+        logger.warning(f"SES Webhook (async): Received unknown message type or direct SES event: {payload}")
+        return JsonResponse({'message': 'Payload received and logged (type unknown or direct SES event).'}, status=200)
@@ -0,0 +1,135 @@
+"""
+Storage policy for CampaignAnalytics payloads.
+
+Raw SES payloads and send responses are large compared to the handful of fields
+we query. settings.ANALYTICS_RAW_PAYLOAD_MODE controls what is kept:
+- 'inline'     : legacy behaviour, the full payload goes into CampaignAnalytics.details.
+- 'compressed' : details stays empty; the payload is zlib-compressed into CampaignAnalyticsPayload.
+- 'drop'       : only the typed columns are kept.
+ANALYTICS_RAW_PAYLOAD_SAMPLE_RATE (0..1) keeps raw payloads for a fraction of events
+and ANALYTICS_RAW_PAYLOAD_RETENTION_DAYS bounds how long they are kept.
+"""
+import json
+import logging
+import random
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import CampaignAnalytics, CampaignAnalyticsPayload
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_MODES = ('inline', 'compressed', 'drop')
+
+
+def payload_mode():
+    mode = getattr(settings, 'ANALYTICS_RAW_PAYLOAD_MODE', 'inline')
+    if mode not in PAYLOAD_MODES:
+        logger.warning(f"Unknown ANALYTICS_RAW_PAYLOAD_MODE '{mode}', falling back to 'inline'.")
+        return 'inline'
+    return mode
+
+
+def _sampled():
+    rate = getattr(settings, 'ANALYTICS_RAW_PAYLOAD_SAMPLE_RATE', 1.0)
+    return rate >= 1.0 or (rate > 0 and random.random() < rate)
+
+
+def _truncate(value, max_length):
+    if value is None:
+        return None
+    value = str(value)
+    return value[:max_length]
+
+
+def extract_event_fields(internal_event_type, event_data):
+    """Pulls the queryable fields out of an SES event into CampaignAnalytics column values."""
+    fields = {}
+    if internal_event_type == 'bounced':
+        bounce = event_data.get('bounce') or {}
+        fields['bounce_type'] = _truncate(bounce.get('bounceType'), 32)
+        fields['bounce_sub_type'] = _truncate(bounce.get('bounceSubType'), 64)
+    elif internal_event_type == 'clicked':
+        click = event_data.get('click') or {}
+        fields['click_url'] = _truncate(click.get('link'), 2048)
+        fields['user_agent'] = _truncate(click.get('userAgent'), 512)
+    elif internal_event_type == 'opened':
+        fields['user_agent'] = _truncate((event_data.get('open') or {}).get('userAgent'), 512)
+    elif internal_event_type == 'complaint':
+        complaint = event_data.get('complaint') or {}
+        fields['user_agent'] = _truncate(complaint.get('userAgent'), 512)
+    return fields
+
+
+def inline_details(raw):
+    """Value to store in CampaignAnalytics.details for a freshly written event."""
+    if payload_mode() == 'inline' and _sampled():
+        return raw
+    return None
+
+
+def sent_payload(subject, ses_response):
+    """
+    Raw details for a 'sent' row. Outside 'inline' mode the SES ResponseMetadata (HTTP headers,
+    request ids) is stripped: it is never queried and dominates the payload size.
+    """
+    if payload_mode() != 'inline' and isinstance(ses_response, dict):
+        ses_response = {k: v for k, v in ses_response.items() if k != 'ResponseMetadata'}
+    return {'info': 'Email sent via AWS SES.', 'subject': subject, 'ses_response': ses_response}
+
+
+def store_raw_payload(analytics_event, raw):
+    """Writes the compressed side-table copy when the policy asks for one."""
+    if raw is None or payload_mode() != 'compressed' or not _sampled():
+        return None
+    data = zlib.compress(json.dumps(raw, separators=(',', ':'), default=str).encode('utf-8'))
+    payload, _ = CampaignAnalyticsPayload.objects.update_or_create(
+        event=analytics_event, defaults={'data': data, 'created_at': timezone.now()}
+    )
+    return payload
+
+
+def load_raw_payload(analytics_event):
+    """Returns the raw payload for an event from wherever it was stored, or None."""
+    if analytics_event.details is not None:
+        return analytics_event.details
+    try:
+        data = analytics_event.raw_payload.data
+    except CampaignAnalyticsPayload.DoesNotExist:
+        return None
+    return json.loads(zlib.decompress(bytes(data)).decode('utf-8'))
+
+
+def purge_expired_payloads(retention_days=None, batch_size=5000):
+    """
+    Deletes compressed payloads and clears inline details older than the retention window.
+    Typed columns are never touched. Returns (payloads_deleted, details_cleared).
+    """
+    if retention_days is None:
+        retention_days = getattr(settings, 'ANALYTICS_RAW_PAYLOAD_RETENTION_DAYS', 0)
+    if not retention_days:
+        return 0, 0
+    cutoff = timezone.now() - timedelta(days=retention_days)
+
+    payloads_deleted = 0
+    while True:
+        ids = list(CampaignAnalyticsPayload.objects.filter(created_at__lt=cutoff)
+                   .values_list('event_id', flat=True)[:batch_size])
+        if not ids:
+            break
+        payloads_deleted += CampaignAnalyticsPayload.objects.filter(event_id__in=ids).delete()[0]
+
+    details_cleared = 0
+    while True:
+        # Failure rows keep their (small) error details; they are the only record of what went wrong.
+        ids = list(CampaignAnalytics.objects.filter(event_timestamp__lt=cutoff, details__isnull=False)
+                   .exclude(event_type__in=['failed_to_send', 'failed_to_send_ses'])
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        details_cleared += CampaignAnalytics.objects.filter(id__in=ids).update(details=None)
+
+    return payloads_deleted, details_cleared
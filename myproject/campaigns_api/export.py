@@ -0,0 +1,127 @@
+"""
+Streaming export of a campaign's analytics events as CSV or NDJSON.
+
+Rows are read in keyset order (`id > last_id ... LIMIT n`), so every query is short, no cursor
+or transaction stays open for the whole download, and memory is bounded by one chunk.
+Archived events (archive.py) are merged into the same id-ordered stream. Output is produced
+chunk by chunk, optionally gzip-compressed, for a StreamingHttpResponse.
+"""
+import csv
+import heapq
+import io
+import json
+import zlib
+
+from contacts_api.models import Contact
+from .archive import iter_archived_events
+from .models import CampaignAnalytics
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_COLUMNS = [
+    'id', 'event_type', 'event_timestamp', 'contact_id', 'contact_email', 'ses_message_id',
+    'bounce_type', 'bounce_sub_type', 'click_url', 'link_id', 'user_agent',
+]
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def _hot_rows(campaign_id, start, end, event_types, after_id, chunk_size):
+    events = CampaignAnalytics.objects.filter(campaign_id=campaign_id)
+    if start:
+        events = events.filter(event_timestamp__gte=start)
+    if end:
+        events = events.filter(event_timestamp__lte=end)
+    if event_types:
+        events = events.filter(event_type__in=event_types)
+    fields = [c if c != 'contact_email' else 'contact__email' for c in EXPORT_COLUMNS]
+    last_id = after_id or 0
+    while True:
+        chunk = list(events.filter(id__gt=last_id).order_by('id').values_list(*fields)[:chunk_size])
+        for values in chunk:
+            yield dict(zip(EXPORT_COLUMNS, values))
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1][0]
+
+
+def _archived_rows(campaign_id, start, end, event_types, after_id, chunk_size):
+    """Archived events with contact emails looked up once per chunk."""
+    rows = (row for row in iter_archived_events([campaign_id], start, end, batch_size=chunk_size)
+            if (not event_types or row['event_type'] in event_types) and row['id'] > (after_id or 0))
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from _with_emails(chunk)
+            chunk = []
+    yield from _with_emails(chunk)
+
+
+def _with_emails(rows):
+    emails = dict(Contact.objects.filter(id__in={r['contact_id'] for r in rows}).values_list('id', 'email'))
+    for row in rows:
+        exported = {column: row.get(column) for column in EXPORT_COLUMNS}
+        exported['contact_email'] = emails.get(row['contact_id'])
+        yield exported
+
+
+def iter_export_rows(campaign_id, start=None, end=None, event_types=None, after_id=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """All matching events of the campaign, hot and archived, as dicts in id order."""
+    return heapq.merge(
+        _archived_rows(campaign_id, start, end, event_types, after_id, chunk_size),
+        _hot_rows(campaign_id, start, end, event_types, after_id, chunk_size),
+        key=lambda row: row['id'],
+    )
+
+
+def _chunked(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _timestamp(row):
+    return row['event_timestamp'].isoformat() if row['event_timestamp'] else None
+
+
+def csv_chunks(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue() # Header goes out before the first query returns
+    for chunk in _chunked(rows, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        for row in chunk:
+            writer.writerow([_timestamp(row) if c == 'event_timestamp' else row[c] for c in EXPORT_COLUMNS])
+        yield buffer.getvalue()
+
+
+def ndjson_chunks(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    for chunk in _chunked(rows, chunk_size):
+        yield ''.join(json.dumps({**row, 'event_timestamp': _timestamp(row)}, separators=(',', ':')) + '\n'
+                      for row in chunk)
+
+
+def gzip_chunks(chunks):
+    """
+    Gzip-compresses a stream of text chunks (wbits=31 writes a gzip header). Each chunk is
+    sync-flushed so the client receives it right away instead of when zlib's buffer fills.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        yield compressor.compress(chunk.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def export_stream(rows, output='csv', gzip=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    if output not in EXPORT_FORMATS:
+        raise ValueError(f"output must be one of {', '.join(EXPORT_FORMATS)}.")
+    chunks = csv_chunks(rows, chunk_size) if output == 'csv' else ndjson_chunks(rows, chunk_size)
+    if gzip:
+        return gzip_chunks(chunks)
+    return (chunk.encode('utf-8') for chunk in chunks)
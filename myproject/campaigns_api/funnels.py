@@ -0,0 +1,142 @@
+"""
+Funnel and cohort analysis of one campaign with pandas.
+
+The campaign's sent/delivered/opened/clicked events (archived ones included) are loaded
+in one query into a frame, reduced to each contact's first timestamp per stage, and every
+figure is derived from that contact x stage table with vectorized operations: stage counts,
+conversion rates, cohort splits on a Contact.custom_fields key and time-to-open percentiles.
+The endpoint serves results through the per-campaign report cache (reports.py).
+"""
+import numpy as np
+import pandas as pd
+
+from contacts_api.models import Contact
+from .archive import load_archived_events
+from .models import Campaign, CampaignAnalytics
+
+FUNNEL_STAGES = ['sent', 'delivered', 'opened', 'clicked']
+EVENT_COLUMNS = ['contact_id', 'event_type', 'event_timestamp']
+MISSING_COHORT = '(none)'
+OTHER_COHORT = '(other)'
+DEFAULT_COHORT_LIMIT = 20
+LOOKUP_CHUNK_SIZE = 900 # Stays under SQLite's bound-parameter limit
+
+# Time-to-open histogram buckets (upper edges in seconds) and their labels
+TIME_TO_OPEN_EDGES = [0, 5 * 60, 15 * 60, 3600, 6 * 3600, 86400, 3 * 86400, 7 * 86400, np.inf]
+TIME_TO_OPEN_LABELS = ['<5m', '5-15m', '15m-1h', '1-6h', '6-24h', '1-3d', '3-7d', '>7d']
+
+
+def load_stage_events(campaign_id):
+    """Funnel events of the campaign, hot and archived, as a frame of EVENT_COLUMNS."""
+    hot = pd.DataFrame.from_records(
+        CampaignAnalytics.objects.filter(campaign_id=campaign_id, event_type__in=FUNNEL_STAGES)
+        .values_list(*EVENT_COLUMNS).order_by(),
+        columns=EVENT_COLUMNS,
+    )
+    archived = load_archived_events([campaign_id], columns=EVENT_COLUMNS)
+    archived = archived[archived['event_type'].isin(FUNNEL_STAGES)]
+    frames = [frame for frame in (hot, archived) if not frame.empty]
+    events = pd.concat(frames, ignore_index=True) if frames else hot
+    events['event_timestamp'] = pd.to_datetime(events['event_timestamp'], utc=True)
+    return events
+
+
+def first_stage_times(events):
+    """One row per contact, one column per funnel stage: the contact's first event time (NaT if never reached)."""
+    if events.empty:
+        return pd.DataFrame({stage: pd.Series(dtype='datetime64[ns, UTC]') for stage in FUNNEL_STAGES})
+    firsts = events.groupby(['contact_id', 'event_type'])['event_timestamp'].min().unstack('event_type')
+    return firsts.reindex(columns=FUNNEL_STAGES)
+
+
+def _rate(numerator, denominator):
+    """Percentages rounded like stats_payload, 0 where the denominator is 0. Works on scalars and arrays."""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = np.where(denominator > 0, numerator / denominator * 100, 0.0)
+    return np.round(rates, 2)
+
+
+def funnel_rows(reached):
+    """Contacts per stage with conversion from the previous stage and from 'sent'."""
+    counts = reached.sum().to_numpy()
+    from_previous = _rate(counts, np.concatenate([[counts[0]], counts[:-1]]))
+    from_sent = _rate(counts, np.full(len(counts), counts[0]))
+    return [
+        {'stage': stage, 'contacts': int(n), 'rate_from_previous': float(prev), 'rate_from_sent': float(sent)}
+        for stage, n, prev, sent in zip(FUNNEL_STAGES, counts, from_previous, from_sent)
+    ]
+
+
+def cohort_rows(reached, cohorts, limit=DEFAULT_COHORT_LIMIT):
+    """
+    Funnel per cohort value. `cohorts` maps contact_id -> value; the `limit` largest cohorts by
+    contacts sent are kept and the rest are folded into '(other)'.
+    """
+    labels = cohorts.reindex(reached.index).fillna(MISSING_COHORT).astype(str)
+    sizes = reached['sent'].groupby(labels).sum().sort_values(ascending=False, kind='stable')
+    if len(sizes) > limit:
+        labels = labels.where(labels.isin(sizes.index[:limit]), OTHER_COHORT)
+    table = reached.groupby(labels).sum()
+    # Largest cohorts first, ties by name; the catch-all '(none)' / '(other)' rows go last
+    table = table.loc[sorted(table.index, key=lambda c: (c in (MISSING_COHORT, OTHER_COHORT), -table.at[c, 'sent'], c))]
+    sent = table['sent'].to_numpy()
+    rates = {stage: _rate(table[stage].to_numpy(), sent) for stage in FUNNEL_STAGES[1:]}
+    return [
+        {
+            'cohort': cohort,
+            **{stage: int(table[stage].iloc[i]) for stage in FUNNEL_STAGES},
+            **{f'{stage}_rate_on_sent': float(rates[stage][i]) for stage in FUNNEL_STAGES[1:]},
+        }
+        for i, cohort in enumerate(table.index)
+    ]
+
+
+def time_to_open(firsts):
+    """Distribution of (first open - first send) over contacts that opened, in seconds."""
+    seconds = (firsts['opened'] - firsts['sent']).dt.total_seconds().dropna().clip(lower=0).to_numpy()
+    if not len(seconds):
+        return {'contacts': 0, 'mean_seconds': None, 'percentiles_seconds': {},
+                'histogram': [{'bucket': label, 'contacts': 0} for label in TIME_TO_OPEN_LABELS]}
+    percentiles = np.percentile(seconds, [25, 50, 75, 90, 99])
+    histogram, _ = np.histogram(seconds, bins=TIME_TO_OPEN_EDGES)
+    return {
+        'contacts': int(len(seconds)),
+        'mean_seconds': round(float(seconds.mean()), 1),
+        'percentiles_seconds': {f'p{p}': round(float(v), 1) for p, v in zip([25, 50, 75, 90, 99], percentiles)},
+        'histogram': [{'bucket': label, 'contacts': int(n)} for label, n in zip(TIME_TO_OPEN_LABELS, histogram)],
+    }
+
+
+def _cohort_values(campaign_id, owner_id, field, contact_ids):
+    """
+    contact_id -> Contact.custom_fields[field] over the campaign's recipients, as a Series.
+    The recipients come from a subquery on the campaign's hot 'sent' events, so it stays one query
+    however large the owner's list; contacts known only from archived events are looked up by id.
+    """
+    recipients = CampaignAnalytics.objects.filter(campaign_id=campaign_id, event_type='sent').values('contact_id')
+    contacts = Contact.objects.filter(owner_id=owner_id)
+    values = dict(contacts.filter(id__in=recipients).values_list('id', f'custom_fields__{field}').order_by()
+                  .iterator(chunk_size=5000))
+    missing = [int(pk) for pk in contact_ids if pk not in values]
+    for start in range(0, len(missing), LOOKUP_CHUNK_SIZE):
+        values.update(contacts.filter(id__in=missing[start:start + LOOKUP_CHUNK_SIZE])
+                      .values_list('id', f'custom_fields__{field}').order_by())
+    return pd.Series(values, dtype=object)
+
+
+def compute_funnel_report(campaign_id, cohort_fields=(), cohort_limit=DEFAULT_COHORT_LIMIT):
+    owner_id = Campaign.objects.values_list('owner_id', flat=True).get(pk=campaign_id)
+    firsts = first_stage_times(load_stage_events(campaign_id))
+    reached = firsts.notna().astype(np.int64)
+    report = {
+        'funnel': funnel_rows(reached),
+        'time_to_open': time_to_open(firsts),
+        'cohorts': {},
+    }
+    for field in cohort_fields:
+        cohorts = _cohort_values(campaign_id, owner_id, field, reached.index)
+        report['cohorts'][field] = cohort_rows(reached, cohorts, limit=cohort_limit)
+    return report
+
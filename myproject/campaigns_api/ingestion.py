@@ -0,0 +1,199 @@
+"""
+SES event ingestion shared by every entry point that receives SES notifications
+(the HTTP webhook, the SQS pull consumer, ...).
+
+`ingest_ses_event` maps one SES event onto CampaignAnalytics and applies side
+effects such as contact suppression. It raises on unexpected errors so callers
+that batch work in a transaction can roll back; `process_ses_event` is the
+forgiving wrapper used by the webhook, which only logs failures.
+"""
+import json
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from contacts_api.engagement import EngagementSink
+from contacts_api.suppression import SuppressionSink
+from .models import CampaignAnalytics
+from .event_storage import extract_event_fields, inline_details, store_raw_payload
+from .aggregates import record_event
+from .links import resolve_link_id
+
+logger = logging.getLogger(__name__)
+
+# Convert SES event type to our internal event_type
+# This mapping needs to be robust.
+SES_EVENT_TYPE_MAP = {
+    'Send': 'sent', # Note: Our 'sent' is pre-SES. SES 'Send' is actual attempt by SES.
+                    # We might not use SES 'Send' if we create our 'sent' record from the task.
+    'Delivery': 'delivered',
+    'Bounce': 'bounced',
+    'Open': 'opened',
+    'Click': 'clicked',
+    'Complaint': 'complaint',
+    'Reject': 'rejected',
+    # Add any other SES event types you handle
+}
+
+
+def parse_sns_envelope(body):
+    """
+    Extracts the SES event dict from an SNS notification body.
+    Accepts either an SNS envelope ({"Type": "Notification", "Message": "<json>"}) or,
+    when raw message delivery is enabled on the subscription, the SES event itself.
+    Raises ValueError (json.JSONDecodeError) on malformed input.
+    """
+    payload = json.loads(body) if isinstance(body, (str, bytes)) else body
+    if not isinstance(payload, dict):
+        raise ValueError("SNS body is not a JSON object.")
+    if payload.get('Type') == 'Notification' and 'Message' in payload:
+        message = payload['Message']
+        payload = json.loads(message) if isinstance(message, str) else message
+        if not isinstance(payload, dict):
+            raise ValueError("SNS Message is not a JSON object.")
+    return payload
+
+
+def _parse_ses_timestamp(ses_timestamp_str):
+    event_time = timezone.now() # Default to now
+    if ses_timestamp_str:
+        try:
+            # SES timestamp is like "2023-10-27T10:30:00.123Z"
+            event_time = timezone.datetime.fromisoformat(ses_timestamp_str.replace('Z', '+00:00'))
+        except ValueError:
+            logger.warning(f"SES Event Processing: Could not parse SES timestamp '{ses_timestamp_str}'. Using current time.")
+    return event_time
+
+
+def _affected_recipients(internal_event_type, event_data):
+    """Addresses named by a bounce/complaint event (SES may list several recipients)."""
+    if internal_event_type == 'bounced':
+        recipients = (event_data.get('bounce') or {}).get('bouncedRecipients') or []
+    else:
+        recipients = (event_data.get('complaint') or {}).get('complainedRecipients') or []
+    return [r.get('emailAddress') for r in recipients if isinstance(r, dict)]
+
+
+def ingest_ses_event(event_data, suppression_sink=None, engagement_sink=None):
+    """
+    Processes the content of an SES event notification (from the 'Message' field of an SNS notification).
+    Creates or updates CampaignAnalytics records.
+
+    Bounces and complaints are queued on `suppression_sink` so batch callers can apply them with
+    one UPDATE per flush; opens and clicks go to `engagement_sink` the same way. Without a sink
+    the change is flushed immediately.
+
+    Returns the CampaignAnalytics row that was written, or None if the event was skipped
+    (unknown type, missing message id, no matching 'sent' record). Database errors propagate.
+    """
+    ses_event_type = event_data.get('eventType')
+    mail_data = event_data.get('mail', {})
+    ses_message_id = mail_data.get('messageId')
+    # When the event happened: the per-type object ("open", "delivery", "bounce", "complaint",
+    # "click") carries it; mail.timestamp is the send time, used only when that is missing.
+    event_details = event_data.get((ses_event_type or '').lower())
+    ses_timestamp_str = (event_details.get('timestamp') if isinstance(event_details, dict) else None) or mail_data.get('timestamp')
+
+    if not ses_message_id:
+        logger.error("SES Event Processing: No ses_message_id found in event_data.")
+        return None
+
+    internal_event_type = SES_EVENT_TYPE_MAP.get(ses_event_type)
+
+    if not internal_event_type:
+        logger.warning(f"SES Event Processing: Unknown SES eventType '{ses_event_type}'. Skipping.")
+        return None
+
+    # Try to find the original 'sent' record to link campaign and contact
+    # This assumes 'send_campaign_task' created a 'sent' event with this ses_message_id
+    original_sent_event = CampaignAnalytics.objects.select_related('campaign', 'contact').filter(
+        ses_message_id=ses_message_id,
+        # event_type='sent' # Or, if SES 'Send' is the first event we rely on from webhook
+    ).first() # Get the first one if multiple (should not happen for 'sent' with unique ses_message_id)
+
+    if not original_sent_event:
+        # This case means SES sent an event for a messageId we don't have a 'sent' record for.
+        # This could happen if:
+        # 1. Our 'send_campaign_task' failed to record the 'sent' event.
+        # 2. The messageId is from a source outside our app (e.g., direct SES console send).
+        # 3. There's a significant delay and the webhook arrives before our task commits. (Less likely with Celery)
+        # For now, we log this. In a more complex system, you might try to deduce campaign/contact
+        # from custom headers in mail_data.commonHeaders if you set them.
+        logger.warning(f"SES Event Processing: No initial 'sent' record found for ses_message_id '{ses_message_id}'. Cannot associate event '{internal_event_type}'.")
+        return None
+
+    campaign_obj = original_sent_event.campaign
+    contact_obj = original_sent_event.contact
+    event_time = _parse_ses_timestamp(ses_timestamp_str)
+
+    # One record per (campaign, contact, ses_message_id, event_type); repeated
+    # notifications for the same event type update the existing row.
+    # Clicks are the exception: every click is its own row, keyed by link and click time,
+    # so per-link totals count repeat clicks while SNS redeliveries still update one row.
+    click_lookup = {}
+    if internal_event_type == 'clicked':
+        click = event_data.get('click') or {}
+        click_lookup = {
+            'link_id': resolve_link_id(campaign_obj.template_id, click.get('link')),
+            'event_timestamp': event_time,
+        }
+
+    extracted = {'event_timestamp': event_time, **extract_event_fields(internal_event_type, event_data)}
+    with transaction.atomic(): # Event row and aggregates commit together
+        analytics_event, created = CampaignAnalytics.objects.get_or_create(
+            campaign=campaign_obj,
+            contact=contact_obj,
+            ses_message_id=ses_message_id,
+            event_type=internal_event_type, # This makes a new record for each event type
+            **click_lookup,
+            defaults={
+                'details': inline_details(event_data), # Full SES event only in 'inline' payload mode
+                **extracted,
+            }
+        )
+        if created:
+            # The raw payload is kept as first received: a redelivery that is not sampled, or arrives
+            # after the payload mode changed, must not replace it with nothing.
+            store_raw_payload(analytics_event, event_data)
+            record_event(analytics_event)
+        else:
+            for field, value in extracted.items():
+                setattr(analytics_event, field, value)
+            analytics_event.save(update_fields=list(extracted))
+
+    if created:
+        logger.info(f"SES Event Processing: Created new CampaignAnalytics record for event '{internal_event_type}', campaign '{campaign_obj.id}', contact '{contact_obj.id}'.")
+    else:
+        logger.info(f"SES Event Processing: Updated existing CampaignAnalytics record for event '{internal_event_type}', campaign '{campaign_obj.id}', contact '{contact_obj.id}'.")
+
+    if created and internal_event_type in ['opened', 'clicked']:
+        sink = engagement_sink if engagement_sink is not None else EngagementSink()
+        sink.add(contact_obj.id, internal_event_type, analytics_event.event_timestamp)
+        if engagement_sink is None:
+            sink.flush()
+
+    # Further actions based on event type (e.g., update contact's bounce status)
+    if internal_event_type in ['bounced', 'complaint']:
+        sink = suppression_sink if suppression_sink is not None else SuppressionSink()
+        sink.add(
+            campaign_obj.owner_id,
+            internal_event_type,
+            contact_id=contact_obj.id,
+            emails=[contact_obj.email] + _affected_recipients(internal_event_type, event_data),
+        )
+        if suppression_sink is None:
+            sink.flush()
+        logger.info(f"Contact {contact_obj.id} queued for suppression due to {internal_event_type} event.")
+
+    return analytics_event
+
+
+def process_ses_event(event_data, suppression_sink=None, engagement_sink=None):
+    """Like ingest_ses_event, but logs and swallows unexpected errors (webhook behaviour)."""
+    try:
+        return ingest_ses_event(event_data, suppression_sink=suppression_sink, engagement_sink=engagement_sink)
+    except Exception as e:
+        ses_message_id = (event_data.get('mail') or {}).get('messageId')
+        logger.error(f"SES Event Processing: Error processing event for ses_message_id '{ses_message_id}': {str(e)}", exc_info=True)
+        return None
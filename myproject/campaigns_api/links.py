@@ -0,0 +1,120 @@
+"""
+Per-link click tracking.
+
+Click events are matched to a TemplateLink of the campaign's template when they are ingested
+(`resolve_link_id`) and counted in CampaignLinkStats by aggregates.record_event, under the
+CampaignStats row lock that already serializes first-time checks. The links report reads only
+those counters and the link table.
+"""
+import pandas as pd
+from django.db import transaction
+from django.db.models import Count, F
+
+from templates_api.links import url_hash
+from templates_api.models import TemplateLink
+from .archive import archived_campaign_ids, archived_click_exists, load_archived_events
+from .models import CampaignAnalytics, CampaignLinkStats
+
+
+def resolve_link_id(template_id, url):
+    """Id of the template's TemplateLink for a clicked URL, or None for untracked URLs."""
+    if not template_id or not url:
+        return None
+    return (TemplateLink.objects.filter(template_id=template_id, url_hash=url_hash(url.strip()))
+            .values_list('id', flat=True).first())
+
+
+def record_link_click(analytics_event, check_archive=False):
+    """
+    Bumps the link counters for a freshly created click row. Runs inside record_event's transaction.
+    `check_archive` also looks for earlier clicks in archived partitions (campaigns with has_archive).
+    """
+    link_stats, _ = CampaignLinkStats.objects.get_or_create(
+        campaign_id=analytics_event.campaign_id, link_id=analytics_event.link_id)
+    first_click = not CampaignAnalytics.objects.filter(
+        campaign_id=analytics_event.campaign_id,
+        link_id=analytics_event.link_id,
+        contact_id=analytics_event.contact_id,
+    ).exclude(pk=analytics_event.pk).exists() # Served by the (campaign, link, contact) index
+    if first_click and check_archive:
+        first_click = not archived_click_exists(
+            analytics_event.campaign_id, analytics_event.link_id, analytics_event.contact_id)
+    updates = {'total_clicks': F('total_clicks') + 1}
+    if first_click:
+        updates['unique_clicks'] = F('unique_clicks') + 1
+    CampaignLinkStats.objects.filter(pk=link_stats.pk).update(**updates)
+    return first_click
+
+
+def assign_click_links(campaign_ids):
+    """Backfills `link` on click rows recorded before link tracking, by matching click_url. Returns rows updated."""
+    updated = 0
+    untracked = (CampaignAnalytics.objects
+                 .filter(campaign_id__in=campaign_ids, event_type='clicked', link__isnull=True, click_url__isnull=False)
+                 .values_list('campaign_id', 'campaign__template_id', 'click_url').distinct().order_by())
+    for campaign_id, template_id, url in list(untracked):
+        link_id = resolve_link_id(template_id, url)
+        if link_id:
+            updated += CampaignAnalytics.objects.filter(
+                campaign_id=campaign_id, event_type='clicked', link__isnull=True, click_url=url).update(link_id=link_id)
+    return updated
+
+
+def rebuild_link_stats(campaign_ids):
+    """Recomputes CampaignLinkStats from click rows, archived ones included. Returns the number of rows written."""
+    campaign_ids = list(campaign_ids)
+    assign_click_links(campaign_ids)
+    archived_ids = archived_campaign_ids(campaign_ids)
+    counters = {}
+    rows = (CampaignAnalytics.objects
+            .filter(campaign_id__in=[cid for cid in campaign_ids if cid not in archived_ids],
+                    event_type='clicked', link__isnull=False)
+            .values('campaign_id', 'link_id')
+            .annotate(total=Count('id'), unique=Count('contact_id', distinct=True))
+            .order_by())
+    for row in rows:
+        counters[(row['campaign_id'], row['link_id'])] = (row['total'], row['unique'])
+
+    if archived_ids:
+        keys = ['id', 'campaign_id', 'link_id', 'contact_id']
+        hot = pd.DataFrame.from_records(
+            CampaignAnalytics.objects.filter(campaign_id__in=archived_ids, event_type='clicked', link__isnull=False)
+            .values_list(*keys).order_by(), columns=keys)
+        archived = load_archived_events(archived_ids, columns=keys + ['event_type'])
+        archived = archived[(archived['event_type'] == 'clicked') & archived['link_id'].notna()][keys]
+        clicks = pd.concat([hot, archived], ignore_index=True)
+        grouped = clicks.groupby(['campaign_id', 'link_id']).agg(total=('id', 'size'), unique=('contact_id', 'nunique'))
+        for (campaign_id, link_id), row in grouped.iterrows():
+            counters[(int(campaign_id), int(link_id))] = (int(row['total']), int(row['unique']))
+
+    with transaction.atomic():
+        CampaignLinkStats.objects.filter(campaign_id__in=campaign_ids).delete()
+        CampaignLinkStats.objects.bulk_create([
+            CampaignLinkStats(campaign_id=c, link_id=link, total_clicks=total, unique_clicks=unique)
+            for (c, link), (total, unique) in counters.items()
+        ], batch_size=1000)
+    return len(counters)
+
+
+def link_report(campaign, unique_sent=0):
+    """
+    Per-link clicks of a campaign, most clicked first. Links of the template that were never
+    clicked are included with zero counts.
+    """
+    counters = {s.link_id: s for s in CampaignLinkStats.objects.filter(campaign=campaign).select_related('link')}
+    links = {link.id: link for link in TemplateLink.objects.filter(template_id=campaign.template_id)} if campaign.template_id else {}
+    links.update({link_id: s.link for link_id, s in counters.items()})
+
+    report = []
+    for link_id, link in links.items():
+        counter = counters.get(link_id)
+        total, unique = (counter.total_clicks, counter.unique_clicks) if counter else (0, 0)
+        report.append({
+            'link_id': link_id,
+            'url': link.url,
+            'total_clicks': total,
+            'unique_clicks': unique,
+            'unique_click_rate_on_sent': round(unique / unique_sent * 100, 2) if unique_sent else 0,
+        })
+    report.sort(key=lambda row: (-row['total_clicks'], row['link_id']))
+    return report
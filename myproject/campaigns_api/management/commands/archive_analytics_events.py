@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from campaigns_api.archive import archive_dir, archive_old_events, backfill_archived_keys
+
+
+class Command(BaseCommand):
+    help = 'Move old CampaignAnalytics events into compressed Parquet partitions and delete them from the hot table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Archive events older than this many days (defaults to settings.ANALYTICS_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--campaign', type=int, action='append', dest='campaign_ids',
+                            help='Campaign id to archive (repeatable). Defaults to all campaigns.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per fetch / Parquet record batch')
+        parser.add_argument('--backfill-keys', action='store_true',
+                            help='Only record the first-time check keys of partitions archived before they were kept')
+
+    def handle(self, *args, **options):
+        if options['backfill_keys']:
+            campaigns = backfill_archived_keys(options['campaign_ids'], batch_size=max(1, options['batch_size']))
+            self.stdout.write(self.style.SUCCESS(f"Backfilled archived event keys of {campaigns} campaigns."))
+            return
+        totals = archive_old_events(older_than_days=options['days'], campaign_ids=options['campaign_ids'],
+                                    batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {totals['events']} events into {totals['partitions']} partitions under {archive_dir()}."
+        ))
@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import transaction
+from contacts_api.models import Contact
+from templates_api.models import EmailTemplate
+from campaigns_api.models import Campaign, CampaignAnalytics
+from campaigns_api.sns_bench import (
+    SUPPORTED_EVENT_TYPES,
+    LocalCertificateServer,
+    build_ses_event,
+    build_signed_notification,
+    generate_signing_identity,
+    replay_payloads,
+)
+
+
+class Command(BaseCommand):
+    help = 'Replay signed SNS notifications against SESWebhookView offline and report throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1000, help='Number of notifications to replay')
+        parser.add_argument('--contacts', type=int, default=100, help='Number of synthetic recipients')
+        parser.add_argument('--rate', type=float, default=0,
+                            help='Target requests per second (0 = as fast as possible)')
+        parser.add_argument('--event-types', type=str, default=','.join(SUPPORTED_EVENT_TYPES),
+                            help='Comma separated SES event types to cycle through')
+        parser.add_argument('--keep-data', action='store_true',
+                            help='Commit the synthetic data instead of rolling it back')
+
+    def handle(self, *args, **options):
+        event_types = [t.strip() for t in options['event_types'].split(',') if t.strip()]
+        unknown = set(event_types) - set(SUPPORTED_EVENT_TYPES)
+        if unknown:
+            raise CommandError(f"Unsupported event types: {', '.join(sorted(unknown))}")
+        if options['events'] <= 0 or options['contacts'] <= 0:
+            raise CommandError('--events and --contacts must be positive')
+
+        self.stdout.write('Generating signing key and certificate...')
+        private_key, cert_pem = generate_signing_identity()
+
+        with LocalCertificateServer(cert_pem) as cert_server:
+            cert_url = cert_server.cert_url
+            self.stdout.write(f"Serving certificate at {cert_url}")
+
+            # All synthetic rows live inside one transaction that is rolled back at the end,
+            # so the benchmark can safely be pointed at a development database.
+            with transaction.atomic():
+                message_ids = self._create_fixture(options['contacts'])
+                payloads = []
+                for i in range(options['events']):
+                    message_id, email = message_ids[i % len(message_ids)]
+                    event_type = event_types[i % len(event_types)]
+                    payloads.append(build_signed_notification(
+                        build_ses_event(event_type, message_id, recipient=email), private_key, cert_url
+                    ))
+
+                self.stdout.write(f"Replaying {len(payloads)} notifications...")
+                report = replay_payloads(payloads, cert_url, rate=options['rate'])
+
+                if not options['keep_data']:
+                    transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+        for key in ['events', 'elapsed_seconds', 'requests_per_second', 'p50_ms', 'p99_ms', 'max_ms',
+                    'queries_per_event', 'status_counts']:
+            self.stdout.write(f"  {key}: {report[key]}")
+
+    def _create_fixture(self, contact_count):
+        """Creates a campaign with one 'sent' record per contact; returns [(ses_message_id, email)]."""
+        user, _ = User.objects.get_or_create(username='ses_bench_user')
+        template, _ = EmailTemplate.objects.get_or_create(
+            owner=user, name='SES Bench Template', defaults={'subject': 'Bench', 'body_html': '<p>Bench</p>'}
+        )
+        campaign, _ = Campaign.objects.get_or_create(
+            owner=user, name='SES Bench Campaign',
+            defaults={'template': template, 'recipient_group': {'type': 'all_contacts'}, 'status': 'sent'}
+        )
+        contacts = Contact.objects.bulk_create([
+            Contact(owner=user, email=f'bench-{campaign.id}-{i}@bench.example.com') for i in range(contact_count)
+        ])
+        CampaignAnalytics.objects.bulk_create([
+            CampaignAnalytics(campaign=campaign, contact=contact, event_type='sent',
+                              ses_message_id=f'bench-msg-{contact.id}')
+            for contact in contacts
+        ])
+        return [(f'bench-msg-{contact.id}', contact.email) for contact in contacts]
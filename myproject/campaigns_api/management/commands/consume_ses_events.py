@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from campaigns_api.sqs_consumer import SESEventQueueConsumer, SQS_MAX_BATCH_SIZE, SQS_MAX_WAIT_SECONDS
+
+
+class Command(BaseCommand):
+    help = 'Long-poll SES event notifications from SQS and ingest them (alternative to the HTTP webhook)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue-url', type=str, default=None,
+                            help='SQS queue URL (defaults to settings.SES_EVENTS_SQS_QUEUE_URL)')
+        parser.add_argument('--batch-size', type=int, default=SQS_MAX_BATCH_SIZE, help='Messages per receive (1-10)')
+        parser.add_argument('--wait-time', type=int, default=SQS_MAX_WAIT_SECONDS, help='Long-poll seconds (0-20)')
+        parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches')
+        parser.add_argument('--until-empty', action='store_true', help='Stop on the first empty receive')
+
+    def handle(self, *args, **options):
+        queue_url = options['queue_url'] or getattr(settings, 'SES_EVENTS_SQS_QUEUE_URL', '')
+        try:
+            consumer = SESEventQueueConsumer(
+                queue_url,
+                batch_size=options['batch_size'],
+                wait_time_seconds=options['wait_time'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"Consuming SES events from {queue_url}")
+        try:
+            totals = consumer.run(max_batches=options['max_batches'], stop_when_empty=options['until_empty'])
+        except KeyboardInterrupt:
+            self.stdout.write('Interrupted, exiting.')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Batches: {totals['batches']}, received: {totals['received']}, ingested: {totals['ingested']}, "
+            f"skipped: {totals['skipped']}, malformed: {totals['malformed']}, failed: {totals['failed']}, "
+            f"failed batches: {totals['failed_batches']}"
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from campaigns_api.event_storage import purge_expired_payloads
+
+
+class Command(BaseCommand):
+    help = 'Delete raw analytics payloads older than the retention window (typed columns are kept)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Retention in days (defaults to settings.ANALYTICS_RAW_PAYLOAD_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        payloads_deleted, details_cleared = purge_expired_payloads(retention_days=options['days'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {payloads_deleted} compressed payloads, cleared details on {details_cleared} events."
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from campaigns_api.models import Campaign
+from campaigns_api.aggregates import STATS_FIELD_BY_EVENT_TYPE, rebuild_campaign_rollups, rebuild_campaign_stats
+from campaigns_api.links import rebuild_link_stats
+from campaigns_api.report_cache import bump_events_version
+from campaigns_api.sketches import rebuild_campaign_sketches
+
+
+class Command(BaseCommand):
+    help = 'Rebuild CampaignStats counters, per-link clicks, engagement rollups and HyperLogLog sketches from raw CampaignAnalytics events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--campaign', type=int, action='append', dest='campaign_ids',
+                            help='Campaign id to rebuild (repeatable). Defaults to all campaigns.')
+        parser.add_argument('--archived', action='store_true',
+                            help='Only campaigns with archived events (after migration 0011, which counts hot events only)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Campaigns per grouped query')
+        parser.add_argument('--skip-rollups', action='store_true', help='Do not rebuild the engagement rollups')
+        parser.add_argument('--skip-sketches', action='store_true', help='Do not rebuild the HyperLogLog sketches')
+
+    def handle(self, *args, **options):
+        campaigns = Campaign.objects.filter(stats__has_archive=True) if options['archived'] else Campaign.objects.all()
+        campaign_ids = options['campaign_ids'] or list(campaigns.order_by('id').values_list('id', flat=True))
+        batch_size = max(1, options['batch_size'])
+        rebuilt = 0
+        rollup_rows = 0
+        sketch_rows = 0
+        link_rows = 0
+        for i in range(0, len(campaign_ids), batch_size):
+            batch = campaign_ids[i:i + batch_size]
+            rebuilt += len(rebuild_campaign_stats(batch))
+            link_rows += rebuild_link_stats(batch) # Also assigns link ids to clicks recorded before link tracking
+            if not options['skip_rollups']:
+                rollup_rows += rebuild_campaign_rollups(batch)
+            if not options['skip_sketches']:
+                sketch_rows += rebuild_campaign_sketches(batch, list(STATS_FIELD_BY_EVENT_TYPE))
+            for campaign_id in batch: # Cached reports may show the pre-rebuild numbers
+                bump_events_version(campaign_id)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt stats for {rebuilt} campaigns ({link_rows} link rows, {rollup_rows} rollup rows, {sketch_rows} sketch rows)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from campaigns_api.report_cache import cache_hit_stats
+from campaigns_api.reports import REPORT_BUILDERS
+
+
+class Command(BaseCommand):
+    help = 'Show hit, stale-hit and miss counts and the hit rate of the campaign report cache'
+
+    def handle(self, *args, **options):
+        for name, stats in cache_hit_stats(REPORT_BUILDERS).items():
+            self.stdout.write(
+                f"{name}: {stats['hit_rate']}% hit rate "
+                f"({stats['hits']} hits, {stats['stale_hits']} stale hits, {stats['misses']} misses)"
+            )
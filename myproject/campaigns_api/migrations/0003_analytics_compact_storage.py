@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns_api', '0002_alter_campaign_status_campaignanalytics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignAnalyticsPayload',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='raw_payload', serialize=False, to='campaigns_api.campaignanalytics')),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Campaign Analytic Raw Payload',
+                'verbose_name_plural': 'Campaign Analytic Raw Payloads',
+            },
+        ),
+        migrations.AddField(
+            model_name='campaignanalytics',
+            name='bounce_sub_type',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='campaignanalytics',
+            name='bounce_type',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='campaignanalytics',
+            name='click_url',
+            field=models.CharField(blank=True, max_length=2048, null=True),
+        ),
+        migrations.AddField(
+            model_name='campaignanalytics',
+            name='user_agent',
+            field=models.CharField(blank=True, max_length=512, null=True),
+        ),
+    ]
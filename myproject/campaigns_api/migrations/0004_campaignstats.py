@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns_api', '0003_analytics_compact_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignStats',
+            fields=[
+                ('campaign', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='campaigns_api.campaign')),
+                ('unique_sent', models.PositiveIntegerField(default=0)),
+                ('unique_delivered', models.PositiveIntegerField(default=0)),
+                ('unique_opened', models.PositiveIntegerField(default=0)),
+                ('unique_clicked', models.PositiveIntegerField(default=0)),
+                ('unique_bounced', models.PositiveIntegerField(default=0)),
+                ('unique_complaints', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Campaign Stats',
+                'verbose_name_plural': 'Campaign Stats',
+            },
+        ),
+    ]
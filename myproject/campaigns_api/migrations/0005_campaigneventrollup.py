@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns_api', '0004_campaignstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignEventRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('event_type', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('first_time_count', models.PositiveIntegerField(default=0)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_rollups', to='campaigns_api.campaign')),
+            ],
+            options={
+                'verbose_name': 'Campaign Event Rollup',
+                'verbose_name_plural': 'Campaign Event Rollups',
+                'ordering': ['bucket_start'],
+                'indexes': [models.Index(fields=['granularity', 'bucket_start'], name='campaigns_a_granula_dd3957_idx')],
+                'unique_together': {('campaign', 'granularity', 'bucket_start', 'event_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns_api', '0005_campaigneventrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignEventSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(max_length=20)),
+                ('granularity', models.CharField(choices=[('total', 'All time'), ('day', 'Daily')], max_length=5)),
+                ('bucket_start', models.DateTimeField()),
+                ('registers', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_sketches', to='campaigns_api.campaign')),
+            ],
+            options={
+                'verbose_name': 'Campaign Event Sketch',
+                'verbose_name_plural': 'Campaign Event Sketches',
+                'unique_together': {('campaign', 'event_type', 'granularity', 'bucket_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns_api', '0006_campaigneventsketch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaignstats',
+            name='has_archive',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='CampaignArchivePartition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('path', models.CharField(max_length=1024)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('min_timestamp', models.DateTimeField()),
+                ('max_timestamp', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archive_partitions', to='campaigns_api.campaign')),
+            ],
+            options={
+                'verbose_name': 'Campaign Archive Partition',
+                'verbose_name_plural': 'Campaign Archive Partitions',
+                'ordering': ['campaign', 'month', 'id'],
+                'indexes': [models.Index(fields=['campaign', 'month'], name='campaigns_a_campaig_86c19f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates_api', '0002_templatelink'),
+        ('campaigns_api', '0007_analytics_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignLinkStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_clicks', models.PositiveIntegerField(default=0)),
+                ('unique_clicks', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Campaign Link Stats',
+                'verbose_name_plural': 'Campaign Link Stats',
+            },
+        ),
+        migrations.AddField(
+            model_name='campaignanalytics',
+            name='link',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clicks', to='templates_api.templatelink'),
+        ),
+        migrations.AddIndex(
+            model_name='campaignanalytics',
+            index=models.Index(fields=['campaign', 'link', 'contact'], name='campaigns_a_campaig_3b5f1c_idx'),
+        ),
+        migrations.AddField(
+            model_name='campaignlinkstats',
+            name='campaign',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='link_stats', to='campaigns_api.campaign'),
+        ),
+        migrations.AddField(
+            model_name='campaignlinkstats',
+            name='link',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='campaign_stats', to='templates_api.templatelink'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='campaignlinkstats',
+            unique_together={('campaign', 'link')},
+        ),
+    ]
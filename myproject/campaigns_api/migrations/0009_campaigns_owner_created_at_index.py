@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns_api', '0008_link_tracking'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='campaign',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='campaigns_a_owner_i_8d532c_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    """
+    First-time check keys of archived events; see campaigns_api/archive.py. Keys of partitions
+    archived before this migration are read from Parquet after deploy, with
+    `manage.py archive_analytics_events --backfill-keys`.
+    """
+
+    dependencies = [
+        ('campaigns_api', '0009_campaigns_owner_created_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedLinkClickKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('link_id', models.BigIntegerField()),
+                ('contact_id', models.BigIntegerField()),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_link_click_keys', to='campaigns_api.campaign')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedEventKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contact_id', models.BigIntegerField()),
+                ('event_type', models.CharField(max_length=20)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_event_keys', to='campaigns_api.campaign')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='archivedlinkclickkey',
+            constraint=models.UniqueConstraint(fields=('campaign', 'link_id', 'contact_id'), name='archived_link_click_key_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='archivedeventkey',
+            constraint=models.UniqueConstraint(fields=('campaign', 'contact_id', 'event_type'), name='archived_event_key_unique'),
+        ),
+    ]
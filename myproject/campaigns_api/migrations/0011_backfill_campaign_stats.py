@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:32
+
+from django.db import migrations
+from django.db.models import Count
+
+STATS_FIELD_BY_EVENT_TYPE = { # Frozen copy of campaigns_api.aggregates.STATS_FIELD_BY_EVENT_TYPE
+    'sent': 'unique_sent',
+    'delivered': 'unique_delivered',
+    'opened': 'unique_opened',
+    'clicked': 'unique_clicked',
+    'bounced': 'unique_bounced',
+    'complaint': 'unique_complaints',
+}
+
+
+def build_missing_campaign_stats(apps, schema_editor):
+    # Hot events only, in one grouped query; campaigns with archived partitions are flagged
+    # has_archive and need `manage.py rebuild_campaign_stats` after deploy to count the Parquet rows.
+    Campaign = apps.get_model('campaigns_api', 'Campaign')
+    CampaignAnalytics = apps.get_model('campaigns_api', 'CampaignAnalytics')
+    CampaignArchivePartition = apps.get_model('campaigns_api', 'CampaignArchivePartition')
+    CampaignStats = apps.get_model('campaigns_api', 'CampaignStats')
+
+    missing_ids = list(Campaign.objects.filter(stats__isnull=True).values_list('id', flat=True))
+    if not missing_ids:
+        return
+    counts = {campaign_id: {} for campaign_id in missing_ids}
+    rows = (CampaignAnalytics.objects
+            .filter(campaign__stats__isnull=True, event_type__in=list(STATS_FIELD_BY_EVENT_TYPE))
+            .values('campaign_id', 'event_type')
+            .annotate(n=Count('contact_id', distinct=True))
+            .order_by())
+    for row in rows:
+        counts[row['campaign_id']][STATS_FIELD_BY_EVENT_TYPE[row['event_type']]] = row['n']
+    archived_ids = set(CampaignArchivePartition.objects.filter(campaign_id__in=missing_ids)
+                       .values_list('campaign_id', flat=True))
+    CampaignStats.objects.bulk_create(
+        [CampaignStats(campaign_id=campaign_id, has_archive=campaign_id in archived_ids, **fields)
+         for campaign_id, fields in counts.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+    """Counters for campaigns that predate CampaignStats, so the stats endpoints never build them on read."""
+
+    dependencies = [
+        ('campaigns_api', '0010_archived_event_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_missing_campaign_stats, migrations.RunPython.noop),
+    ]
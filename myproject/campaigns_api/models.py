@@ -1,7 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 # Corrected import for EmailTemplate, assuming it's in templates_api.models
-from templates_api.models import EmailTemplate
+from templates_api.models import EmailTemplate, TemplateLink
 from contacts_api.models import Contact # Corrected import for Contact
 from django.utils import timezone
 
@@ -42,6 +42,9 @@ class Campaign(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = [['owner', 'name']]
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id']), # Keyset pagination of the list endpoint
+        ]
         verbose_name = "Campaign"
         verbose_name_plural = "Campaigns"
 
@@ -70,6 +73,16 @@ class CampaignAnalytics(models.Model):
     event_timestamp = models.DateTimeField(default=timezone.now) # Use default=timezone.now for flexibility
     details = models.JSONField(null=True, blank=True)
 
+    # Typed copies of the SES payload fields we actually query. Filled on ingestion so reports
+    # don't have to parse `details`, which may be dropped or moved to CampaignAnalyticsPayload
+    # depending on settings.ANALYTICS_RAW_PAYLOAD_MODE (see campaigns_api/event_storage.py).
+    bounce_type = models.CharField(max_length=32, null=True, blank=True) # e.g. Permanent, Transient
+    bounce_sub_type = models.CharField(max_length=64, null=True, blank=True)
+    click_url = models.CharField(max_length=2048, null=True, blank=True)
+    user_agent = models.CharField(max_length=512, null=True, blank=True)
+    # Template link a click went to (campaigns_api/links.py); null for other events and untracked URLs
+    link = models.ForeignKey(TemplateLink, on_delete=models.SET_NULL, null=True, blank=True, related_name='clicks')
+
     # Specific timestamp fields for key positive events for easier querying, if needed.
     # These could also be derived from event_timestamp and event_type if details are always parsed.
     # opened_at = models.DateTimeField(null=True, blank=True)
@@ -84,6 +97,7 @@ class CampaignAnalytics(models.Model):
         indexes = [
             models.Index(fields=['campaign', 'contact', 'event_type']),
             models.Index(fields=['ses_message_id', 'event_type']),
+            models.Index(fields=['campaign', 'link', 'contact']), # Unique clicks per link
         ]
         ordering = ['-event_timestamp']
         verbose_name = "Campaign Analytic Event"
@@ -91,3 +105,179 @@ class CampaignAnalytics(models.Model):
 
     def __str__(self):
         return f"{self.campaign.name} - {self.contact.email} - {self.get_event_type_display()}"
+
+
+class CampaignAnalyticsPayload(models.Model):
+    """
+    Side table holding the raw SES payload of an analytics event, zlib-compressed JSON.
+    Only used when ANALYTICS_RAW_PAYLOAD_MODE is 'compressed'; rows may be sampled and
+    are purged after ANALYTICS_RAW_PAYLOAD_RETENTION_DAYS.
+    """
+    event = models.OneToOneField(CampaignAnalytics, on_delete=models.CASCADE, primary_key=True, related_name='raw_payload')
+    data = models.BinaryField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = "Campaign Analytic Raw Payload"
+        verbose_name_plural = "Campaign Analytic Raw Payloads"
+
+    def __str__(self):
+        return f"Raw payload for event {self.event_id}"
+
+
+class CampaignStats(models.Model):
+    """
+    Per-campaign unique-contact counters, maintained transactionally as analytics events are
+    written (campaigns_api/aggregates.py) so campaign_stats can answer without scanning
+    CampaignAnalytics. Rebuild from raw events with `manage.py rebuild_campaign_stats`.
+    """
+    campaign = models.OneToOneField(Campaign, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    unique_sent = models.PositiveIntegerField(default=0)
+    unique_delivered = models.PositiveIntegerField(default=0)
+    unique_opened = models.PositiveIntegerField(default=0)
+    unique_clicked = models.PositiveIntegerField(default=0)
+    unique_bounced = models.PositiveIntegerField(default=0)
+    unique_complaints = models.PositiveIntegerField(default=0)
+    # Set once events of the campaign have been moved to Parquet (campaigns_api/archive.py), so first-time
+    # checks know to look beyond the hot table without an extra query per event.
+    has_archive = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Campaign Stats"
+        verbose_name_plural = "Campaign Stats"
+
+    def __str__(self):
+        return f"Stats for campaign {self.campaign_id}"
+
+
+class CampaignEventRollup(models.Model):
+    """
+    Event counts per (campaign, time bucket, event_type), filled incrementally alongside
+    CampaignStats. Hourly and daily rows are written together; hourly rows older than
+    ANALYTICS_HOURLY_ROLLUP_RETENTION_DAYS are pruned, leaving the daily series.
+    """
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hourly'),
+        ('day', 'Daily'),
+    ]
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='event_rollups')
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    event_type = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0) # Events recorded in the bucket
+    first_time_count = models.PositiveIntegerField(default=0) # Contacts reaching this event type for the first time
+
+    class Meta:
+        unique_together = [['campaign', 'granularity', 'bucket_start', 'event_type']]
+        indexes = [
+            models.Index(fields=['granularity', 'bucket_start']), # Pruning old hourly rows
+        ]
+        ordering = ['bucket_start']
+        verbose_name = "Campaign Event Rollup"
+        verbose_name_plural = "Campaign Event Rollups"
+
+    def __str__(self):
+        return f"{self.campaign_id} {self.granularity} {self.bucket_start:%Y-%m-%d %H:%M} {self.event_type}: {self.count}"
+
+
+class CampaignEventSketch(models.Model):
+    """
+    HyperLogLog sketch of the distinct contacts reaching an event type in a campaign,
+    either over the campaign's lifetime ('total', bucket_start fixed at the Unix epoch)
+    or per UTC day. Sketches merge across days and campaigns (campaigns_api/sketches.py).
+    """
+    GRANULARITY_CHOICES = [
+        ('total', 'All time'),
+        ('day', 'Daily'),
+    ]
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='event_sketches')
+    event_type = models.CharField(max_length=20)
+    granularity = models.CharField(max_length=5, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    registers = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [['campaign', 'event_type', 'granularity', 'bucket_start']]
+        verbose_name = "Campaign Event Sketch"
+        verbose_name_plural = "Campaign Event Sketches"
+
+    def __str__(self):
+        return f"{self.campaign_id} {self.event_type} {self.granularity} {self.bucket_start:%Y-%m-%d}"
+
+
+class CampaignArchivePartition(models.Model):
+    """
+    One Parquet file of CampaignAnalytics rows moved out of the hot table by
+    campaigns_api/archive.py. Files live under ANALYTICS_ARCHIVE_DIR at
+    owner=<id>/campaign=<id>/month=YYYY-MM/; a month can hold several part files.
+    The timestamp bounds let readers skip partitions outside a requested range.
+    """
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='archive_partitions')
+    month = models.DateField() # First day of the (UTC) month the events belong to
+    path = models.CharField(max_length=1024) # Relative to ANALYTICS_ARCHIVE_DIR
+    row_count = models.PositiveIntegerField(default=0)
+    min_timestamp = models.DateTimeField()
+    max_timestamp = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['campaign', 'month']),
+        ]
+        ordering = ['campaign', 'month', 'id']
+        verbose_name = "Campaign Archive Partition"
+        verbose_name_plural = "Campaign Archive Partitions"
+
+    def __str__(self):
+        return f"{self.campaign_id} {self.month:%Y-%m} ({self.row_count} events)"
+
+
+class ArchivedEventKey(models.Model):
+    """
+    (campaign, contact, event type) of every event moved to Parquet, written by archive.py in the
+    transaction that registers the partition. record_event answers "has this contact had this
+    event before?" for archived campaigns from this index instead of reading the partitions.
+    contact_id is a plain column: archived events keep the ids of contacts deleted since.
+    """
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='archived_event_keys')
+    contact_id = models.BigIntegerField()
+    event_type = models.CharField(max_length=20)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['campaign', 'contact_id', 'event_type'], name='archived_event_key_unique'),
+        ]
+
+
+class ArchivedLinkClickKey(models.Model):
+    """(campaign, link, contact) of archived clicks: the first-click check of record_link_click."""
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='archived_link_click_keys')
+    link_id = models.BigIntegerField()
+    contact_id = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['campaign', 'link_id', 'contact_id'], name='archived_link_click_key_unique'),
+        ]
+
+
+class CampaignLinkStats(models.Model):
+    """
+    Click counters per (campaign, template link), maintained alongside CampaignStats as click
+    events are recorded. total_clicks counts every click, unique_clicks distinct contacts.
+    """
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='link_stats')
+    link = models.ForeignKey(TemplateLink, on_delete=models.CASCADE, related_name='campaign_stats')
+    total_clicks = models.PositiveIntegerField(default=0)
+    unique_clicks = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [['campaign', 'link']]
+        verbose_name = "Campaign Link Stats"
+        verbose_name_plural = "Campaign Link Stats"
+
+    def __str__(self):
+        return f"{self.campaign_id} link {self.link_id}: {self.total_clicks} clicks"
@@ -0,0 +1,155 @@
+"""
+Per-campaign caching of report responses in Django's cache framework.
+
+Every campaign has an "events version" in the cache, bumped whenever events are recorded
+for it (aggregates.record_event) and again once that transaction commits. A cached entry
+remembers the version it was computed at; when the version has moved on the entry is stale:
+it is still served for up to ANALYTICS_REPORT_CACHE_STALE_SECONDS while one background
+refresh (Celery task refresh_campaign_report) recomputes it, so polling clients never wait
+on a recompute. Hits, stale hits and misses are counted per report for hit-rate reporting.
+
+With several processes (web, Celery workers) the cache backend must be shared, e.g. Redis,
+for ingestion in one process to invalidate reports in another.
+"""
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+HIT, STALE, MISS = 'hit', 'stale', 'miss'
+REFRESH_LOCK_SECONDS = 60
+
+
+def report_cache_enabled():
+    return getattr(settings, 'ANALYTICS_REPORT_CACHE_ENABLED', True)
+
+
+def report_cache_timeout():
+    return getattr(settings, 'ANALYTICS_REPORT_CACHE_TIMEOUT', 3600)
+
+
+def stale_seconds():
+    return getattr(settings, 'ANALYTICS_REPORT_CACHE_STALE_SECONDS', 30)
+
+
+def _version_key(campaign_id):
+    return f'campaign-events-version:{campaign_id}'
+
+
+def events_version(campaign_id):
+    """Current events version of the campaign, created on first use."""
+    version = cache.get(_version_key(campaign_id))
+    if version is None:
+        # Start from the clock rather than 1: if the version key was evicted, entries cached
+        # under the old counter must not look current again.
+        version = time.time_ns()
+        if not cache.add(_version_key(campaign_id), version, timeout=None):
+            version = cache.get(_version_key(campaign_id), version)
+    return version
+
+
+def bump_events_version(campaign_id):
+    try:
+        cache.incr(_version_key(campaign_id))
+    except ValueError: # Key missing or evicted
+        cache.set(_version_key(campaign_id), time.time_ns(), timeout=None)
+
+
+def bump_events_version_on_commit(campaign_id):
+    """
+    Marks the campaign's cached reports stale now and again after commit: a report computed
+    concurrently from pre-commit data would otherwise be cached under the latest version.
+    """
+    bump_events_version(campaign_id)
+    transaction.on_commit(lambda: bump_events_version(campaign_id))
+
+
+def report_key(name, campaign_id, params=None):
+    digest = hashlib.sha1(json.dumps(params or {}, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+    return f'campaign-report:{name}:{campaign_id}:{digest}'
+
+
+def _count(name, outcome):
+    key = f'campaign-report-stats:{name}:{outcome}'
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def store_report(name, campaign_id, params, value, version):
+    cache.set(report_key(name, campaign_id, params),
+              {'value': value, 'version': version, 'stale_since': None}, timeout=report_cache_timeout())
+
+
+def cached_report(name, campaign_id, params, compute, revalidate):
+    """
+    Returns (value, outcome) for report `name` of the campaign with `params` (JSON-serializable),
+    where outcome is HIT, STALE or MISS. `compute()` builds the value synchronously on a miss;
+    `revalidate()` is called to refresh a stale entry in the background.
+    """
+    if not report_cache_enabled():
+        return compute(), MISS
+    key = report_key(name, campaign_id, params)
+    version = events_version(campaign_id)
+    entry = cache.get(key)
+
+    if entry is not None and entry['version'] == version:
+        _count(name, HIT)
+        return entry['value'], HIT
+
+    if entry is not None and stale_seconds() > 0:
+        now = time.time()
+        if entry['stale_since'] is None:
+            entry['stale_since'] = now
+            cache.set(key, entry, timeout=report_cache_timeout())
+        if now - entry['stale_since'] <= stale_seconds():
+            scheduled = True
+            if cache.add(f'{key}:refreshing', 1, timeout=REFRESH_LOCK_SECONDS): # One refresh at a time
+                try:
+                    revalidate()
+                except Exception as e: # e.g. broker down: recompute synchronously below
+                    cache.delete(f'{key}:refreshing')
+                    logger.warning(f"Report cache: could not schedule refresh of {key}: {e}")
+                    scheduled = False
+            if scheduled:
+                _count(name, STALE)
+                return entry['value'], STALE
+
+    value = compute()
+    store_report(name, campaign_id, params, value, version)
+    _count(name, MISS)
+    return value, MISS
+
+
+def refresh_report(name, campaign_id, params, compute):
+    """Recomputes and stores a report (the background half of stale-while-revalidate)."""
+    key = report_key(name, campaign_id, params)
+    try:
+        version = events_version(campaign_id) # Read first: events arriving meanwhile leave the entry stale
+        store_report(name, campaign_id, params, compute(), version)
+    finally:
+        cache.delete(f'{key}:refreshing')
+
+
+def cache_hit_stats(names):
+    """{name: {'hits', 'stale_hits', 'misses', 'hit_rate'}}; stale hits count as hits for the rate."""
+    stats = {}
+    for name in names:
+        counts = cache.get_many([f'campaign-report-stats:{name}:{outcome}' for outcome in (HIT, STALE, MISS)])
+        hits, stale, misses = (counts.get(f'campaign-report-stats:{name}:{outcome}', 0) for outcome in (HIT, STALE, MISS))
+        total = hits + stale + misses
+        stats[name] = {
+            'hits': hits,
+            'stale_hits': stale,
+            'misses': misses,
+            'hit_rate': round((hits + stale) / total * 100, 2) if total else 0,
+        }
+    return stats
@@ -0,0 +1,88 @@
+"""
+Campaign report endpoints served through report_cache.
+
+Each report is a builder `(campaign, params) -> response body`. Params are the normalized,
+JSON-serializable query parameters, so the same (report, campaign, params) triple can be
+recomputed by the refresh_campaign_report Celery task when a cached entry goes stale.
+"""
+from django.utils.dateparse import parse_datetime
+
+from .aggregates import STATS_FIELD_BY_EVENT_TYPE, campaign_timeline, get_campaign_stats, stats_payload
+from .funnels import compute_funnel_report
+from .links import link_report
+from .models import Campaign
+from .report_cache import cached_report, refresh_report
+from .sketches import approx_unique_counts, error_bound
+
+
+def _datetime(value):
+    return parse_datetime(value) if value else None
+
+
+def approx_counts(campaign_ids, start=None, end=None):
+    """Sketch estimates keyed by CampaignStats field name, ready for stats_payload()."""
+    estimates = approx_unique_counts(campaign_ids, list(STATS_FIELD_BY_EVENT_TYPE), start=start, end=end)
+    return {STATS_FIELD_BY_EVENT_TYPE[event_type]: n for event_type, n in estimates.items()}
+
+
+def build_stats(campaign, params):
+    if not params.get('approx'):
+        return stats_payload(campaign.id, campaign.name, get_campaign_stats(campaign))
+    start, end = _datetime(params.get('start')), _datetime(params.get('end'))
+    counts = approx_counts([campaign.id], start, end)
+    if start or end:
+        # Rates are meaningless when sends fall outside the range, so only unique counts are returned.
+        payload = {'campaign_id': campaign.id, 'campaign_name': campaign.name,
+                   **{f"total_{field.replace('unique_', '')}": n for field, n in counts.items()},
+                   **{name: params[name] for name in ('start', 'end') if params.get(name)}}
+    else:
+        payload = stats_payload(campaign.id, campaign.name, counts)
+    payload.update({'approximate': True, 'relative_standard_error': error_bound()})
+    return payload
+
+
+def build_timeline(campaign, params):
+    data = campaign_timeline(
+        campaign,
+        granularity=params['granularity'],
+        start=_datetime(params.get('start')),
+        end=_datetime(params.get('end')),
+        event_types=params.get('event_types') or None,
+        metric=params['metric'],
+    )
+    return {'campaign_id': campaign.id, 'campaign_name': campaign.name, **data}
+
+
+def build_links(campaign, params):
+    unique_sent = get_campaign_stats(campaign).unique_sent
+    return {'campaign_id': campaign.id, 'campaign_name': campaign.name,
+            'links': link_report(campaign, unique_sent=unique_sent)}
+
+
+def build_funnel(campaign, params):
+    report = compute_funnel_report(campaign.id, cohort_fields=params['cohorts'], cohort_limit=params['limit'])
+    return {'campaign_id': campaign.id, 'campaign_name': campaign.name, **report}
+
+
+REPORT_BUILDERS = {
+    'stats': build_stats,
+    'timeline': build_timeline,
+    'links': build_links,
+    'funnel': build_funnel,
+}
+
+
+def campaign_report(name, campaign, params):
+    """Response body of report `name`, from cache when possible. Returns (body, cache outcome)."""
+    from .tasks import refresh_campaign_report
+    build = REPORT_BUILDERS[name]
+    return cached_report(
+        name, campaign.id, params,
+        compute=lambda: build(campaign, params),
+        revalidate=lambda: refresh_campaign_report.delay(name, campaign.id, params),
+    )
+
+
+def refresh_campaign_report_now(name, campaign_id, params):
+    campaign = Campaign.objects.get(pk=campaign_id)
+    refresh_report(name, campaign_id, params, lambda: REPORT_BUILDERS[name](campaign, params))
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Campaign
 from templates_api.models import EmailTemplate # For validating template ID
+from contacts_api.models import Segment
 from django.contrib.auth.models import User
 
 class CampaignSerializer(serializers.ModelSerializer):
@@ -39,6 +40,19 @@ class CampaignSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("The selected template does not belong to you.")
         return value
 
+    def validate_recipient_group(self, value):
+        """
+        A {"type": "segment", "id": ...} group must name one of the current user's segments.
+        """
+        if isinstance(value, dict) and value.get('type') == 'segment':
+            request = self.context.get('request', None)
+            segments = Segment.objects.filter(pk=value.get('id')) if isinstance(value.get('id'), int) else Segment.objects.none()
+            if request and hasattr(request, 'user') and request.user.is_authenticated:
+                segments = segments.filter(owner=request.user)
+            if not segments.exists():
+                raise serializers.ValidationError("The selected segment does not exist or does not belong to you.")
+        return value
+
     def validate(self, data):
         """
         Custom validation for the whole object.
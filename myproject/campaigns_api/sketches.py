@@ -0,0 +1,119 @@
+"""
+HyperLogLog sketches per (campaign, event_type), all-time and per UTC day.
+
+Maintained by aggregates.record_event under the campaign's CampaignStats row lock,
+so the read-modify-write of a sketch cannot lose updates. Rows are only rewritten
+when a register actually changes, which becomes rare once a sketch has warmed up.
+Stats endpoints use these for `approx=true` answers: day sketches merge into any
+date range and sketches of several campaigns merge into a cross-campaign count.
+"""
+import itertools
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+
+from .archive import load_archived_events
+from .hll import HyperLogLog, relative_standard_error
+from .models import CampaignAnalytics, CampaignEventSketch
+
+TOTAL_BUCKET = datetime(1970, 1, 1, tzinfo=dt_timezone.utc) # bucket_start used by 'total' sketches
+
+
+def sketches_enabled():
+    return getattr(settings, 'ANALYTICS_HLL_ENABLED', True)
+
+
+def sketch_precision():
+    return getattr(settings, 'ANALYTICS_HLL_PRECISION', 12)
+
+
+def error_bound():
+    """Documented error for approx answers: one relative standard error (~68% of estimates fall within)."""
+    return round(relative_standard_error(sketch_precision()), 4)
+
+
+def _day(moment):
+    return moment.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_to_sketch(campaign_id, event_type, granularity, bucket, contact_id):
+    sketch_row, created = CampaignEventSketch.objects.select_for_update().get_or_create(
+        campaign_id=campaign_id, event_type=event_type, granularity=granularity, bucket_start=bucket,
+        defaults={'registers': HyperLogLog(sketch_precision()).to_bytes()},
+    )
+    sketch = HyperLogLog.from_bytes(sketch_row.registers)
+    if sketch.add(contact_id) or created:
+        sketch_row.registers = sketch.to_bytes()
+        sketch_row.save(update_fields=['registers', 'updated_at'])
+
+
+def update_sketches(analytics_event, first_time):
+    """Adds the event's contact to the campaign's all-time and daily sketches."""
+    if not sketches_enabled():
+        return
+    with transaction.atomic():
+        if first_time: # The contact is already in the all-time sketch otherwise
+            _add_to_sketch(analytics_event.campaign_id, analytics_event.event_type, 'total', TOTAL_BUCKET,
+                           analytics_event.contact_id)
+        _add_to_sketch(analytics_event.campaign_id, analytics_event.event_type, 'day',
+                       _day(analytics_event.event_timestamp), analytics_event.contact_id)
+
+
+def approx_unique_counts(campaign_ids, event_types, start=None, end=None):
+    """
+    Approximate distinct contacts per event type across the given campaigns, optionally limited
+    to UTC days overlapping [start, end]. One query loads every sketch involved; merging is in memory,
+    at the lowest precision among them (rebuild_campaign_sketches re-sketches at the current one).
+    Returns {event_type: estimate}.
+    """
+    sketches = CampaignEventSketch.objects.filter(campaign_id__in=campaign_ids, event_type__in=event_types)
+    if start or end:
+        sketches = sketches.filter(granularity='day')
+        if start:
+            sketches = sketches.filter(bucket_start__gte=_day(start))
+        if end:
+            sketches = sketches.filter(bucket_start__lte=_day(end))
+    else:
+        sketches = sketches.filter(granularity='total')
+
+    merged = {}
+    for event_type, registers in sketches.values_list('event_type', 'registers').iterator():
+        sketch = HyperLogLog.from_bytes(registers)
+        if event_type not in merged:
+            merged[event_type] = sketch
+            continue
+        # Buckets written before an ANALYTICS_HLL_PRECISION change: merge at the lower precision
+        current = merged[event_type]
+        if sketch.precision > current.precision:
+            sketch = sketch.fold(current.precision)
+        elif sketch.precision < current.precision:
+            current = merged[event_type] = current.fold(sketch.precision)
+        current.merge(sketch)
+    return {event_type: merged[event_type].count() if event_type in merged else 0 for event_type in event_types}
+
+
+def rebuild_campaign_sketches(campaign_ids, event_types):
+    """Recomputes all-time and daily sketches from raw events, archived ones included. Returns the number of sketch rows written."""
+    campaign_ids = list(campaign_ids)
+    precision = sketch_precision()
+    sketches = {}
+    events = (CampaignAnalytics.objects.filter(campaign_id__in=campaign_ids, event_type__in=event_types)
+              .values_list('campaign_id', 'event_type', 'contact_id', 'event_timestamp')
+              .order_by().iterator(chunk_size=5000))
+    archived = load_archived_events(campaign_ids, columns=['campaign_id', 'event_type', 'contact_id', 'event_timestamp'])
+    archived = archived[archived['event_type'].isin(list(event_types))]
+    archived_events = ((int(c), e, int(ct), moment.to_pydatetime()) for c, e, ct, moment in archived.itertuples(index=False))
+    for campaign_id, event_type, contact_id, moment in itertools.chain(events, archived_events):
+        for key in ((campaign_id, event_type, 'total', TOTAL_BUCKET), (campaign_id, event_type, 'day', _day(moment))):
+            if key not in sketches:
+                sketches[key] = HyperLogLog(precision)
+            sketches[key].add(contact_id)
+
+    with transaction.atomic():
+        CampaignEventSketch.objects.filter(campaign_id__in=campaign_ids).delete()
+        CampaignEventSketch.objects.bulk_create([
+            CampaignEventSketch(campaign_id=c, event_type=e, granularity=g, bucket_start=b, registers=s.to_bytes())
+            for (c, e, g, b), s in sketches.items()
+        ], batch_size=500)
+    return len(sketches)
@@ -0,0 +1,222 @@
+"""
+Offline helpers for exercising SESWebhookView with properly signed SNS messages.
+
+AWS signs every SNS message with a key whose certificate lives on
+sns.<region>.amazonaws.com, which makes the real verification path impossible to
+drive without network access. This module provides:
+- a throwaway RSA key + self-signed certificate,
+- a tiny local HTTP server that serves that certificate,
+- a SESWebhookView subclass that trusts the local server instead of AWS,
+- builders for signed SNS Notification payloads wrapping SES events,
+- a replay loop that reports throughput, latency and DB queries per event.
+
+Used by the `bench_ses_webhook` management command and by the webhook tests.
+"""
+import base64
+import datetime
+import http.server
+import json
+import threading
+import time
+import uuid
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.x509.oid import NameOID
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .views import SESWebhookView
+
+BENCH_TOPIC_ARN = 'arn:aws:sns:us-east-1:000000000000:zensend-bench'
+SUPPORTED_EVENT_TYPES = ['Delivery', 'Open', 'Click', 'Bounce']
+
+
+def generate_signing_identity():
+    """
+    Generates an RSA private key and a matching self-signed certificate.
+    Returns (private_key, cert_pem) where cert_pem is a str, like the body SNS serves.
+    """
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    subject = issuer = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'sns.local.zensend')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(subject)
+        .issuer_name(issuer)
+        .public_key(private_key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(private_key, hashes.SHA256())
+    )
+    cert_pem = cert.public_bytes(serialization.Encoding.PEM).decode('utf-8')
+    return private_key, cert_pem
+
+
+class LocalCertificateServer:
+    """
+    Serves a single PEM certificate over plain HTTP on 127.0.0.1 from a daemon thread.
+    Use as a context manager; `cert_url` is available once started.
+    """
+    cert_path = '/SimpleNotificationService-bench.pem'
+
+    def __init__(self, cert_pem):
+        self.cert_pem = cert_pem.encode('utf-8')
+        self._server = None
+        self._thread = None
+
+    @property
+    def cert_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{self.cert_path}"
+
+    def start(self):
+        cert_pem = self.cert_pem
+        cert_path = self.cert_path
+
+        class _Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != cert_path:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-pem-file')
+                self.send_header('Content-Length', str(len(cert_pem)))
+                self.end_headers()
+                self.wfile.write(cert_pem)
+
+            def log_message(self, format, *args):  # Keep benchmark output clean
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+class LocalCertSESWebhookView(SESWebhookView):
+    """
+    SESWebhookView that accepts certificates from the local certificate server.
+    Everything else (canonical message, signature check, event processing) is inherited.
+    """
+    trusted_cert_urls = ()
+    _cert_cache = {}  # Separate cache so bench certs never leak into the real view
+
+    def _is_valid_cert_url(self, cert_url):
+        return cert_url in self.trusted_cert_urls
+
+
+def sign_sns_payload(payload, private_key):
+    """Adds a SignatureVersion 2 (SHA256withRSA) signature to an SNS payload in place."""
+    payload['SignatureVersion'] = '2'
+    canonical_message = SESWebhookView()._build_canonical_message(payload)
+    signature = private_key.sign(canonical_message.encode('utf-8'), padding.PKCS1v15(), hashes.SHA256())
+    payload['Signature'] = base64.b64encode(signature).decode('ascii')
+    return payload
+
+
+def build_ses_event(event_type, ses_message_id, recipient='recipient@example.com'):
+    """Builds a minimal SES event body (the JSON carried in the SNS 'Message' field)."""
+    now = timezone.now().isoformat()
+    event = {
+        'eventType': event_type,
+        'mail': {
+            'messageId': ses_message_id,
+            'timestamp': now,
+            'source': 'bench@example.com',
+            'destination': [recipient],
+        },
+    }
+    if event_type == 'Delivery':
+        event['delivery'] = {'timestamp': now, 'processingTimeMillis': 250,
+                             'recipients': [recipient], 'smtpResponse': '250 OK'}
+    elif event_type == 'Open':
+        event['open'] = {'timestamp': now, 'ipAddress': '192.0.2.1', 'userAgent': 'Mozilla/5.0 (bench)'}
+    elif event_type == 'Click':
+        event['click'] = {'timestamp': now, 'ipAddress': '192.0.2.1', 'userAgent': 'Mozilla/5.0 (bench)',
+                          'link': 'https://example.com/landing', 'linkTags': {}}
+    elif event_type == 'Bounce':
+        event['bounce'] = {'bounceType': 'Permanent', 'bounceSubType': 'General', 'timestamp': now,
+                           'bouncedRecipients': [{'emailAddress': recipient}]}
+    else:
+        raise ValueError(f"Unsupported SES event type for benchmark: {event_type}")
+    return event
+
+
+def build_signed_notification(ses_event, private_key, cert_url, topic_arn=BENCH_TOPIC_ARN):
+    """Wraps an SES event in a signed SNS Notification payload."""
+    payload = {
+        'Type': 'Notification',
+        'MessageId': str(uuid.uuid4()),
+        'TopicArn': topic_arn,
+        'Message': json.dumps(ses_event),
+        'Timestamp': timezone.now().isoformat(),
+        'SigningCertURL': cert_url,
+    }
+    return sign_sns_payload(payload, private_key)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def replay_payloads(payloads, cert_url, rate=0, path='/api/campaigns/webhooks/ses/'):
+    """
+    Posts each payload to the webhook view in-process and collects timings.
+    `rate` is the target requests/sec; 0 replays as fast as possible.
+    Returns a dict with requests/sec, latency percentiles (ms), queries/event and status counts.
+    """
+    factory = RequestFactory()
+    view = LocalCertSESWebhookView.as_view(trusted_cert_urls=(cert_url,))
+    interval = 1.0 / rate if rate else 0.0
+
+    latencies = []
+    query_counts = []
+    status_counts = {}
+    started = time.perf_counter()
+    for i, payload in enumerate(payloads):
+        if interval:
+            # Open-loop pacing: wait for the scheduled send time of this request.
+            delay = started + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        request = factory.post(path, data=json.dumps(payload), content_type='text/plain; charset=UTF-8')
+        with CaptureQueriesContext(connection) as ctx:
+            t0 = time.perf_counter()
+            response = view(request)
+            latencies.append(time.perf_counter() - t0)
+        query_counts.append(len(ctx.captured_queries))
+        status_counts[response.status_code] = status_counts.get(response.status_code, 0) + 1
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    total = len(payloads)
+    return {
+        'events': total,
+        'elapsed_seconds': round(elapsed, 3),
+        'requests_per_second': round(total / elapsed, 1) if elapsed > 0 else 0.0,
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        'queries_per_event': round(sum(query_counts) / total, 2) if total else 0.0,
+        'status_counts': status_counts,
+    }
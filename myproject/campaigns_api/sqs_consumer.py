@@ -0,0 +1,142 @@
+"""
+Pull-mode ingestion of SES events from an SQS queue (SES -> SNS -> SQS).
+
+An alternative to pushing notifications at SESWebhookView: consumers long-poll
+the queue, ingest each batch of up to 10 messages in a single transaction and
+only delete the messages once that transaction has committed. Each message is
+ingested in its own savepoint, so a message that raises is rolled back alone and
+left on the queue while the rest of the batch is committed and deleted. Messages
+left behind become visible again after the queue's visibility timeout, so
+ingestion is at-least-once; throughput scales by running more consumers.
+"""
+import json
+import logging
+import time
+
+import boto3
+from django.conf import settings
+from django.db import transaction
+
+from contacts_api.engagement import EngagementSink
+from contacts_api.suppression import SuppressionSink
+from .ingestion import ingest_ses_event, parse_sns_envelope
+
+logger = logging.getLogger(__name__)
+
+SQS_MAX_BATCH_SIZE = 10 # Hard limit of ReceiveMessage / DeleteMessageBatch
+SQS_MAX_WAIT_SECONDS = 20 # Longest long-poll SQS allows
+
+
+def get_sqs_client():
+    """Builds an SQS client from settings. AWS_SQS_ENDPOINT_URL points it at a local stand-in (moto, localstack)."""
+    return boto3.client(
+        'sqs',
+        region_name=getattr(settings, 'AWS_SQS_REGION_NAME', settings.AWS_SES_REGION_NAME),
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        endpoint_url=getattr(settings, 'AWS_SQS_ENDPOINT_URL', None) or None,
+    )
+
+
+class SESEventQueueConsumer:
+    """Receives SES event notifications from SQS in batches and feeds them to ingest_ses_event."""
+
+    def __init__(self, queue_url, sqs_client=None, batch_size=SQS_MAX_BATCH_SIZE,
+                 wait_time_seconds=SQS_MAX_WAIT_SECONDS, visibility_timeout=None):
+        if not queue_url:
+            raise ValueError("An SQS queue URL is required (set SES_EVENTS_SQS_QUEUE_URL).")
+        self.queue_url = queue_url
+        self.sqs = sqs_client or get_sqs_client()
+        self.batch_size = max(1, min(int(batch_size), SQS_MAX_BATCH_SIZE))
+        self.wait_time_seconds = max(0, min(int(wait_time_seconds), SQS_MAX_WAIT_SECONDS))
+        self.visibility_timeout = visibility_timeout
+
+    def _receive(self):
+        params = {
+            'QueueUrl': self.queue_url,
+            'MaxNumberOfMessages': self.batch_size,
+            'WaitTimeSeconds': self.wait_time_seconds,
+        }
+        if self.visibility_timeout is not None:
+            params['VisibilityTimeout'] = int(self.visibility_timeout)
+        return self.sqs.receive_message(**params).get('Messages', [])
+
+    def _delete(self, messages):
+        if not messages:
+            return
+        entries = [{'Id': str(i), 'ReceiptHandle': m['ReceiptHandle']} for i, m in enumerate(messages)]
+        response = self.sqs.delete_message_batch(QueueUrl=self.queue_url, Entries=entries)
+        for failure in response.get('Failed', []):
+            # The batch is already committed; a failed delete only means the message will be redelivered,
+            # which ingest_ses_event tolerates (get_or_create per event type).
+            logger.warning(f"SQS Consumer: Failed to delete message {failure.get('Id')}: {failure.get('Message')}")
+
+    def poll_once(self):
+        """
+        Receives and ingests a single batch.
+        Returns a dict of counts: received, ingested, skipped, malformed, failed.
+        A message whose ingestion raises is counted as failed and not deleted; the others are.
+        Raises if the batch transaction fails; in that case nothing is deleted.
+        """
+        messages = self._receive()
+        stats = {'received': len(messages), 'ingested': 0, 'skipped': 0, 'malformed': 0, 'failed': 0}
+        if not messages:
+            return stats
+
+        suppression_sink = SuppressionSink()
+        engagement_sink = EngagementSink()
+        failed = set() # Indexes of messages left on the queue
+        with transaction.atomic():
+            for index, message in enumerate(messages):
+                try:
+                    event_data = parse_sns_envelope(message.get('Body', ''))
+                except (ValueError, TypeError) as e:
+                    # Can never succeed on redelivery; drop it together with the batch.
+                    logger.error(f"SQS Consumer: Malformed message {message.get('MessageId')}: {str(e)}")
+                    stats['malformed'] += 1
+                    continue
+                try:
+                    # ingest_ses_event feeds the sinks last, once the event is stored
+                    with transaction.atomic():
+                        event = ingest_ses_event(event_data, suppression_sink=suppression_sink,
+                                                 engagement_sink=engagement_sink)
+                except Exception as e:
+                    logger.error(f"SQS Consumer: Failed to ingest message {message.get('MessageId')}, "
+                                 f"left on queue for redelivery: {str(e)}", exc_info=True)
+                    stats['failed'] += 1
+                    failed.add(index)
+                    continue
+                if event is None:
+                    stats['skipped'] += 1
+                else:
+                    stats['ingested'] += 1
+            # One UPDATE for every bounce/complaint in the batch, and one per engaged contact, inside the same transaction.
+            suppression_sink.flush()
+            engagement_sink.flush()
+
+        # Only reached once the batch has committed.
+        self._delete([message for index, message in enumerate(messages) if index not in failed])
+        logger.info(f"SQS Consumer: Batch done {json.dumps(stats)}")
+        return stats
+
+    def run(self, max_batches=None, stop_when_empty=False, error_backoff_seconds=5):
+        """
+        Polls until max_batches batches have been handled (forever if None).
+        With stop_when_empty the loop ends on the first empty receive, which is what the
+        periodic Celery task uses to drain the queue without holding a worker forever.
+        """
+        totals = {'batches': 0, 'received': 0, 'ingested': 0, 'skipped': 0, 'malformed': 0, 'failed': 0, 'failed_batches': 0}
+        while max_batches is None or totals['batches'] < max_batches:
+            totals['batches'] += 1
+            try:
+                stats = self.poll_once()
+            except Exception as e:
+                totals['failed_batches'] += 1
+                logger.error(f"SQS Consumer: Batch failed, messages left on queue for redelivery: {str(e)}", exc_info=True)
+                time.sleep(error_backoff_seconds)
+                continue
+            for key, value in stats.items():
+                totals[key] += value
+            if stop_when_empty and stats['received'] == 0:
+                break
+        return totals
@@ -6,6 +6,11 @@ from django.utils import timezone
 from django.conf import settings
 from django.template import Template, Context # For Django templating
 from .models import CampaignAnalytics # Import CampaignAnalytics model
+from .event_storage import inline_details, sent_payload, store_raw_payload
+from .aggregates import record_event
+from django.db import transaction
+from contacts_api.email_validation import skip_statuses
+from contacts_api.suppression import load_suppressed_emails, normalize_email
 import boto3
 from botocore.exceptions import ClientError
 
@@ -63,6 +68,9 @@ def send_campaign_task(self, campaign_id):
                 if not isinstance(contact_ids, list): # Basic validation
                      raise ValueError("contact_ids must be a list.")
                 recipients = Contact.objects.filter(owner=campaign.owner, id__in=contact_ids)
+            elif recipient_type == "segment": # Saved rule tree, see contacts_api/segments.py
+                from contacts_api.segments import segment_recipients
+                recipients = segment_recipients(campaign.owner, campaign.recipient_group.get("id"))
             else: # Unknown type
                 raise ValueError(f"Invalid recipient_group type: {recipient_type}")
         elif campaign.recipient_group == "all_contacts": # Legacy or simpler format
@@ -71,6 +79,9 @@ def send_campaign_task(self, campaign_id):
             raise ValueError(f"Unsupported recipient_group format: {campaign.recipient_group}")
 
 
+        # Addresses the offline validation flagged (contacts_api/email_validation.py) would only bounce
+        recipients = recipients.exclude(email_status__in=skip_statuses())
+
         if not recipients.exists(): # Querysets are lazy, check existence
             campaign.status = 'failed'
             campaign.save(update_fields=['status'])
@@ -79,6 +90,9 @@ def send_campaign_task(self, campaign_id):
 
         successful_sends = 0
         failed_sends = 0
+        suppressed_sends = 0
+        # Account-wide suppression list (bounces/complaints), loaded once and checked in memory.
+        suppressed_emails = load_suppressed_emails(campaign.owner)
 
         # Check if we should use mock SES for testing
         use_mock_ses = getattr(settings, 'USE_MOCK_SES', False)
@@ -94,6 +108,9 @@ def send_campaign_task(self, campaign_id):
         source_email = settings.DEFAULT_FROM_EMAIL # Or a campaign-specific from email if available
 
         for contact in recipients:
+            if suppressed_emails and normalize_email(contact.email) in suppressed_emails:
+                suppressed_sends += 1
+                continue
             try:
                 # Ensure custom_fields is a dict, even if null/None from DB
                 contact_custom_fields = contact.custom_fields if isinstance(contact.custom_fields, dict) else {}
@@ -137,14 +154,18 @@ def send_campaign_task(self, campaign_id):
                         )
                     ses_message_id = response['MessageId']
                     # Create CampaignAnalytics record for 'sent'
-                    CampaignAnalytics.objects.create(
-                        campaign=campaign,
-                        contact=contact,
-                        ses_message_id=ses_message_id,
-                        event_type='sent',
-                        event_timestamp=timezone.now(),
-                        details={'info': 'Email sent via AWS SES.', 'subject': subject_content, 'ses_response': response}
-                    )
+                    raw_details = sent_payload(subject_content, response)
+                    with transaction.atomic(): # Keep CampaignStats in step with the 'sent' row
+                        sent_event = CampaignAnalytics.objects.create(
+                            campaign=campaign,
+                            contact=contact,
+                            ses_message_id=ses_message_id,
+                            event_type='sent',
+                            event_timestamp=timezone.now(),
+                            details=inline_details(raw_details) # Governed by ANALYTICS_RAW_PAYLOAD_MODE
+                        )
+                        store_raw_payload(sent_event, raw_details)
+                        record_event(sent_event)
                     successful_sends += 1
                     print(f"Successfully sent email to {contact.email} for campaign {campaign.id} via SES. Message ID: {ses_message_id}")
 
@@ -197,7 +218,7 @@ def send_campaign_task(self, campaign_id):
         # If you want to record completion time, add another field e.g., `completed_at`.
         campaign.save(update_fields=['status'])
 
-        summary_msg = f"Campaign {campaign_id} processing complete. Successful: {successful_sends}, Failed: {failed_sends}"
+        summary_msg = f"Campaign {campaign_id} processing complete. Successful: {successful_sends}, Failed: {failed_sends}, Suppressed: {suppressed_sends}"
         print(summary_msg)
         return summary_msg
 
@@ -220,3 +241,64 @@ def send_campaign_task(self, campaign_id):
         # Update Celery task state for unexpected errors
         self.update_state(state='FAILURE', meta={'exc_type': type(e).__name__, 'exc_message': str(e)})
         raise # Re-raise for Celery to mark as retryable or failed based on task settings.
+
+
+@shared_task(name='poll_ses_event_queue')
+def poll_ses_event_queue(max_batches=50):
+    """
+    Periodic (Celery beat) task that drains SES events from SQS.
+    Stops on the first empty receive or after max_batches, so it never pins a worker.
+    Does nothing unless SES_EVENTS_SQS_QUEUE_URL is configured.
+    """
+    from .sqs_consumer import SESEventQueueConsumer # Local import: boto3 client built only when used
+
+    queue_url = getattr(settings, 'SES_EVENTS_SQS_QUEUE_URL', '')
+    if not queue_url:
+        return "SES_EVENTS_SQS_QUEUE_URL not configured; skipping."
+    # Short long-poll so an idle queue releases the worker quickly between beat ticks.
+    consumer = SESEventQueueConsumer(queue_url, wait_time_seconds=1)
+    totals = consumer.run(max_batches=max_batches, stop_when_empty=True)
+    return f"SQS poll complete: {totals}"
+
+
+@shared_task(name='purge_analytics_payloads')
+def purge_analytics_payloads():
+    """Periodic task applying ANALYTICS_RAW_PAYLOAD_RETENTION_DAYS to raw analytics payloads."""
+    from .event_storage import purge_expired_payloads
+    payloads_deleted, details_cleared = purge_expired_payloads()
+    return f"Purged {payloads_deleted} payloads, cleared {details_cleared} details."
+
+
+@shared_task(name='ingest_ses_event_task')
+def ingest_ses_event_task(event_data):
+    """Ingests one SES event off the web tier (used by the async webhook in 'celery' hand-off mode)."""
+    from .ingestion import process_ses_event
+    analytics_event = process_ses_event(event_data)
+    return analytics_event.id if analytics_event else None
+
+
+@shared_task(name='prune_hourly_rollups')
+def prune_hourly_rollups():
+    """Periodic task downsampling engagement rollups: hourly rows past retention are dropped, daily rows remain."""
+    from .aggregates import prune_hourly_rollups as prune
+    return f"Pruned {prune()} hourly rollup rows."
+
+
+@shared_task(name='archive_analytics_events')
+def archive_analytics_events():
+    """Periodic task moving events older than ANALYTICS_ARCHIVE_AFTER_DAYS to Parquet (no-op when 0)."""
+    from .archive import archive_old_events
+    totals = archive_old_events()
+    return f"Archived {totals['events']} events into {totals['partitions']} partitions."
+
+
+@shared_task(name='refresh_campaign_report')
+def refresh_campaign_report(name, campaign_id, params):
+    """Recomputes a stale cached campaign report (stale-while-revalidate, see report_cache.py)."""
+    from .models import Campaign
+    from .reports import refresh_campaign_report_now
+    try:
+        refresh_campaign_report_now(name, campaign_id, params)
+    except Campaign.DoesNotExist:
+        return f"Campaign {campaign_id} no longer exists."
+    return f"Refreshed {name} report of campaign {campaign_id}."
@@ -4,13 +4,16 @@ from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.test import override_settings
+from django.core.cache import cache
 from unittest.mock import patch, MagicMock, ANY
 import json
 from botocore.exceptions import ClientError
 
-from .models import Campaign, EmailTemplate, CampaignAnalytics
-from contacts_api.models import Contact # Assuming Contact model is in contacts_api
+from .models import Campaign, EmailTemplate, CampaignAnalytics, CampaignAnalyticsPayload, CampaignStats, CampaignEventRollup
+from contacts_api.models import Contact, Segment, SuppressedEmail # Assuming Contact model is in contacts_api
 from .tasks import send_campaign_task
+from .views import SESWebhookView
 
 class SendCampaignTaskTests(APITestCase):
     def setUp(self):
@@ -203,3 +206,910 @@ class SESWebhookViewTests(APITestCase):
         response = self.client.post(self.url, json.dumps(payload), content_type='text/plain; charset=UTF-8')
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
         self.assertIn("SNS signature verification failed", response.data['error'])
+
+
+class SNSSignatureVerificationTests(APITestCase):
+    """Exercises the real signature path using a locally generated certificate."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from .sns_bench import generate_signing_identity, LocalCertificateServer
+        cls.private_key, cert_pem = generate_signing_identity()
+        cls.cert_server = LocalCertificateServer(cert_pem).start()
+        cls.cert_url = cls.cert_server.cert_url
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.cert_server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        from .sns_bench import LocalCertSESWebhookView
+        self.view = LocalCertSESWebhookView(trusted_cert_urls=(self.cert_url,))
+        self.owner = User.objects.create_user(username='sigowner', password='password123')
+        self.contact = Contact.objects.create(owner=self.owner, email='sig@example.com')
+        self.campaign = Campaign.objects.create(owner=self.owner, name='Sig Campaign')
+        CampaignAnalytics.objects.create(campaign=self.campaign, contact=self.contact,
+                                         event_type='sent', ses_message_id='sig-msg-1')
+
+    def _signed(self, event_type='Delivery'):
+        from .sns_bench import build_ses_event, build_signed_notification
+        return build_signed_notification(build_ses_event(event_type, 'sig-msg-1', self.contact.email),
+                                         self.private_key, self.cert_url)
+
+    def test_valid_signature_is_accepted(self):
+        self.assertTrue(self.view._verify_sns_message_signature(self._signed()))
+
+    def test_tampered_message_is_rejected(self):
+        payload = self._signed()
+        payload['Message'] = payload['Message'].replace('Delivery', 'Bounce')
+        self.assertFalse(self.view._verify_sns_message_signature(payload))
+
+    def test_untrusted_cert_url_is_rejected_by_default_view(self):
+        self.assertFalse(SESWebhookView()._verify_sns_message_signature(self._signed()))
+
+    def test_replay_reports_metrics(self):
+        from .sns_bench import replay_payloads
+        report = replay_payloads([self._signed(t) for t in ['Delivery', 'Open', 'Click', 'Bounce']], self.cert_url)
+        self.assertEqual(report['status_counts'], {200: 4})
+        self.assertEqual(report['events'], 4)
+        self.assertGreater(report['queries_per_event'], 0)
+        self.assertTrue(CampaignAnalytics.objects.filter(ses_message_id='sig-msg-1', event_type='clicked').exists())
+
+
+class FakeSQSClient:
+    """Minimal in-memory stand-in for the boto3 SQS client calls used by the consumer."""
+
+    def __init__(self, bodies):
+        self.messages = [{'MessageId': f'm{i}', 'ReceiptHandle': f'rh{i}', 'Body': body} for i, body in enumerate(bodies)]
+        self.deleted = []
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages, WaitTimeSeconds, **kwargs):
+        batch = [m for m in self.messages if m['ReceiptHandle'] not in self.deleted][:MaxNumberOfMessages]
+        return {'Messages': batch} if batch else {}
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        self.deleted.extend(entry['ReceiptHandle'] for entry in Entries)
+        return {'Successful': [{'Id': entry['Id']} for entry in Entries], 'Failed': []}
+
+
+class SESEventQueueConsumerTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='sqsowner', password='password123')
+        self.contact = Contact.objects.create(owner=self.owner, email='sqs@example.com')
+        self.campaign = Campaign.objects.create(owner=self.owner, name='SQS Campaign')
+        CampaignAnalytics.objects.create(campaign=self.campaign, contact=self.contact,
+                                         event_type='sent', ses_message_id='sqs-msg-1')
+
+    def _sns_body(self, event_type):
+        event = {'eventType': event_type, 'mail': {'messageId': 'sqs-msg-1', 'timestamp': timezone.now().isoformat()}}
+        return json.dumps({'Type': 'Notification', 'Message': json.dumps(event)})
+
+    def test_batch_is_ingested_then_deleted(self):
+        from .sqs_consumer import SESEventQueueConsumer
+        raw_delivery = json.dumps({'eventType': 'Open', 'mail': {'messageId': 'sqs-msg-1'}}) # raw message delivery
+        sqs = FakeSQSClient([self._sns_body('Delivery'), raw_delivery, 'not json'])
+        stats = SESEventQueueConsumer('queue', sqs_client=sqs, wait_time_seconds=0).poll_once()
+        self.assertEqual(stats, {'received': 3, 'ingested': 2, 'skipped': 0, 'malformed': 1, 'failed': 0})
+        self.assertEqual(sorted(sqs.deleted), ['rh0', 'rh1', 'rh2'])
+        self.assertTrue(CampaignAnalytics.objects.filter(ses_message_id='sqs-msg-1', event_type='delivered').exists())
+        self.assertTrue(CampaignAnalytics.objects.filter(ses_message_id='sqs-msg-1', event_type='opened').exists())
+
+    def test_poison_message_is_left_alone_on_the_queue(self):
+        from .ingestion import ingest_ses_event
+        from .sqs_consumer import SESEventQueueConsumer
+        sqs = FakeSQSClient([self._sns_body('Delivery'), self._sns_body('Bounce'), self._sns_body('Open')])
+
+        def ingest(event_data, **sinks):
+            if event_data['eventType'] == 'Bounce': # Fails after writing a row
+                CampaignAnalytics.objects.create(campaign=self.campaign, contact=self.contact, event_type='bounced')
+                raise RuntimeError('constraint violated')
+            return ingest_ses_event(event_data, **sinks)
+
+        with patch('campaigns_api.sqs_consumer.ingest_ses_event', side_effect=ingest):
+            totals = SESEventQueueConsumer('queue', sqs_client=sqs, wait_time_seconds=0).run(max_batches=1)
+        self.assertEqual((totals['ingested'], totals['failed'], totals['failed_batches']), (2, 1, 0))
+        self.assertEqual(sorted(sqs.deleted), ['rh0', 'rh2'])
+        events = set(CampaignAnalytics.objects.filter(campaign=self.campaign).values_list('event_type', flat=True))
+        self.assertEqual(events, {'sent', 'delivered', 'opened'}) # The bounce was rolled back alone
+
+    def test_failed_batch_rolls_back_and_keeps_messages(self):
+        from .sqs_consumer import SESEventQueueConsumer
+        sqs = FakeSQSClient([self._sns_body('Delivery'), self._sns_body('Open')])
+        consumer = SESEventQueueConsumer('queue', sqs_client=sqs, wait_time_seconds=0)
+        with patch('campaigns_api.sqs_consumer.EngagementSink.flush', side_effect=RuntimeError('db down')):
+            totals = consumer.run(max_batches=1, error_backoff_seconds=0)
+        self.assertEqual(totals['failed_batches'], 1)
+        self.assertEqual(sqs.deleted, [])
+        self.assertFalse(CampaignAnalytics.objects.filter(event_type='delivered').exists())
+
+    def test_run_until_empty_drains_queue(self):
+        from .sqs_consumer import SESEventQueueConsumer
+        sqs = FakeSQSClient([self._sns_body('Delivery')] * 12)
+        totals = SESEventQueueConsumer('queue', sqs_client=sqs, wait_time_seconds=0).run(stop_when_empty=True)
+        self.assertEqual(totals['received'], 12)
+        self.assertEqual(totals['batches'], 3) # 10 + 2 + final empty receive
+        self.assertEqual(len(sqs.deleted), 12)
+
+
+class AnalyticsPayloadStorageTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='storageowner', password='password123')
+        self.contact = Contact.objects.create(owner=self.owner, email='storage@example.com')
+        self.campaign = Campaign.objects.create(owner=self.owner, name='Storage Campaign')
+        CampaignAnalytics.objects.create(campaign=self.campaign, contact=self.contact,
+                                         event_type='sent', ses_message_id='store-msg-1')
+        self.click_event = {
+            'eventType': 'Click',
+            'mail': {'messageId': 'store-msg-1', 'timestamp': timezone.now().isoformat()},
+            'click': {'link': 'https://example.com/offer', 'userAgent': 'Mozilla/5.0'},
+        }
+
+    def test_inline_mode_keeps_details_and_typed_columns(self):
+        from .ingestion import ingest_ses_event
+        event = ingest_ses_event(self.click_event)
+        self.assertEqual(event.details, self.click_event)
+        self.assertEqual(event.click_url, 'https://example.com/offer')
+        self.assertEqual(event.user_agent, 'Mozilla/5.0')
+
+    def test_redelivery_keeps_the_stored_payload(self):
+        from .ingestion import ingest_ses_event
+        first = ingest_ses_event(self.click_event)
+        redelivered = {**self.click_event, 'click': {**self.click_event['click'], 'userAgent': 'Mozilla/6.0'}}
+        with override_settings(ANALYTICS_RAW_PAYLOAD_MODE='drop'):
+            again = ingest_ses_event(redelivered)
+        self.assertEqual(again.id, first.id)
+        again.refresh_from_db()
+        self.assertEqual(again.details, self.click_event) # Not overwritten with NULL
+        self.assertEqual(again.user_agent, 'Mozilla/6.0') # Extracted fields are refreshed
+
+    @override_settings(ANALYTICS_RAW_PAYLOAD_MODE='compressed')
+    def test_compressed_mode_moves_payload_to_side_table(self):
+        from .ingestion import ingest_ses_event
+        from .event_storage import load_raw_payload
+        event = ingest_ses_event(self.click_event)
+        event.refresh_from_db()
+        self.assertIsNone(event.details)
+        self.assertEqual(event.click_url, 'https://example.com/offer')
+        self.assertEqual(load_raw_payload(event), self.click_event)
+
+    @override_settings(ANALYTICS_RAW_PAYLOAD_MODE='drop')
+    def test_drop_mode_keeps_only_typed_columns(self):
+        from .ingestion import ingest_ses_event
+        bounce = {'eventType': 'Bounce', 'mail': {'messageId': 'store-msg-1'},
+                  'bounce': {'bounceType': 'Permanent', 'bounceSubType': 'General'}}
+        event = ingest_ses_event(bounce)
+        self.assertIsNone(event.details)
+        self.assertFalse(CampaignAnalyticsPayload.objects.exists())
+        self.assertEqual((event.bounce_type, event.bounce_sub_type), ('Permanent', 'General'))
+
+    @override_settings(ANALYTICS_RAW_PAYLOAD_MODE='compressed')
+    def test_purge_respects_retention(self):
+        from datetime import timedelta
+        from .ingestion import ingest_ses_event
+        from .event_storage import purge_expired_payloads
+        event = ingest_ses_event(self.click_event)
+        CampaignAnalyticsPayload.objects.filter(event=event).update(created_at=timezone.now() - timedelta(days=40))
+        self.assertEqual(purge_expired_payloads(retention_days=30), (1, 0))
+        self.assertFalse(CampaignAnalyticsPayload.objects.exists())
+        self.assertEqual(CampaignAnalytics.objects.get(id=event.id).click_url, 'https://example.com/offer')
+
+
+class SuppressionSendPathTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='suppressowner', password='password123')
+        self.template = EmailTemplate.objects.create(owner=self.owner, name='T', subject='S', body_html='B')
+        self.kept = Contact.objects.create(owner=self.owner, email='kept@example.com')
+        self.suppressed = Contact.objects.create(owner=self.owner, email='Gone@Example.com')
+        self.campaign = Campaign.objects.create(owner=self.owner, name='Suppress Campaign', template=self.template,
+                                                recipient_group={'type': 'all_contacts'})
+        SuppressedEmail.objects.create(owner=self.owner, email='gone@example.com', reason='bounced')
+
+    @override_settings(USE_MOCK_SES=True)
+    def test_suppressed_addresses_are_skipped(self):
+        result = send_campaign_task(self.campaign.id)
+        self.assertIn('Suppressed: 1', result)
+        self.assertTrue(CampaignAnalytics.objects.filter(contact=self.kept, event_type='sent').exists())
+        self.assertFalse(CampaignAnalytics.objects.filter(contact=self.suppressed).exists())
+
+    @override_settings(USE_MOCK_SES=True)
+    def test_invalid_addresses_are_skipped(self):
+        typo = Contact.objects.create(owner=self.owner, email='kim@gmial.com', email_status='invalid',
+                                      email_status_reason='typo', email_suggestion='kim@gmail.com')
+        send_campaign_task(self.campaign.id)
+        self.assertTrue(CampaignAnalytics.objects.filter(contact=self.kept, event_type='sent').exists())
+        self.assertFalse(CampaignAnalytics.objects.filter(contact=typo).exists())
+
+    def test_bounce_feeds_suppression_list(self):
+        from .ingestion import ingest_ses_event
+        CampaignAnalytics.objects.create(campaign=self.campaign, contact=self.kept, event_type='sent',
+                                         ses_message_id='sup-msg-1')
+        ingest_ses_event({'eventType': 'Bounce', 'mail': {'messageId': 'sup-msg-1'},
+                          'bounce': {'bounceType': 'Permanent',
+                                     'bouncedRecipients': [{'emailAddress': 'kept@example.com'}]}})
+        self.kept.refresh_from_db()
+        self.assertFalse(self.kept.allow_email)
+        self.assertTrue(SuppressedEmail.objects.filter(owner=self.owner, email='kept@example.com', reason='bounced').exists())
+
+
+class SegmentRecipientTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='segmentsender', password='password123')
+        self.template = EmailTemplate.objects.create(owner=self.owner, name='T', subject='S', body_html='B')
+        self.vip = Contact.objects.create(owner=self.owner, email='vip@example.com', custom_fields={'tier': 'vip'})
+        Contact.objects.create(owner=self.owner, email='regular@example.com', custom_fields={'tier': 'basic'})
+        self.segment = Segment.objects.create(owner=self.owner, name='VIP', materialized=True,
+                                              rules={'field': 'custom_fields.tier', 'op': 'eq', 'value': 'vip'})
+
+    @override_settings(USE_MOCK_SES=True)
+    def test_send_to_segment(self):
+        campaign = Campaign.objects.create(owner=self.owner, name='Segment Campaign', template=self.template,
+                                           recipient_group={'type': 'segment', 'id': self.segment.id})
+        result = send_campaign_task(campaign.id)
+        self.assertIn('Successful: 1', result)
+        self.assertEqual(list(CampaignAnalytics.objects.filter(campaign=campaign).values_list('contact_id', flat=True)),
+                         [self.vip.id])
+        self.segment.refresh_from_db()
+        self.assertEqual(self.segment.member_count, 1) # Membership refreshed before sending
+
+    def test_segment_must_belong_to_user(self):
+        other = User.objects.create_user(username='segmentother', password='password123')
+        foreign = Segment.objects.create(owner=other, name='Theirs', rules={'field': 'email', 'op': 'exists', 'value': True})
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.post(reverse('campaign-list'), {
+            'name': 'Foreign Segment', 'recipient_group': {'type': 'segment', 'id': foreign.id},
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('recipient_group', response.data)
+
+
+class AsyncSESWebhookViewTests(APITestCase):
+    def setUp(self):
+        from django.test import AsyncClient
+        self.async_client = AsyncClient()
+        self.url = reverse('ses_webhook_async')
+        self.owner = User.objects.create_user(username='asyncowner', password='password123')
+        self.contact = Contact.objects.create(owner=self.owner, email='async@example.com')
+        self.campaign = Campaign.objects.create(owner=self.owner, name='Async Campaign')
+        CampaignAnalytics.objects.create(campaign=self.campaign, contact=self.contact,
+                                         event_type='sent', ses_message_id='async-msg-1')
+
+    def _post(self, payload):
+        from asgiref.sync import async_to_sync
+        return async_to_sync(self.async_client.post)(self.url, json.dumps(payload), content_type='text/plain; charset=UTF-8')
+
+    def test_signed_notification_is_ingested(self):
+        from .async_views import AsyncSESWebhookView
+        from .sns_bench import (generate_signing_identity, LocalCertificateServer, LocalCertSESWebhookView,
+                                build_ses_event, build_signed_notification)
+        private_key, cert_pem = generate_signing_identity()
+        with LocalCertificateServer(cert_pem) as server:
+            verifier = type('Verifier', (LocalCertSESWebhookView,), {'trusted_cert_urls': (server.cert_url,)})
+            payload = build_signed_notification(build_ses_event('Open', 'async-msg-1'), private_key, server.cert_url)
+            with patch.object(AsyncSESWebhookView, 'verifier_class', verifier):
+                response = self._post(payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(CampaignAnalytics.objects.filter(ses_message_id='async-msg-1', event_type='opened').exists())
+
+    def test_unsigned_notification_is_rejected(self):
+        response = self._post({'Type': 'Notification', 'Message': '{}', 'SigningCertURL': 'https://evil.example.com/x.pem'})
+        self.assertEqual(response.status_code, 403)
+
+    @patch('campaigns_api.async_views.AsyncSESWebhookView._verify_sns_message_signature')
+    @patch('campaigns_api.async_views.httpx.AsyncClient.get')
+    def test_subscription_confirmation_uses_async_client(self, mock_get, mock_verify):
+        import httpx
+        async def verified(payload):
+            return True
+        mock_verify.side_effect = verified
+        subscribe_url = 'https://sns.us-east-1.amazonaws.com/?Action=ConfirmSubscription'
+        mock_get.return_value = httpx.Response(200, text='ok', request=httpx.Request('GET', subscribe_url))
+        response = self._post({'Type': 'SubscriptionConfirmation', 'SubscribeURL': subscribe_url})
+        self.assertEqual(response.status_code, 200)
+        mock_get.assert_called_once_with(subscribe_url)
+
+
+class CampaignStatsAggregateTests(APITestCase):
+    def setUp(self):
+        cache.clear() # Cached reports are keyed by campaign id, which the test database reuses
+        self.owner = User.objects.create_user(username='statsowner', password='password123')
+        self.client.force_authenticate(user=self.owner)
+        self.campaign = Campaign.objects.create(owner=self.owner, name='Stats Campaign')
+        self.contacts = [Contact.objects.create(owner=self.owner, email=f'stats{i}@example.com') for i in range(4)]
+        for i, contact in enumerate(self.contacts):
+            self._record(contact, 'sent', f'stats-msg-{i}')
+
+    def _record(self, contact, event_type, message_id):
+        from .aggregates import record_event
+        event = CampaignAnalytics.objects.create(campaign=self.campaign, contact=contact,
+                                                 event_type=event_type, ses_message_id=message_id)
+        return record_event(event)
+
+    def test_counters_are_unique_per_contact(self):
+        from .ingestion import ingest_ses_event
+        ingest_ses_event({'eventType': 'Open', 'mail': {'messageId': 'stats-msg-0'}})
+        ingest_ses_event({'eventType': 'Open', 'mail': {'messageId': 'stats-msg-0'}}) # Duplicate notification
+        self._record(self.contacts[0], 'opened', 'stats-resend-0') # Same contact, another message
+        ingest_ses_event({'eventType': 'Open', 'mail': {'messageId': 'stats-msg-1'}})
+        ingest_ses_event({'eventType': 'Click', 'mail': {'messageId': 'stats-msg-1'}})
+        stats = CampaignStats.objects.get(campaign=self.campaign)
+        self.assertEqual((stats.unique_sent, stats.unique_opened, stats.unique_clicked), (4, 2, 1))
+
+    def test_stats_endpoint_matches_rebuild(self):
+        from .aggregates import rebuild_campaign_stats
+        self._record(self.contacts[0], 'opened', 'stats-msg-0')
+        self._record(self.contacts[1], 'bounced', 'stats-msg-1')
+        url = reverse('campaign-campaign-stats', kwargs={'pk': self.campaign.id})
+        with self.assertNumQueries(2): # campaign lookup + aggregate row
+            response = self.client.get(url)
+        self.assertEqual(response.data['total_sent'], 4)
+        self.assertEqual(response.data['open_rate_on_sent'], 25.0)
+        self.assertEqual(response.data['bounce_rate_on_sent'], 25.0)
+        live = response.data
+        CampaignStats.objects.all().delete()
+        rebuild_campaign_stats([self.campaign.id])
+        self.assertEqual(self.client.get(url).data, live)
+
+    def test_stats_for_campaign_without_events(self):
+        empty = Campaign.objects.create(owner=self.owner, name='Empty Campaign')
+        response = self.client.get(reverse('campaign-campaign-stats', kwargs={'pk': empty.id}))
+        self.assertEqual(response.data['total_sent'], 0)
+        self.assertIn('message', response.data)
+        self.assertFalse(CampaignStats.objects.filter(campaign=empty).exists()) # GETs never write
+
+
+class BulkCampaignStatsTests(APITestCase):
+    def setUp(self):
+        from .aggregates import record_event
+        self.owner = User.objects.create_user(username='bulkowner', password='password123')
+        self.client.force_authenticate(user=self.owner)
+        self.url = reverse('campaign-bulk-stats')
+        contacts = [Contact.objects.create(owner=self.owner, email=f'bulk{i}@example.com') for i in range(4)]
+        self.campaigns = []
+        # Campaign i: 4 sent, i opened
+        for i in range(3):
+            campaign = Campaign.objects.create(owner=self.owner, name=f'Bulk {i}')
+            for j, contact in enumerate(contacts):
+                record_event(CampaignAnalytics.objects.create(campaign=campaign, contact=contact, event_type='sent'))
+                if j < i:
+                    record_event(CampaignAnalytics.objects.create(campaign=campaign, contact=contact, event_type='opened'))
+            self.campaigns.append(campaign)
+        other = User.objects.create_user(username='bulkother', password='password123')
+        Campaign.objects.create(owner=other, name='Not mine')
+
+    def test_sorted_by_rate_in_few_queries(self):
+        with self.assertNumQueries(2): # count + page
+            response = self.client.get(self.url, {'ordering': '-open_rate_on_sent'})
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([r['campaign_name'] for r in response.data['results']], ['Bulk 2', 'Bulk 1', 'Bulk 0'])
+        self.assertEqual(response.data['results'][0]['open_rate_on_sent'], 50.0)
+
+    def test_ids_filter_and_missing_stats_backfill(self):
+        from importlib import import_module
+        from django.apps import apps
+        backfill = import_module('campaigns_api.migrations.0011_backfill_campaign_stats')
+        CampaignStats.objects.filter(campaign=self.campaigns[1]).delete()
+        response = self.client.get(self.url, {'ids': f'{self.campaigns[1].id}', 'page_size': 1})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['total_opened'], 0) # Read as zeros, not rebuilt on GET
+        self.assertFalse(CampaignStats.objects.filter(campaign=self.campaigns[1]).exists())
+
+        backfill.build_missing_campaign_stats(apps, None)
+        self.assertEqual(CampaignStats.objects.count(), 4) # Also the other owner's campaign without events
+        response = self.client.get(self.url, {'ids': f'{self.campaigns[1].id}'})
+        self.assertEqual(response.data['results'][0]['total_opened'], 1)
+
+    def test_rejects_unknown_ordering(self):
+        response = self.client.get(self.url, {'ordering': 'owner__password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CampaignTimelineTests(APITestCase):
+    def setUp(self):
+        cache.clear() # Cached reports are keyed by campaign id, which the test database reuses
+        from datetime import datetime, timezone as dt_timezone
+        self.owner = User.objects.create_user(username='timelineowner', password='password123')
+        self.client.force_authenticate(user=self.owner)
+        self.campaign = Campaign.objects.create(owner=self.owner, name='Timeline Campaign')
+        self.contacts = [Contact.objects.create(owner=self.owner, email=f'tl{i}@example.com') for i in range(3)]
+        self.t0 = datetime(2025, 6, 1, 10, 15, tzinfo=dt_timezone.utc)
+
+    def _record(self, contact, event_type, minutes):
+        from datetime import timedelta
+        from .aggregates import record_event
+        record_event(CampaignAnalytics.objects.create(
+            campaign=self.campaign, contact=contact, event_type=event_type,
+            event_timestamp=self.t0 + timedelta(minutes=minutes)))
+
+    def test_hourly_timeline_is_zero_filled(self):
+        self._record(self.contacts[0], 'opened', 0)
+        self._record(self.contacts[1], 'opened', 10)
+        self._record(self.contacts[0], 'opened', 130) # Second open by the same contact
+        url = reverse('campaign-timeline', kwargs={'pk': self.campaign.id})
+        response = self.client.get(url, {'granularity': 'hour', 'event_types': 'opened'})
+        self.assertEqual([b['opened'] for b in response.data['buckets']], [2, 0, 1])
+        unique = self.client.get(url, {'granularity': 'hour', 'event_types': 'opened', 'metric': 'unique'})
+        self.assertEqual([b['opened'] for b in unique.data['buckets']], [2, 0, 0])
+        daily = self.client.get(url, {'granularity': 'day'})
+        self.assertEqual(daily.data['buckets'], [{'bucket_start': '2025-06-01T00:00:00+00:00', 'opened': 3}])
+
+    def test_rebuild_matches_incremental_and_prune_keeps_daily(self):
+        from .aggregates import rebuild_campaign_rollups, prune_hourly_rollups
+        for i, contact in enumerate(self.contacts):
+            self._record(contact, 'clicked', i * 45)
+        live = sorted(CampaignEventRollup.objects.filter(granularity='day').values_list('count', 'first_time_count'))
+        rebuild_campaign_rollups([self.campaign.id])
+        self.assertEqual(sorted(CampaignEventRollup.objects.filter(granularity='day').values_list('count', 'first_time_count')), live)
+        prune_hourly_rollups(retention_days=0)
+        self.assertFalse(CampaignEventRollup.objects.filter(granularity='hour').exists())
+        self.assertEqual(CampaignEventRollup.objects.get(granularity='day').count, 3)
+
+    def test_ingested_events_are_bucketed_at_their_own_time(self):
+        from .ingestion import ingest_ses_event
+        CampaignAnalytics.objects.create(campaign=self.campaign, contact=self.contacts[0], event_type='sent',
+                                         ses_message_id='tl-msg-0', event_timestamp=self.t0)
+        mail = {'messageId': 'tl-msg-0', 'timestamp': '2025-06-01T10:15:00Z'} # Send time
+        ingest_ses_event({'eventType': 'Delivery', 'mail': mail, 'delivery': {'timestamp': '2025-06-01T10:15:02Z'}})
+        opened = ingest_ses_event({'eventType': 'Open', 'mail': mail, 'open': {'timestamp': '2025-06-01T12:40:00Z'}})
+        self.assertEqual(opened.event_timestamp.isoformat(), '2025-06-01T12:40:00+00:00')
+        url = reverse('campaign-timeline', kwargs={'pk': self.campaign.id})
+        response = self.client.get(url, {'granularity': 'hour', 'event_types': 'delivered,opened'})
+        self.assertEqual([(b['delivered'], b['opened']) for b in response.data['buckets']], [(1, 0), (0, 0), (0, 1)])
+
+    def test_invalid_granularity(self):
+        url = reverse('campaign-timeline', kwargs={'pk': self.campaign.id})
+        self.assertEqual(self.client.get(url, {'granularity': 'minute'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class HyperLogLogSketchTests(APITestCase):
+    def setUp(self):
+        cache.clear() # Cached reports are keyed by campaign id, which the test database reuses
+        from datetime import datetime, timezone as dt_timezone
+        self.owner = User.objects.create_user(username='hllowner', password='password123')
+        self.client.force_authenticate(user=self.owner)
+        self.campaign_a = Campaign.objects.create(owner=self.owner, name='HLL A')
+        self.campaign_b = Campaign.objects.create(owner=self.owner, name='HLL B')
+        self.contacts = [Contact.objects.create(owner=self.owner, email=f'hll{i}@example.com') for i in range(4)]
+        self.t0 = datetime(2025, 6, 1, 10, 0, tzinfo=dt_timezone.utc)
+
+    def _record(self, campaign, contact, event_type, days=0):
+        from datetime import timedelta
+        from .aggregates import record_event
+        record_event(CampaignAnalytics.objects.create(
+            campaign=campaign, contact=contact, event_type=event_type,
+            event_timestamp=self.t0 + timedelta(days=days)))
+
+    def test_hll_estimate_and_merge(self):
+        from .hll import HyperLogLog
+        first, second = HyperLogLog(12), HyperLogLog(12)
+        for i in range(5000):
+            first.add(i)
+            second.add(i + 2500)
+        fresh = HyperLogLog(12)
+        self.assertTrue(fresh.add('new-value'))
+        self.assertFalse(fresh.add('new-value')) # Unchanged registers mean the row need not be saved
+        self.assertAlmostEqual(HyperLogLog.from_bytes(first.to_bytes()).count(), 5000, delta=5000 * 0.05)
+        self.assertAlmostEqual(first.merge(second).count(), 7500, delta=7500 * 0.05)
+        with self.assertRaises(ValueError):
+            first.merge(HyperLogLog(10))
+
+    def test_fold_matches_a_sketch_built_at_the_lower_precision(self):
+        from .hll import HyperLogLog
+        high, low = HyperLogLog(14), HyperLogLog(10)
+        for i in range(3000):
+            high.add(i)
+            low.add(i)
+        self.assertEqual(high.fold(10).registers, low.registers)
+        self.assertEqual(high.fold(14).registers, high.registers)
+        with self.assertRaises(ValueError):
+            low.fold(12)
+
+    def test_buckets_of_another_precision_are_folded_into_the_count(self):
+        from datetime import timedelta
+        from .sketches import approx_unique_counts
+        with override_settings(ANALYTICS_HLL_PRECISION=14):
+            self._record(self.campaign_a, self.contacts[0], 'sent', days=0)
+            self._record(self.campaign_a, self.contacts[1], 'sent', days=1)
+        with override_settings(ANALYTICS_HLL_PRECISION=10): # After a precision change
+            self._record(self.campaign_a, self.contacts[2], 'sent', days=2)
+        self._record(self.campaign_b, self.contacts[3], 'sent', days=2) # Default precision
+        counts = approx_unique_counts([self.campaign_a.id, self.campaign_b.id], ['sent'],
+                                      start=self.t0, end=self.t0 + timedelta(days=2))
+        self.assertEqual(counts, {'sent': 4})
+
+    def test_approx_stats_per_campaign_and_date_range(self):
+        for contact in self.contacts:
+            self._record(self.campaign_a, contact, 'sent')
+        self._record(self.campaign_a, self.contacts[0], 'opened', days=0)
+        self._record(self.campaign_a, self.contacts[1], 'opened', days=2)
+        self._record(self.campaign_a, self.contacts[0], 'opened', days=2) # Repeat open on a later day
+
+        url = reverse('campaign-campaign-stats', kwargs={'pk': self.campaign_a.id})
+        response = self.client.get(url, {'approx': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['approximate'])
+        self.assertIn('relative_standard_error', response.data)
+        self.assertEqual(response.data['total_sent'], 4) # Small cardinalities are exact via linear counting
+        self.assertEqual(response.data['total_opened'], 2)
+
+        ranged = self.client.get(url, {'approx': 'true', 'start': '2025-06-03T00:00:00Z'})
+        self.assertEqual(ranged.data['total_opened'], 2)
+        self.assertEqual(ranged.data['total_sent'], 0)
+        self.assertNotIn('approximate', self.client.get(url).data)
+
+    def test_bulk_stats_combined_unique_across_campaigns(self):
+        for contact in self.contacts[:3]:
+            self._record(self.campaign_a, contact, 'sent')
+        for contact in self.contacts[1:]:
+            self._record(self.campaign_b, contact, 'sent')
+        response = self.client.get(reverse('campaign-bulk-stats'), {'approx': 'true'})
+        self.assertEqual(response.data['combined_unique_approx']['total_sent'], 4)
+
+    def test_rebuild_matches_incremental_sketches(self):
+        from .models import CampaignEventSketch
+        from .sketches import rebuild_campaign_sketches
+        for i, contact in enumerate(self.contacts):
+            self._record(self.campaign_a, contact, 'clicked', days=i % 2)
+        def snapshot():
+            return {(g, b): bytes(r) for g, b, r in CampaignEventSketch.objects.values_list('granularity', 'bucket_start', 'registers')}
+        live = snapshot()
+        self.assertEqual(len(live), 3) # One all-time sketch and two daily ones
+        rebuild_campaign_sketches([self.campaign_a.id], ['clicked'])
+        self.assertEqual(snapshot(), live)
+
+
+class AnalyticsArchiveTests(APITestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        from datetime import timedelta
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir, ignore_errors=True)
+        self.settings_override = override_settings(ANALYTICS_ARCHIVE_DIR=self.archive_dir)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.owner = User.objects.create_user(username='archiveowner', password='password123')
+        self.campaign = Campaign.objects.create(owner=self.owner, name='Archive Campaign')
+        self.contacts = [Contact.objects.create(owner=self.owner, email=f'arch{i}@example.com') for i in range(3)]
+        self.old = timezone.now() - timedelta(days=400)
+        for contact in self.contacts:
+            self._record(contact, 'sent', self.old, details={'info': 'sent'})
+        self._record(self.contacts[0], 'opened', self.old)
+
+    def _record(self, contact, event_type, moment, **fields):
+        from .aggregates import record_event
+        event = CampaignAnalytics.objects.create(campaign=self.campaign, contact=contact, event_type=event_type,
+                                                 event_timestamp=moment, **fields)
+        return record_event(event)
+
+    def test_archive_moves_old_events_to_parquet(self):
+        import os
+        from .archive import archive_old_events, load_archived_events
+        from .models import CampaignArchivePartition
+        recent = self._record(self.contacts[1], 'opened', timezone.now())
+
+        totals = archive_old_events(older_than_days=365)
+        self.assertEqual(totals['events'], 4)
+        self.assertEqual(CampaignAnalytics.objects.filter(campaign=self.campaign).count(), 1) # Recent open stays hot
+        partition = CampaignArchivePartition.objects.get()
+        self.assertTrue(partition.path.startswith(os.path.join(f'owner={self.owner.id}', f'campaign={self.campaign.id}', 'month=')))
+        self.assertTrue(os.path.exists(os.path.join(self.archive_dir, partition.path)))
+
+        frame = load_archived_events([self.campaign.id])
+        self.assertEqual(sorted(frame['event_type']), ['opened', 'sent', 'sent', 'sent'])
+        self.assertIn('"info":"sent"', frame[frame['event_type'] == 'sent']['details'].iloc[0])
+        self.assertTrue(load_archived_events([self.campaign.id], start=timezone.now()).empty)
+        self.assertTrue(recent)
+
+    def test_stats_merge_archive_and_first_time_checks(self):
+        from .aggregates import rebuild_campaign_rollups, rebuild_campaign_stats
+        from .archive import archive_old_events
+        archive_old_events(older_than_days=365)
+        self.assertTrue(CampaignStats.objects.get(campaign=self.campaign).has_archive)
+
+        # A repeat open by an archived opener is not a first-time event; a new opener is.
+        self.assertFalse(self._record(self.contacts[0], 'opened', timezone.now()))
+        self.assertTrue(self._record(self.contacts[2], 'opened', timezone.now()))
+        stats = rebuild_campaign_stats([self.campaign.id])[0]
+        self.assertEqual((stats.unique_sent, stats.unique_opened), (3, 2))
+
+        rebuild_campaign_rollups([self.campaign.id])
+        daily = CampaignEventRollup.objects.filter(campaign=self.campaign, granularity='day', event_type='opened')
+        self.assertEqual(sum(daily.values_list('count', flat=True)), 3)
+        self.assertEqual(sum(daily.values_list('first_time_count', flat=True)), 2)
+
+    def test_first_time_checks_never_read_parquet(self):
+        from .archive import archive_old_events, backfill_archived_keys
+        from .models import ArchivedEventKey, ArchivedLinkClickKey
+        self.campaign.template = EmailTemplate.objects.create(
+            owner=self.owner, name='Archive Links', subject='Hi', body_html='<a href="https://example.com/a">A</a>')
+        self.campaign.save()
+        link = self.campaign.template.links.get()
+        self._record(self.contacts[1], 'clicked', self.old, link=link)
+        archive_old_events(older_than_days=365)
+        keys = set(ArchivedEventKey.objects.values_list('contact_id', 'event_type'))
+        self.assertEqual(keys, {(c.id, 'sent') for c in self.contacts} | {(self.contacts[0].id, 'opened'),
+                                                                            (self.contacts[1].id, 'clicked')})
+        self.assertEqual(list(ArchivedLinkClickKey.objects.values_list('link_id', 'contact_id')), [(link.id, self.contacts[1].id)])
+
+        with patch('campaigns_api.archive.pq.read_table', side_effect=AssertionError('Parquet read on ingestion')):
+            self.assertFalse(self._record(self.contacts[0], 'opened', timezone.now()))
+            self.assertFalse(self._record(self.contacts[1], 'clicked', timezone.now(), link=link))
+            self.assertTrue(self._record(self.contacts[2], 'clicked', timezone.now(), link=link))
+        link_stats = link.campaign_stats.get(campaign=self.campaign)
+        self.assertEqual((link_stats.total_clicks, link_stats.unique_clicks), (3, 2)) # The archived click is still counted
+
+        # Partitions archived before the keys were recorded are backfilled from their files
+        ArchivedEventKey.objects.all().delete()
+        ArchivedLinkClickKey.objects.all().delete()
+        self.assertEqual(backfill_archived_keys(), 1)
+        self.assertEqual(set(ArchivedEventKey.objects.values_list('contact_id', 'event_type')), keys)
+        self.assertEqual(ArchivedLinkClickKey.objects.count(), 1)
+
+    def test_archiving_disabled_by_default(self):
+        from .archive import archive_old_events
+        self.assertEqual(archive_old_events(), {'partitions': 0, 'events': 0})
+
+
+class CampaignEventExportTests(APITestCase):
+    def setUp(self):
+        from datetime import timedelta
+        self.owner = User.objects.create_user(username='exportowner', password='password123')
+        self.client.force_authenticate(user=self.owner)
+        self.campaign = Campaign.objects.create(owner=self.owner, name='Export Campaign')
+        self.contacts = [Contact.objects.create(owner=self.owner, email=f'exp{i}@example.com') for i in range(3)]
+        now = timezone.now()
+        for i, contact in enumerate(self.contacts):
+            CampaignAnalytics.objects.create(campaign=self.campaign, contact=contact, event_type='sent',
+                                             event_timestamp=now - timedelta(minutes=10 - i), ses_message_id=f'msg-{i}')
+        CampaignAnalytics.objects.create(campaign=self.campaign, contact=self.contacts[0], event_type='clicked',
+                                         event_timestamp=now, click_url='https://example.com/a')
+        self.url = reverse('campaign-export-events', kwargs={'pk': self.campaign.id})
+
+    def _content(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content)
+
+    def test_csv_export_streams_rows_in_id_order(self):
+        import csv
+        import io
+        from .export import iter_export_rows
+        response = self.client.get(self.url)
+        rows = list(csv.DictReader(io.StringIO(self._content(response).decode('utf-8'))))
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual([r['contact_email'] for r in rows], ['exp0@example.com', 'exp1@example.com', 'exp2@example.com', 'exp0@example.com'])
+        self.assertEqual(rows[-1]['click_url'], 'https://example.com/a')
+        # Keyset chunks smaller than the result set return the same rows
+        self.assertEqual([r['id'] for r in iter_export_rows(self.campaign.id, chunk_size=1)], [int(r['id']) for r in rows])
+
+    def test_ndjson_gzip_and_filters(self):
+        import gzip
+        response = self.client.get(self.url, {'output': 'ndjson', 'gzip': 'true', 'event_types': 'sent'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(self._content(response)).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['ses_message_id'] for line in lines], ['msg-0', 'msg-1', 'msg-2'])
+
+        first_id = CampaignAnalytics.objects.order_by('id').first().id
+        resumed = self._content(self.client.get(self.url, {'output': 'ndjson', 'after_id': first_id})).decode('utf-8')
+        self.assertEqual(len(resumed.splitlines()), 3)
+        self.assertEqual(self.client.get(self.url, {'output': 'xml'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_includes_archived_events(self):
+        import shutil
+        import tempfile
+        from datetime import timedelta
+        from .archive import archive_old_events
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir, ignore_errors=True)
+        CampaignAnalytics.objects.filter(event_type='sent').update(event_timestamp=timezone.now() - timedelta(days=400))
+        with override_settings(ANALYTICS_ARCHIVE_DIR=archive_dir):
+            archive_old_events(older_than_days=365)
+            self.assertEqual(CampaignAnalytics.objects.count(), 1)
+            lines = self._content(self.client.get(self.url, {'output': 'ndjson'})).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['event_type'] for line in lines], ['sent', 'sent', 'sent', 'clicked'])
+        self.assertEqual(json.loads(lines[0])['contact_email'], 'exp0@example.com')
+
+
+class LinkTrackingTests(APITestCase):
+    def setUp(self):
+        cache.clear() # Cached reports are keyed by campaign id, which the test database reuses
+        self.owner = User.objects.create_user(username='linkowner', password='password123')
+        self.client.force_authenticate(user=self.owner)
+        self.template = EmailTemplate.objects.create(
+            owner=self.owner, name='Links', subject='Hi',
+            body_html='<a href="https://example.com/a?x=1&amp;y=2">A</a> <a href="https://example.com/b">B</a>'
+                      '<a href="https://example.com/a?x=1&y=2">A again</a> <a href="{{ unsubscribe_url }}">U</a>'
+                      '<a href="mailto:hi@example.com">M</a>')
+        self.campaign = Campaign.objects.create(owner=self.owner, name='Link Campaign', template=self.template)
+        self.contacts = [Contact.objects.create(owner=self.owner, email=f'link{i}@example.com') for i in range(2)]
+        from .aggregates import record_event
+        for i, contact in enumerate(self.contacts):
+            record_event(CampaignAnalytics.objects.create(campaign=self.campaign, contact=contact, event_type='sent',
+                                                          ses_message_id=f'link-msg-{i}'))
+
+    def _click(self, index, url, timestamp):
+        from .ingestion import ingest_ses_event
+        return ingest_ses_event({'eventType': 'Click', 'mail': {'messageId': f'link-msg-{index}'},
+                                 'click': {'link': url, 'timestamp': timestamp}})
+
+    def test_template_links_are_extracted_with_stable_ids(self):
+        links = list(self.template.links.values_list('url', flat=True))
+        self.assertEqual(links, ['https://example.com/a?x=1&y=2', 'https://example.com/b'])
+        first_id = self.template.links.get(url='https://example.com/b').id
+        self.template.body_html = '<a href="https://example.com/c">C</a>'
+        self.template.save()
+        self.assertEqual(self.template.links.get(url='https://example.com/b').id, first_id) # Old links are kept
+        self.assertEqual(self.template.links.count(), 3)
+
+    def test_clicks_counted_per_link_and_reported(self):
+        link_a = self.template.links.get(url='https://example.com/a?x=1&y=2')
+        self._click(0, link_a.url, '2025-06-01T10:00:00.000Z')
+        self._click(0, link_a.url, '2025-06-01T10:05:00.000Z') # Repeat click
+        self._click(0, link_a.url, '2025-06-01T10:05:00.000Z') # SNS redelivery of the same click
+        self._click(1, link_a.url, '2025-06-01T11:00:00.000Z')
+        self._click(1, 'https://untracked.example.com/', '2025-06-01T11:01:00.000Z')
+        self.assertEqual(CampaignAnalytics.objects.filter(event_type='clicked').count(), 4)
+        self.assertEqual(CampaignStats.objects.get(campaign=self.campaign).unique_clicked, 2)
+
+        response = self.client.get(reverse('campaign-links', kwargs={'pk': self.campaign.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        top = response.data['links'][0]
+        self.assertEqual((top['link_id'], top['total_clicks'], top['unique_clicks']), (link_a.id, 3, 2))
+        self.assertEqual(top['unique_click_rate_on_sent'], 100.0)
+        self.assertEqual(response.data['links'][1]['total_clicks'], 0) # Never clicked, still listed
+
+    def test_rebuild_backfills_link_ids(self):
+        from .links import rebuild_link_stats
+        from .models import CampaignLinkStats
+        CampaignAnalytics.objects.create(campaign=self.campaign, contact=self.contacts[0], event_type='clicked',
+                                         click_url='https://example.com/b')
+        rebuild_link_stats([self.campaign.id])
+        link_stats = CampaignLinkStats.objects.get(campaign=self.campaign)
+        self.assertEqual((link_stats.link.url, link_stats.total_clicks, link_stats.unique_clicks), ('https://example.com/b', 1, 1))
+
+
+class CampaignFunnelTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='funnelowner', password='password123')
+        self.client.force_authenticate(user=self.owner)
+        self.campaign = Campaign.objects.create(owner=self.owner, name='Funnel Campaign')
+        industries = ['retail', 'retail', 'finance', None]
+        self.contacts = [
+            Contact.objects.create(owner=self.owner, email=f'funnel{i}@example.com',
+                                   custom_fields={'industry': industry} if industry else {})
+            for i, industry in enumerate(industries)
+        ]
+        self.sent_at = timezone.now() - timezone.timedelta(days=2)
+        for contact in self.contacts:
+            self._event(contact, 'sent', self.sent_at)
+        for contact in self.contacts[:3]:
+            self._event(contact, 'delivered', self.sent_at + timezone.timedelta(seconds=30))
+        self._event(self.contacts[0], 'opened', self.sent_at + timezone.timedelta(minutes=2))
+        self._event(self.contacts[0], 'opened', self.sent_at + timezone.timedelta(hours=5)) # Only the first open counts
+        self._event(self.contacts[2], 'opened', self.sent_at + timezone.timedelta(hours=2))
+        self._event(self.contacts[0], 'clicked', self.sent_at + timezone.timedelta(minutes=3))
+
+    def _event(self, contact, event_type, moment):
+        from .aggregates import record_event
+        with self.captureOnCommitCallbacks(execute=True):
+            record_event(CampaignAnalytics.objects.create(
+                campaign=self.campaign, contact=contact, event_type=event_type, event_timestamp=moment))
+
+    def test_funnel_cohorts_and_time_to_open(self):
+        url = reverse('campaign-funnel', kwargs={'pk': self.campaign.id})
+        response = self.client.get(url, {'cohort': 'industry'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        funnel = {row['stage']: row for row in response.data['funnel']}
+        self.assertEqual([funnel[s]['contacts'] for s in ['sent', 'delivered', 'opened', 'clicked']], [4, 3, 2, 1])
+        self.assertEqual(funnel['opened']['rate_from_previous'], 66.67)
+        self.assertEqual(funnel['clicked']['rate_from_sent'], 25.0)
+
+        cohorts = {row['cohort']: row for row in response.data['cohorts']['industry']}
+        self.assertEqual(list(cohorts), ['retail', 'finance', '(none)']) # Largest cohort first
+        self.assertEqual((cohorts['retail']['sent'], cohorts['retail']['opened']), (2, 1))
+        self.assertEqual(cohorts['finance']['opened_rate_on_sent'], 100.0)
+
+        tto = response.data['time_to_open']
+        self.assertEqual(tto['contacts'], 2)
+        self.assertEqual(tto['percentiles_seconds']['p50'], (120 + 7200) / 2)
+        self.assertEqual({b['bucket']: b['contacts'] for b in tto['histogram']}['<5m'], 1)
+
+        response = self.client.get(url, {'cohort': 'industry', 'cohort_limit': 1})
+        self.assertEqual([row['cohort'] for row in response.data['cohorts']['industry']], ['retail', '(other)'])
+
+    def test_time_to_open_of_ingested_opens(self):
+        from .ingestion import ingest_ses_event
+        campaign = Campaign.objects.create(owner=self.owner, name='Ingested Funnel')
+        sent_at = timezone.now() - timezone.timedelta(days=1)
+        CampaignAnalytics.objects.create(campaign=campaign, contact=self.contacts[1], event_type='sent',
+                                         ses_message_id='funnel-msg-1', event_timestamp=sent_at)
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_ses_event({'eventType': 'Open',
+                              'mail': {'messageId': 'funnel-msg-1', 'timestamp': sent_at.isoformat()},
+                              'open': {'timestamp': (sent_at + timezone.timedelta(minutes=40)).isoformat()}})
+        response = self.client.get(reverse('campaign-funnel', kwargs={'pk': campaign.id}))
+        tto = response.data['time_to_open']
+        self.assertEqual((tto['contacts'], tto['percentiles_seconds']['p50']), (1, 2400.0))
+        self.assertEqual({b['bucket']: b['contacts'] for b in tto['histogram']}['15m-1h'], 1)
+
+    def test_cohorts_only_load_recipients(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .funnels import compute_funnel_report
+        Contact.objects.bulk_create([Contact(owner=self.owner, email=f'bystander{i}@example.com',
+                                             custom_fields={'industry': 'retail'}) for i in range(5)])
+        with CaptureQueriesContext(connection) as queries:
+            report = compute_funnel_report(self.campaign.id, cohort_fields=['industry'])
+        self.assertEqual(sum(row['sent'] for row in report['cohorts']['industry']), 4)
+        contact_queries = [q['sql'] for q in queries.captured_queries if 'FROM "contacts_api_contact"' in q['sql']]
+        self.assertEqual(len(contact_queries), 1)
+        self.assertIn('IN (SELECT', contact_queries[0]) # Recipients subquery, not the owner's whole list
+
+    @override_settings(ANALYTICS_REPORT_CACHE_STALE_SECONDS=0)
+    def test_report_is_cached_until_new_events(self):
+        url = reverse('campaign-funnel', kwargs={'pk': self.campaign.id})
+        self.client.get(url)
+        with patch('campaigns_api.funnels.load_stage_events') as load:
+            response = self.client.get(url)
+            load.assert_not_called() # Served from cache
+        self.assertEqual(response.data['funnel'][3]['contacts'], 1)
+
+        self._event(self.contacts[2], 'clicked', self.sent_at + timezone.timedelta(hours=3))
+        response = self.client.get(url)
+        self.assertEqual(response.data['funnel'][3]['contacts'], 2)
+
+    def test_empty_campaign(self):
+        campaign = Campaign.objects.create(owner=self.owner, name='Empty')
+        response = self.client.get(reverse('campaign-funnel', kwargs={'pk': campaign.id}), {'cohort': 'industry'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['contacts'] for row in response.data['funnel']], [0, 0, 0, 0])
+        self.assertEqual(response.data['time_to_open']['contacts'], 0)
+        self.assertEqual(response.data['cohorts']['industry'], [])
+
+
+class ReportCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='cacheowner', password='password123')
+        self.client.force_authenticate(user=self.owner)
+        self.campaign = Campaign.objects.create(owner=self.owner, name='Cached Campaign')
+        self.contact = Contact.objects.create(owner=self.owner, email='cached@example.com')
+        self.url = reverse('campaign-campaign-stats', kwargs={'pk': self.campaign.id})
+
+    def _sent(self, contact):
+        from .aggregates import record_event
+        with self.captureOnCommitCallbacks(execute=True):
+            record_event(CampaignAnalytics.objects.create(campaign=self.campaign, contact=contact, event_type='sent'))
+
+    @override_settings(ANALYTICS_REPORT_CACHE_STALE_SECONDS=30)
+    def test_stale_entry_served_while_refresh_runs(self):
+        from .report_cache import cache_hit_stats
+        self._sent(self.contact)
+        self.assertEqual(self.client.get(self.url)['X-Report-Cache'], 'miss')
+        response = self.client.get(self.url)
+        self.assertEqual((response['X-Report-Cache'], response.data['total_sent']), ('hit', 1))
+
+        self._sent(Contact.objects.create(owner=self.owner, email='cached2@example.com'))
+        with patch('campaigns_api.tasks.refresh_campaign_report.delay') as delay:
+            response = self.client.get(self.url)
+            self.assertEqual((response['X-Report-Cache'], response.data['total_sent']), ('stale', 1))
+            self.client.get(self.url) # Refresh already scheduled
+            delay.assert_called_once_with('stats', self.campaign.id, {'approx': False})
+
+        from .tasks import refresh_campaign_report
+        refresh_campaign_report('stats', self.campaign.id, {'approx': False}) # What the worker would run
+        response = self.client.get(self.url)
+        self.assertEqual((response['X-Report-Cache'], response.data['total_sent']), ('hit', 2))
+        self.assertEqual(cache_hit_stats(['stats'])['stats'],
+                         {'hits': 2, 'stale_hits': 2, 'misses': 1, 'hit_rate': 80.0})
+
+    @override_settings(ANALYTICS_REPORT_CACHE_STALE_SECONDS=30)
+    def test_recomputes_synchronously_when_refresh_cannot_be_queued(self):
+        self.client.get(self.url)
+        self._sent(self.contact)
+        with patch('campaigns_api.tasks.refresh_campaign_report.delay', side_effect=ConnectionError('broker down')):
+            response = self.client.get(self.url)
+        self.assertEqual((response['X-Report-Cache'], response.data['total_sent']), ('miss', 1))
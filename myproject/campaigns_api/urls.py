@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import CampaignViewSet, SESWebhookView # Import SESWebhookView
+from .async_views import AsyncSESWebhookView
 
 # Create a router and register our viewsets with it.
 router = DefaultRouter()
@@ -11,4 +12,6 @@ router.register(r'campaigns', CampaignViewSet, basename='campaign')
 urlpatterns = [
     path('', include(router.urls)),
     path('webhooks/ses/', SESWebhookView.as_view(), name='ses_webhook'),
+    # Native async variant; use it when serving under ASGI (uvicorn/daphne).
+    path('webhooks/ses/async/', AsyncSESWebhookView.as_view(), name='ses_webhook_async'),
 ]
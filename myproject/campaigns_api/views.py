@@ -2,6 +2,8 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.views import APIView # Import APIView for the webhook
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.pagination import PageNumberPagination
+from myproject.pagination import CreatedAtCursorPagination
 import json # For parsing request body if it's raw JSON
 import logging # For logging webhook requests
 from django.utils import timezone
@@ -21,18 +23,86 @@ from .models import Campaign, CampaignAnalytics # Import CampaignAnalytics
 from contacts_api.models import Contact # Import Contact model
 from .serializers import CampaignSerializer
 # from ..templates_api.models import EmailTemplate # If needed
-from django.db.models import Count, Q # For campaign_stats action
 
 from .tasks import send_campaign_task # Import the Celery task
+from .ingestion import process_ses_event
+from .aggregates import STATS_FIELD_BY_EVENT_TYPE, stats_payload
+from .sketches import error_bound
+from .export import EXPORT_FORMATS, export_stream, iter_export_rows
+from .funnels import DEFAULT_COHORT_LIMIT
+from .reports import approx_counts, campaign_report
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.db.models import FloatField
+from django.db.models.functions import Cast, Coalesce, NullIf
 
 logger = logging.getLogger(__name__) # Standard Python logger
 
+class CampaignStatsPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+# Sort keys accepted by bulk_stats -> annotation/field names on the campaign queryset
+BULK_STATS_ORDERING_FIELDS = {
+    'name': 'name',
+    'created_at': 'created_at',
+    'total_sent': 'unique_sent',
+    'total_delivered': 'unique_delivered',
+    'total_opened': 'unique_opened',
+    'total_clicked': 'unique_clicked',
+    'total_bounced': 'unique_bounced',
+    'total_complaints': 'unique_complaints',
+    'delivery_rate_on_sent': 'delivery_rate_on_sent',
+    'open_rate_on_sent': 'open_rate_on_sent',
+    'click_rate_on_sent': 'click_rate_on_sent',
+    'click_rate_on_opened': 'click_rate_on_opened',
+    'bounce_rate_on_sent': 'bounce_rate_on_sent',
+}
+
+
+def _parse_time_bounds(query_params):
+    """Reads optional ISO `start`/`end` query params. Returns (bounds dict, error message or None)."""
+    bounds = {}
+    for name in ('start', 'end'):
+        value = query_params.get(name)
+        if value:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                return bounds, f'Invalid datetime format for {name}. Use ISO format.'
+            bounds[name] = parsed if parsed.tzinfo else timezone.make_aware(parsed, timezone.get_current_timezone())
+    return bounds, None
+
+
+def _wants_approx(query_params):
+    return query_params.get('approx', '').lower() in ('1', 'true', 'yes')
+
+
+def _report_response(name, campaign, params):
+    """Serves a campaign report through the report cache; X-Report-Cache tells hit, stale or miss."""
+    body, outcome = campaign_report(name, campaign, params)
+    response = Response(body, status=status.HTTP_200_OK)
+    response['X-Report-Cache'] = outcome
+    return response
+
+
+def _rate_expression(numerator_field, denominator_field):
+    # NULLIF avoids division by zero; campaigns with an empty base sort as rate 0.
+    return Coalesce(
+        Cast(numerator_field, FloatField()) * 100.0 / NullIf(Cast(denominator_field, FloatField()), 0.0),
+        0.0,
+        output_field=FloatField(),
+    )
+
+
 class CampaignViewSet(viewsets.ModelViewSet):
     """
     API endpoint that allows campaigns to be viewed or edited.
     """
     serializer_class = CampaignSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination # ?cursor= keyset pages on (created_at, id)
 
     def get_queryset(self):
         """
@@ -163,92 +233,152 @@ class CampaignViewSet(viewsets.ModelViewSet):
         # If task runs, it should check campaign status.
         return Response({'message': 'Campaign schedule has been cancelled. (Note: Celery task revocation not implemented for this MVP)'}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['get'], url_path='stats')
+    def bulk_stats(self, request):
+        """
+        Stats for many campaigns at once: `?ids=1,2,3` (default: all of the owner's campaigns),
+        `?ordering=-open_rate_on_sent` and page/page_size pagination. Served from CampaignStats
+        with one joined query; sorting by rates happens in SQL. `?approx=true` adds
+        `combined_unique_approx`: distinct contacts across all selected campaigns, from sketches.
+        """
+        queryset = self.get_queryset()
+        ids_param = request.query_params.get('ids')
+        if ids_param:
+            try:
+                ids = [int(i) for i in ids_param.split(',') if i.strip()]
+            except ValueError:
+                return Response({'error': 'ids must be a comma separated list of integers.'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(id__in=ids)
+
+        ordering_param = request.query_params.get('ordering', '-created_at')
+        ordering_key = ordering_param.lstrip('-')
+        if ordering_key not in BULK_STATS_ORDERING_FIELDS:
+            return Response({'error': f"Unsupported ordering '{ordering_param}'. Choose from: {', '.join(BULK_STATS_ORDERING_FIELDS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Read-only: a campaign without a CampaignStats row (no events yet) reads as zeros
+        counters = {field: Coalesce(f'stats__{field}', 0) for field in STATS_FIELD_BY_EVENT_TYPE.values()}
+        queryset = queryset.annotate(
+            **counters,
+            delivery_rate_on_sent=_rate_expression('stats__unique_delivered', 'stats__unique_sent'),
+            open_rate_on_sent=_rate_expression('stats__unique_opened', 'stats__unique_sent'),
+            click_rate_on_sent=_rate_expression('stats__unique_clicked', 'stats__unique_sent'),
+            click_rate_on_opened=_rate_expression('stats__unique_clicked', 'stats__unique_opened'),
+            bounce_rate_on_sent=_rate_expression('stats__unique_bounced', 'stats__unique_sent'),
+        )
+        sort_field = BULK_STATS_ORDERING_FIELDS[ordering_key]
+        descending = ordering_param.startswith('-')
+        queryset = queryset.order_by(f"{'-' if descending else ''}{sort_field}", '-id' if descending else 'id')
+        rows = queryset.values('id', 'name', *counters.keys())
+
+        paginator = CampaignStatsPagination()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        results = [stats_payload(row['id'], row['name'], row) for row in page]
+        response = paginator.get_paginated_response(results)
+        if _wants_approx(request.query_params):
+            # Sketches merge across campaigns, so contacts reached by several campaigns count once here.
+            campaign_ids = list(queryset.values_list('id', flat=True))
+            response.data['combined_unique_approx'] = {
+                **{f"total_{field.replace('unique_', '')}": n for field, n in approx_counts(campaign_ids).items()},
+                'relative_standard_error': error_bound(),
+            }
+        return response
+
     @action(detail=True, methods=['get'], url_path='stats')
     def campaign_stats(self, request, pk=None):
+        """
+        Exact unique counts by default. `?approx=true` answers from HyperLogLog sketches instead
+        (relative standard error ~1.6% at the default precision) and then also accepts
+        `start`/`end` to count unique contacts over the UTC days in that range (counts only, no rates).
+        """
+        campaign = self.get_object()
+
+        if _wants_approx(request.query_params):
+            bounds, error = _parse_time_bounds(request.query_params)
+            if error:
+                return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+            params = {'approx': True, **{name: value.isoformat() for name, value in bounds.items()}}
+            return _report_response('stats', campaign, params)
+
+        # Unique-contact counters are maintained as events are ingested (campaigns_api/aggregates.py),
+        # so a miss is a single primary-key lookup instead of five DISTINCT scans over CampaignAnalytics.
+        return _report_response('stats', campaign, {'approx': False})
+
+
+    @action(detail=True, methods=['get'], url_path='timeline')
+    def timeline(self, request, pk=None):
+        """
+        Engagement over time from the rollup tables, e.g. opens per hour in the first 48h:
+        `?granularity=hour&event_types=opened&start=<sent_at>&end=<sent_at+48h>`.
+        `metric=unique` counts contacts reaching each event type for the first time.
+        """
+        campaign = self.get_object()
+        bounds, error = _parse_time_bounds(request.query_params)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        event_types = [t.strip() for t in request.query_params.get('event_types', '').split(',') if t.strip()]
+        params = {
+            'granularity': request.query_params.get('granularity', 'hour'),
+            'metric': request.query_params.get('metric', 'events'),
+            'event_types': sorted(event_types),
+            **{name: value.isoformat() for name, value in bounds.items()},
+        }
+        try:
+            return _report_response('timeline', campaign, params)
+        except ValueError as e: # Invalid granularity/metric/range; nothing is cached
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['get'], url_path='links')
+    def links(self, request, pk=None):
+        """Clicks per tracked link of the campaign's template, from CampaignLinkStats counters."""
+        return _report_response('links', self.get_object(), {})
+
+    @action(detail=True, methods=['get'], url_path='funnel')
+    def funnel(self, request, pk=None):
+        """
+        sent -> delivered -> opened -> clicked funnel with time-to-open distribution, optionally
+        split into cohorts by Contact.custom_fields keys: `?cohort=industry,company&cohort_limit=20`.
+        Computed with pandas from the campaign's events and cached until new events arrive.
+        """
         campaign = self.get_object()
+        cohort_fields = [f.strip() for f in request.query_params.get('cohort', '').split(',') if f.strip()]
+        if any('__' in f for f in cohort_fields):
+            return Response({'error': 'cohort must name top-level custom_fields keys.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            cohort_limit = int(request.query_params.get('cohort_limit', DEFAULT_COHORT_LIMIT))
+        except ValueError:
+            return Response({'error': 'cohort_limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        return _report_response('funnel', campaign, {'cohorts': sorted(set(cohort_fields)), 'limit': max(1, cohort_limit)})
 
-        # Total emails for which a 'sent' event was recorded by our system.
-        # This counts unique contacts to whom the email was marked as 'sent' by our task.
-        total_sent_contacts_qs = CampaignAnalytics.objects.filter(
-            campaign=campaign,
-            event_type='sent' # 'sent' by our system to SES (or mock)
-        ).values('contact_id').distinct()
-        total_sent_count = total_sent_contacts_qs.count()
-
-        if total_sent_count == 0:
-            return Response({
-                'campaign_id': campaign.id,
-                'campaign_name': campaign.name,
-                'total_sent': 0,
-                'total_delivered': 0,
-                'total_opened': 0,
-                'total_clicked': 0,
-                'total_bounced': 0,
-                'open_rate_on_sent': 0,
-                'click_rate_on_sent': 0,
-                'click_rate_on_opened': 0,
-                'bounce_rate_on_sent': 0,
-                'message': 'No emails recorded as sent for this campaign.'
-            }, status=status.HTTP_200_OK) # Still 200 OK, just no data.
-
-        # Total unique contacts for whom a 'delivered' event was recorded by SES
-        total_delivered_contacts_qs = CampaignAnalytics.objects.filter(
-            campaign=campaign,
-            event_type='delivered'
-        ).values('contact_id').distinct()
-        total_delivered_count = total_delivered_contacts_qs.count()
-
-        # Total unique contacts who opened for this campaign
-        total_opened_contacts_qs = CampaignAnalytics.objects.filter(
-            campaign=campaign,
-            event_type='opened'
-        ).values('contact_id').distinct()
-        total_opened_count = total_opened_contacts_qs.count()
-
-        # Total unique contacts who clicked for this campaign
-        total_clicked_contacts_qs = CampaignAnalytics.objects.filter(
-            campaign=campaign,
-            event_type='clicked'
-        ).values('contact_id').distinct()
-        total_clicked_count = total_clicked_contacts_qs.count()
-
-        # Total unique contacts who bounced
-        total_bounced_count = CampaignAnalytics.objects.filter(
-            campaign=campaign,
-            event_type='bounced'
-        ).values('contact_id').distinct().count()
-
-        # Calculate rates
-        # Base for open/click rates can be 'sent' or 'delivered'.
-        # Using 'sent' (our system's attempt to send) as the primary base for now.
-        base_for_rates = total_sent_count
-
-        open_rate_on_sent = (total_opened_count / base_for_rates) * 100 if base_for_rates > 0 else 0
-        click_rate_on_sent = (total_clicked_count / base_for_rates) * 100 if base_for_rates > 0 else 0
-
-        # Click rate based on opens (CTR of those who opened)
-        click_rate_on_opened = (total_clicked_count / total_opened_count) * 100 if total_opened_count > 0 else 0
-
-        bounce_rate_on_sent = (total_bounced_count / base_for_rates) * 100 if base_for_rates > 0 else 0
-
-        # Delivery rate based on sent (optional, good to show)
-        delivery_rate_on_sent = (total_delivered_count / base_for_rates) * 100 if base_for_rates > 0 else 0
-
-
-        return Response({
-            'campaign_id': campaign.id,
-            'campaign_name': campaign.name,
-            'total_sent': total_sent_count,          # Emails our system attempted to send via Celery task
-            'total_delivered': total_delivered_count,  # Confirmed deliveries from SES
-            'total_opened': total_opened_count,        # Unique opens
-            'total_clicked': total_clicked_count,      # Unique clicks
-            'total_bounced': total_bounced_count,      # Unique bounces
-            'delivery_rate_on_sent': round(delivery_rate_on_sent, 2),
-            'open_rate_on_sent': round(open_rate_on_sent, 2),
-            'click_rate_on_sent': round(click_rate_on_sent, 2),
-            'click_rate_on_opened': round(click_rate_on_opened, 2), # Often called Click-to-Open Rate (CTOR)
-            'bounce_rate_on_sent': round(bounce_rate_on_sent, 2),
-        }, status=status.HTTP_200_OK)
+    @action(detail=True, methods=['get'], url_path='events/export')
+    def export_events(self, request, pk=None):
+        """
+        Streams the campaign's events (archived ones included) joined with contact email.
+        `?output=csv|ndjson` (default csv), `gzip=true`, optional `start`/`end`, `event_types`
+        and `after_id` to resume an interrupted download. Rows come in id order.
+        """
+        campaign = self.get_object()
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response({'error': f"output must be one of {', '.join(EXPORT_FORMATS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        bounds, error = _parse_time_bounds(request.query_params)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            after_id = int(request.query_params.get('after_id', 0))
+        except ValueError:
+            return Response({'error': 'after_id must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        event_types = [t.strip() for t in request.query_params.get('event_types', '').split(',') if t.strip()]
+        use_gzip = request.query_params.get('gzip', '').lower() in ('1', 'true', 'yes')
+
+        rows = iter_export_rows(campaign.id, start=bounds.get('start'), end=bounds.get('end'),
+                                event_types=event_types or None, after_id=after_id)
+        filename = f"campaign-{campaign.id}-events.{output}{'.gz' if use_gzip else ''}"
+        content_type = 'application/gzip' if use_gzip else ('text/csv' if output == 'csv' else 'application/x-ndjson')
+        response = StreamingHttpResponse(export_stream(rows, output=output, gzip=use_gzip), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['X-Accel-Buffering'] = 'no' # Let nginx pass chunks through as they are produced
+        return response
 
 
 class SESWebhookView(APIView):
@@ -297,29 +427,108 @@ class SESWebhookView(APIView):
 
         return "".join(canonical_parts)
 
-    def _verify_sns_message_signature(self, payload):
+    def _is_valid_cert_url(self, cert_url):
+        """
+        Checks that the SigningCertURL points at an SNS certificate hosted by AWS.
+        Kept as a separate method so tests and the offline benchmark harness can
+        substitute a local certificate server (see campaigns_api/sns_bench.py).
+        """
+        parsed_url = urlparse(cert_url)
+        # Validate domain and path more strictly
+        return bool(parsed_url.scheme == 'https' and
+                    parsed_url.hostname and
+                    parsed_url.hostname.endswith('.amazonaws.com') and
+                    # Example: sns.us-west-2.amazonaws.com or sns-regional.amazonaws.com
+                    # Ensure it's a valid SNS domain pattern. A simple check for .amazonaws.com and .pem is a start.
+                    # More specific regex could be used: r"sns\.[a-zA-Z0-9\-]+\.amazonaws\.com(\.cn)?"
+                    # For now, keeping it simple:
+                    parsed_url.hostname.startswith('sns.') and
+                    parsed_url.path.endswith('.pem'))
+
+    def _get_signing_cert_url(self, payload):
+        """
+        Validates SigningCertURL and TopicArn before any network access.
+        Returns the certificate URL to fetch, or None if the message must be rejected.
+        """
         cert_url = payload.get('SigningCertURL')
         if not cert_url:
             logger.error("SNS Webhook: No SigningCertURL in payload.")
-            return False
+            return None
 
-        parsed_url = urlparse(cert_url)
-        # Validate domain and path more strictly
-        if not (parsed_url.scheme == 'https' and
-                parsed_url.hostname.endswith('.amazonaws.com') and
-                # Example: sns.us-west-2.amazonaws.com or sns-regional.amazonaws.com
-                # Ensure it's a valid SNS domain pattern. A simple check for .amazonaws.com and .pem is a start.
-                # More specific regex could be used: r"sns\.[a-zA-Z0-9\-]+\.amazonaws\.com(\.cn)?"
-                # For now, keeping it simple:
-                parsed_url.hostname.startswith('sns.') and
-                parsed_url.path.endswith('.pem')):
+        if not self._is_valid_cert_url(cert_url):
             logger.error(f"SNS Webhook: Invalid SigningCertURL: {cert_url}")
-            return False
+            return None
 
         topic_arn = payload.get('TopicArn')
         allowed_topic_arn = getattr(settings, 'ALLOWED_SNS_TOPIC_ARN', None)
         if allowed_topic_arn and topic_arn != allowed_topic_arn:
             logger.error(f"SNS Webhook: Message from unexpected TopicArn '{topic_arn}'. Expected '{allowed_topic_arn}'.")
+            return None
+        return cert_url
+
+    def _verify_signature_with_cert(self, payload, cert_pem, cert_url=''):
+        """
+        Verifies the payload signature against an already fetched PEM certificate.
+        Pure CPU work, shared by the sync view and the async view (AsyncSESWebhookView).
+        """
+        try:
+            # Load the PEM certificate
+            cert = x509.load_pem_x509_certificate(cert_pem.encode('utf-8'), default_backend())
+        except ValueError as e: # Catches errors from load_pem_x509_certificate if cert is malformed
+            logger.error(f"SNS Webhook: Failed to load certificate from {cert_url}: {str(e)}")
+            return False
+
+        # Get the public key from the certificate
+        public_key = cert.public_key()
+
+        # Construct the canonical message
+        canonical_message = self._build_canonical_message(payload)
+        if canonical_message is None: # If _build_canonical_message returned None due to missing fields
+            logger.error("SNS Webhook: Failed to build canonical message for signature verification.")
+            return False
+
+        # Decode the Base64-encoded signature
+        signature_base64 = payload.get('Signature')
+        if not signature_base64:
+            logger.error("SNS Webhook: No Signature in payload.")
+            return False
+        try:
+            signature_decoded = base64.b64decode(signature_base64)
+        except binascii.Error as e: # More specific exception for base64 decoding
+            logger.error(f"SNS Webhook: Failed to Base64 decode signature: {str(e)}")
+            return False
+
+        # Verify the signature
+        signature_verified = False
+        algorithms_to_try = [
+            (hashes.SHA256(), "SHA256withRSA"), # Try SHA256 first as it's more secure
+            (hashes.SHA1(), "SHA1withRSA")      # Fallback to SHA1
+        ]
+
+        for hash_algorithm, algo_name in algorithms_to_try:
+            try:
+                public_key.verify(
+                    signature_decoded,
+                    canonical_message.encode('utf-8'),
+                    padding.PKCS1v15(),
+                    hash_algorithm
+                )
+                signature_verified = True
+                logger.info(f"SNS Webhook: Signature verified successfully using {algo_name}.")
+                break # Exit loop on successful verification
+            except InvalidSignature:
+                logger.warning(f"SNS Webhook: {algo_name} signature verification failed.")
+            except Exception as e: # Other crypto-related errors
+                logger.error(f"SNS Webhook: Unexpected error during {algo_name} signature verification: {str(e)}")
+                # Depending on the error, might want to stop or try next algo. For now, continue.
+
+        if not signature_verified:
+            logger.error("SNS Webhook: Signature verification failed for all attempted algorithms.")
+        return signature_verified
+
+    def _verify_sns_message_signature(self, payload):
+        cert_url = self._get_signing_cert_url(payload)
+        if not cert_url:
             return False
 
         try:
@@ -333,63 +542,11 @@ class SESWebhookView(APIView):
                 cert_pem = response.text
                 self._cert_cache[cert_url] = cert_pem
 
-            # Load the PEM certificate
-            cert = x509.load_pem_x509_certificate(cert_pem.encode('utf-8'), default_backend())
-
-            # Get the public key from the certificate
-            public_key = cert.public_key()
-
-            # Construct the canonical message
-            canonical_message = self._build_canonical_message(payload)
-            if canonical_message is None: # If _build_canonical_message returned None due to missing fields
-                logger.error("SNS Webhook: Failed to build canonical message for signature verification.")
-                return False
-
-            # Decode the Base64-encoded signature
-            signature_base64 = payload.get('Signature')
-            if not signature_base64:
-                logger.error("SNS Webhook: No Signature in payload.")
-                return False
-            try:
-                signature_decoded = base64.b64decode(signature_base64)
-            except binascii.Error as e: # More specific exception for base64 decoding
-                logger.error(f"SNS Webhook: Failed to Base64 decode signature: {str(e)}")
-                return False
-
-            # Verify the signature
-            signature_verified = False
-            algorithms_to_try = [
-                (hashes.SHA256(), "SHA256withRSA"), # Try SHA256 first as it's more secure
-                (hashes.SHA1(), "SHA1withRSA")      # Fallback to SHA1
-            ]
-
-            for hash_algorithm, algo_name in algorithms_to_try:
-                try:
-                    public_key.verify(
-                        signature_decoded,
-                        canonical_message.encode('utf-8'),
-                        padding.PKCS1v15(),
-                        hash_algorithm
-                    )
-                    signature_verified = True
-                    logger.info(f"SNS Webhook: Signature verified successfully using {algo_name}.")
-                    break # Exit loop on successful verification
-                except InvalidSignature:
-                    logger.warning(f"SNS Webhook: {algo_name} signature verification failed.")
-                except Exception as e: # Other crypto-related errors
-                    logger.error(f"SNS Webhook: Unexpected error during {algo_name} signature verification: {str(e)}")
-                    # Depending on the error, might want to stop or try next algo. For now, continue.
-
-            if not signature_verified:
-                logger.error("SNS Webhook: Signature verification failed for all attempted algorithms.")
-            return signature_verified
+            return self._verify_signature_with_cert(payload, cert_pem, cert_url)
 
         except requests.exceptions.RequestException as e:
             logger.error(f"SNS Webhook: Failed to fetch SigningCertURL {cert_url}: {str(e)}")
             return False
-        except ValueError as e: # Catches errors from load_pem_x509_certificate if cert is malformed
-            logger.error(f"SNS Webhook: Failed to load certificate from {cert_url}: {str(e)}")
-            return False
         except Exception as e:
             logger.error(f"SNS Webhook: Unexpected error during signature verification process: {str(e)}")
             return False
@@ -486,113 +643,6 @@ class SESWebhookView(APIView):
     def process_ses_event(self, event_data):
         """
         Processes the content of an SES event notification (from the 'Message' field of an SNS notification).
-        Creates or updates CampaignAnalytics records.
+        The mapping onto CampaignAnalytics lives in campaigns_api.ingestion so the SQS consumer can share it.
         """
-        ses_event_type = event_data.get('eventType')
-        mail_data = event_data.get('mail', {})
-        ses_message_id = mail_data.get('messageId')
-        ses_timestamp_str = mail_data.get('timestamp') # SES timestamp for the event
-
-        if not ses_message_id:
-            logger.error("SES Event Processing: No ses_message_id found in event_data.")
-            return
-
-        # Convert SES event type to our internal event_type
-        # This mapping needs to be robust.
-        internal_event_type_map = {
-            'Send': 'sent', # Note: Our 'sent' is pre-SES. SES 'Send' is actual attempt by SES.
-                            # We might not use SES 'Send' if we create our 'sent' record from the task.
-            'Delivery': 'delivered',
-            'Bounce': 'bounced',
-            'Open': 'opened',
-            'Click': 'clicked',
-            'Complaint': 'complaint',
-            'Reject': 'rejected',
-            # Add any other SES event types you handle
-        }
-        internal_event_type = internal_event_type_map.get(ses_event_type)
-
-        if not internal_event_type:
-            logger.warning(f"SES Event Processing: Unknown SES eventType '{ses_event_type}'. Skipping.")
-            return
-
-        try:
-            # Try to find the original 'sent' record to link campaign and contact
-            # This assumes 'send_campaign_task' created a 'sent' event with this ses_message_id
-            original_sent_event = CampaignAnalytics.objects.filter(
-                ses_message_id=ses_message_id,
-                # event_type='sent' # Or, if SES 'Send' is the first event we rely on from webhook
-            ).first() # Get the first one if multiple (should not happen for 'sent' with unique ses_message_id)
-
-
-            if not original_sent_event:
-                # This case means SES sent an event for a messageId we don't have a 'sent' record for.
-                # This could happen if:
-                # 1. Our 'send_campaign_task' failed to record the 'sent' event.
-                # 2. The messageId is from a source outside our app (e.g., direct SES console send).
-                # 3. There's a significant delay and the webhook arrives before our task commits. (Less likely with Celery)
-                # For now, we log this. In a more complex system, you might try to deduce campaign/contact
-                # from custom headers in mail_data.commonHeaders if you set them.
-                logger.warning(f"SES Event Processing: No initial 'sent' record found for ses_message_id '{ses_message_id}'. Cannot associate event '{internal_event_type}'.")
-                # Potentially create an orphaned event if necessary for auditing, but it lacks context.
-                return
-
-            campaign_obj = original_sent_event.campaign
-            contact_obj = original_sent_event.contact
-
-            # Prepare details for the new analytics event
-            event_details = {'ses_event': event_data} # Store the raw SES event for audit/details
-            event_time = timezone.now() # Default to now
-            if ses_timestamp_str:
-                try:
-                    # SES timestamp is like "2023-10-27T10:30:00.123Z"
-                    event_time = timezone.datetime.fromisoformat(ses_timestamp_str.replace('Z', '+00:00'))
-                except ValueError:
-                    logger.warning(f"SES Event Processing: Could not parse SES timestamp '{ses_timestamp_str}'. Using current time.")
-
-            # Create a new analytics record for this specific event type
-            # The unique_together constraint in CampaignAnalytics model might need adjustment
-            # if we expect multiple clicks for the same messageId, for example.
-            # For now, assuming ('campaign', 'contact', 'event_type', 'ses_message_id') handles this.
-            # If event_type + ses_message_id should be unique, then this create_or_update is better.
-
-            analytics_event, created = CampaignAnalytics.objects.update_or_create(
-                campaign=campaign_obj,
-                contact=contact_obj,
-                ses_message_id=ses_message_id,
-                event_type=internal_event_type, # This makes a new record for each event type
-                defaults={
-                    'event_timestamp': event_time,
-                    'details': event_data # Store the full event_data from SES
-                }
-            )
-
-            if created:
-                logger.info(f"SES Event Processing: Created new CampaignAnalytics record for event '{internal_event_type}', campaign '{campaign_obj.id}', contact '{contact_obj.id}'.")
-            else:
-                logger.info(f"SES Event Processing: Updated existing CampaignAnalytics record for event '{internal_event_type}', campaign '{campaign_obj.id}', contact '{contact_obj.id}'.")
-
-            # Further actions based on event type (e.g., update contact's bounce status)
-            if internal_event_type in ['bounced', 'complaint']:
-                # Assuming Contact model has a field like `allow_email` (boolean) or `email_status` (char/int)
-                # For this example, let's assume `allow_email` and set it to False.
-                # This is a generic way to handle it. Specific fields like `is_bounced` or `has_complained`
-                # could also be used if they exist on the Contact model.
-                if hasattr(contact_obj, 'allow_email'):
-                    contact_obj.allow_email = False
-                    contact_obj.save(update_fields=['allow_email'])
-                    logger.info(f"Contact {contact_obj.id} marked as allow_email=False due to {internal_event_type} event.")
-                # else:
-                #     logger.warning(f"Contact model does not have 'allow_email' field. Cannot update for {internal_event_type}.")
-
-                # If you have specific fields:
-                # if internal_event_type == 'bounced' and hasattr(contact_obj, 'is_bounced'):
-                #     contact_obj.is_bounced = True
-                #     contact_obj.save(update_fields=['is_bounced'])
-                # if internal_event_type == 'complaint' and hasattr(contact_obj, 'has_complained'):
-                #      contact_obj.has_complained = True
-                #      contact_obj.save(update_fields=['has_complained'])
-
-
-        except Exception as e:
-            logger.error(f"SES Event Processing: Error processing event for ses_message_id '{ses_message_id}': {str(e)}", exc_info=True)
+        return process_ses_event(event_data)
@@ -1,12 +1,15 @@
 from django.contrib import admin
-from .models import Contact
+from .models import Contact, ContactBulkJob, ImportJob, IndexedCustomField, Segment, SuppressedEmail
+from .email_validation import email_validation_fields
+from .search import search_contact_ids
 
 @admin.register(Contact)
 class ContactAdmin(admin.ModelAdmin):
-    list_display = ('email', 'first_name', 'last_name', 'allow_email', 'owner', 'created_at')
-    list_filter = ('owner', 'allow_email', 'created_at')
-    search_fields = ('email', 'first_name', 'last_name', 'owner__username')
-    readonly_fields = ('created_at',) # 'owner' could also be here if set automatically
+    list_display = ('email', 'first_name', 'last_name', 'allow_email', 'email_status', 'owner', 'created_at')
+    list_filter = ('owner', 'allow_email', 'email_status', 'created_at')
+    search_fields = ('=owner__username',) # Email, names and custom fields go through the full-text index below
+    readonly_fields = ('created_at', 'last_opened_at', 'last_clicked_at', 'recent_open_count', 'recent_click_count',
+                       'engagement_points', 'email_status', 'email_status_reason', 'email_suggestion') # 'owner' could also be here if set automatically
 
     fieldsets = (
         (None, {
@@ -16,6 +19,14 @@ class ContactAdmin(admin.ModelAdmin):
             'fields': ('custom_fields',),
             'classes': ('collapse',) # Makes this section collapsible
         }),
+        ('Email validation', {
+            'fields': ('email_status', 'email_status_reason', 'email_suggestion'),
+            'classes': ('collapse',)
+        }),
+        ('Engagement', {
+            'fields': ('last_opened_at', 'last_clicked_at', 'recent_open_count', 'recent_click_count', 'engagement_points'),
+            'classes': ('collapse',)
+        }),
         ('Timestamps', {
             'fields': ('created_at',),
         }),
@@ -37,3 +48,58 @@ class ContactAdmin(admin.ModelAdmin):
     #     if obj: # Editing an existing object
     #         return self.readonly_fields + ('owner',)
     #     return self.readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        if not change or 'email' in form.changed_data:
+            for field, value in email_validation_fields(obj.email).items():
+                setattr(obj, field, value)
+        super().save_model(request, obj, form, change)
+
+    admin_search_limit = 1000 # Index matches shown for one admin search
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset_by_owner, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if not search_term:
+            return queryset_by_owner, may_have_duplicates
+        ids = search_contact_ids(search_term, limit=self.admin_search_limit)
+        return queryset_by_owner | queryset.filter(id__in=ids), may_have_duplicates
+
+
+@admin.register(SuppressedEmail)
+class SuppressedEmailAdmin(admin.ModelAdmin):
+    list_display = ('email', 'reason', 'owner', 'created_at')
+    list_filter = ('reason', 'owner', 'created_at')
+    search_fields = ('email', 'owner__username')
+    readonly_fields = ('created_at',)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'file_name', 'owner', 'status', 'rows_processed', 'contacts_created', 'rows_skipped', 'created_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('file_name', 'owner__username')
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+
+
+@admin.register(Segment)
+class SegmentAdmin(admin.ModelAdmin):
+    list_display = ('name', 'owner', 'materialized', 'member_count', 'last_refreshed_at', 'created_at')
+    list_filter = ('materialized', 'owner')
+    search_fields = ('name', 'owner__username')
+    readonly_fields = ('member_count', 'last_refreshed_at', 'created_at')
+
+
+@admin.register(IndexedCustomField)
+class IndexedCustomFieldAdmin(admin.ModelAdmin):
+    list_display = ('key', 'value_type', 'owner', 'status', 'backfilled_at', 'created_at')
+    list_filter = ('status', 'value_type')
+    search_fields = ('key', 'owner__username')
+    readonly_fields = ('status', 'created_at', 'backfilled_at')
+
+
+@admin.register(ContactBulkJob)
+class ContactBulkJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'action', 'owner', 'status', 'matched', 'affected', 'created_at')
+    list_filter = ('action', 'status', 'created_at')
+    search_fields = ('owner__username',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _ensure_search_index(sender, using, **kwargs):
+    from django.db import connections
+    from django.db.migrations.recorder import MigrationRecorder
+    from .search import ensure_search_index
+    applied = MigrationRecorder(connections[using]).applied_migrations()
+    if ('contacts_api', '0007_contact_search_index') in applied:
+        ensure_search_index(connections[using])
 
 
 class ContactsApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'contacts_api'
+
+    def ready(self):
+        post_migrate.connect(_ensure_search_index, sender=self)
@@ -0,0 +1,246 @@
+"""
+Bulk update and delete of contacts.
+
+A request names its contacts by `ids`, by a `filter` (a segment rule tree, see segments.py) or
+by `segment_id`, and either changes them ({"allow_email": bool, "custom_fields": {...}}) or
+deletes them. custom_fields are merged key by key: given keys are replaced, keys set to null
+are removed and other keys are kept.
+
+Contacts are processed in chunks of CONTACT_BULK_CHUNK_SIZE ids, each chunk with one set-based
+UPDATE (json_patch on SQLite, jsonb || on PostgreSQL) or DELETE in its own transaction, followed
+by the bookkeeping that depends on contact data: promoted custom field values and materialized
+segment membership. Deletes cascade the contacts' events, so once all chunks ran the aggregates of
+the campaigns that lost events are rebuilt (dedup.rebuild_campaigns) and their reports invalidated. Requests
+matching up to CONTACT_BULK_INLINE_LIMIT contacts run inside the request; larger ones are
+queued as a ContactBulkJob.
+"""
+import json
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import JSONField
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .custom_field_index import maintained_fields, ready_fields, sync_contact_fields
+from .models import Contact, ContactBulkJob, Segment
+from .segments import (CUSTOM_FIELD_KEY, DOUBLE_UNDERSCORE, SegmentRuleError, compile_rules, forget_contacts,
+                       matching_contacts, refresh_contact_segments, validate_rules)
+
+logger = logging.getLogger(__name__)
+
+MAX_CUSTOM_FIELD_KEYS = 100
+
+
+class BulkRequestError(ValueError):
+    pass
+
+
+def bulk_chunk_size():
+    return getattr(settings, 'CONTACT_BULK_CHUNK_SIZE', 5000)
+
+
+def bulk_inline_limit():
+    return getattr(settings, 'CONTACT_BULK_INLINE_LIMIT', 5000)
+
+
+def validate_target(data):
+    """The {"ids"|"filter"|"segment_id": ...} part of a request body. Raises BulkRequestError."""
+    given = [name for name in ('ids', 'filter', 'segment_id') if name in data]
+    if len(given) != 1:
+        raise BulkRequestError("Give exactly one of 'ids', 'filter' or 'segment_id'.")
+    name = given[0]
+    value = data[name]
+    if name == 'ids':
+        if not isinstance(value, list) or not value or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in value):
+            raise BulkRequestError("'ids' must be a non-empty list of contact ids.")
+        return {'ids': sorted(set(value))}
+    if name == 'filter':
+        try:
+            validate_rules(value)
+        except SegmentRuleError as e:
+            raise BulkRequestError(f"Invalid filter: {e}")
+        return {'filter': value}
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise BulkRequestError("'segment_id' must be an integer.")
+    return {'segment_id': value}
+
+
+def validate_changes(data):
+    """The allow_email / custom_fields changes of a bulk update. Raises BulkRequestError."""
+    changes = {}
+    if 'allow_email' in data:
+        if not isinstance(data['allow_email'], bool):
+            raise BulkRequestError("'allow_email' must be true or false.")
+        changes['allow_email'] = data['allow_email']
+    if 'custom_fields' in data:
+        patch = data['custom_fields']
+        if not isinstance(patch, dict) or not patch:
+            raise BulkRequestError("'custom_fields' must be a non-empty object.")
+        if len(patch) > MAX_CUSTOM_FIELD_KEYS:
+            raise BulkRequestError(f"At most {MAX_CUSTOM_FIELD_KEYS} custom_fields keys per request.")
+        for key in patch:
+            if not CUSTOM_FIELD_KEY.match(key) or DOUBLE_UNDERSCORE in key:
+                raise BulkRequestError(f"Invalid custom field key: '{key}'.")
+        changes['custom_fields'] = patch
+    if not changes:
+        raise BulkRequestError("Nothing to update: give 'allow_email' and/or 'custom_fields'.")
+    return changes
+
+
+def target_queryset(owner_id, target):
+    """Contacts of a filter/segment target; None for an id list (those are chunked as given)."""
+    if 'filter' in target:
+        return Contact.objects.filter(compile_rules(target['filter'], indexed=ready_fields(owner_id)), owner_id=owner_id)
+    if 'segment_id' in target:
+        try:
+            segment = Segment.objects.get(pk=target['segment_id'], owner_id=owner_id)
+        except Segment.DoesNotExist:
+            raise BulkRequestError(f"Segment {target['segment_id']} not found.")
+        return matching_contacts(segment) # The rules as of now, not a possibly stale membership
+    return None
+
+
+def count_target(owner_id, target):
+    """Contacts a request would touch (for ids, how many are given: an upper bound)."""
+    queryset = target_queryset(owner_id, target)
+    return len(target['ids']) if queryset is None else queryset.count()
+
+
+def iter_target_chunks(owner_id, target, chunk_size):
+    """Lists of at most chunk_size ids of the owner's targeted contacts, in id order."""
+    queryset = target_queryset(owner_id, target)
+    if queryset is None:
+        ids = target['ids']
+        for start in range(0, len(ids), chunk_size):
+            chunk = list(Contact.objects.filter(owner_id=owner_id, id__in=ids[start:start + chunk_size])
+                         .values_list('id', flat=True).order_by('id'))
+            if chunk:
+                yield chunk
+        return
+    last_id = 0
+    while True:
+        # Keyset on id: an update that changes which contacts match cannot revisit or skip rows
+        chunk = list(queryset.filter(id__gt=last_id).values_list('id', flat=True).order_by('id')[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
+
+
+def merge_custom_fields_expression(patch):
+    """
+    SQL expression merging `patch` into custom_fields at the top level (nested objects are replaced,
+    not merged; null removes a key). None on backends without JSON functions.
+    """
+    kept = {key: value for key, value in patch.items() if value is not None}
+    if connection.vendor == 'sqlite':
+        # Drop the keys first so json_patch() replaces object values instead of merging into them
+        paths = ', '.join(['%s'] * len(patch))
+        return RawSQL(f"json_patch(json_remove(coalesce(custom_fields, '{{}}'), {paths}), %s)",
+                      [*(f'$."{key}"' for key in patch), json.dumps(kept)], output_field=JSONField())
+    if connection.vendor == 'postgresql':
+        return RawSQL("(coalesce(custom_fields, '{}'::jsonb) - %s::text[]) || %s::jsonb",
+                      [list(patch), json.dumps(kept)], output_field=JSONField())
+    return None
+
+
+def _merge_rows(contacts, patch):
+    """Python fallback of merge_custom_fields_expression() for other backends."""
+    contacts = list(contacts.only('id', 'custom_fields'))
+    for contact in contacts:
+        custom_fields = dict(contact.custom_fields) if isinstance(contact.custom_fields, dict) else {}
+        for key, value in patch.items():
+            if value is None:
+                custom_fields.pop(key, None)
+            else:
+                custom_fields[key] = value
+        contact.custom_fields = custom_fields
+    Contact.objects.bulk_update(contacts, ['custom_fields'])
+
+
+def update_chunk(owner_id, ids, changes, indexed_fields=None):
+    """Applies `changes` to the contacts `ids` with one UPDATE. Returns the number of rows updated."""
+    contacts = Contact.objects.filter(id__in=ids)
+    values = {}
+    if 'allow_email' in changes:
+        values['allow_email'] = changes['allow_email']
+    patch = changes.get('custom_fields')
+    expression = merge_custom_fields_expression(patch) if patch else None
+    if expression is not None:
+        values['custom_fields'] = expression
+    with transaction.atomic():
+        if patch and expression is None:
+            _merge_rows(contacts, patch)
+        updated = contacts.update(**values) if values else len(ids)
+        if patch:
+            if indexed_fields is None:
+                indexed_fields = maintained_fields([owner_id])
+            if indexed_fields:
+                sync_contact_fields(contacts.only('id', 'owner_id', 'custom_fields'), indexed_fields)
+        refresh_contact_segments(ids)
+    return updated
+
+
+def delete_chunk(ids):
+    """
+    Deletes the contacts `ids` (their events and memberships cascade). Returns the number of contacts
+    deleted and the ids of the campaigns that lost events, whose aggregates the caller rebuilds.
+    """
+    from campaigns_api.models import CampaignAnalytics
+    with transaction.atomic():
+        campaign_ids = set(CampaignAnalytics.objects.filter(contact_id__in=ids)
+                           .values_list('campaign_id', flat=True).distinct().order_by())
+        forget_contacts(ids)
+        _, per_model = Contact.objects.filter(id__in=ids).delete()
+    return per_model.get(Contact._meta.label, 0), campaign_ids
+
+
+def run_bulk(owner_id, action, target, changes=None, progress=None):
+    """Applies the action chunk by chunk; `progress(affected)` is called after each chunk. Returns the total affected."""
+    from .dedup import rebuild_campaigns
+    indexed_fields = maintained_fields([owner_id]) if action == 'update' else None
+    affected = 0
+    campaign_ids = set() # Campaigns that lost events to deletes
+    try:
+        for ids in iter_target_chunks(owner_id, target, bulk_chunk_size()):
+            if action == 'delete':
+                deleted, touched = delete_chunk(ids)
+                affected += deleted
+                campaign_ids |= touched
+            else:
+                affected += update_chunk(owner_id, ids, changes, indexed_fields)
+            if progress:
+                progress(affected)
+    finally:
+        # Once, after every chunk: stats, link stats, rollups and sketches were built from the deleted events
+        if campaign_ids:
+            rebuild_campaigns(campaign_ids)
+    return affected
+
+
+def run_bulk_job(job_id):
+    """Runs a queued ContactBulkJob. Returns the job."""
+    job = ContactBulkJob.objects.get(pk=job_id)
+    if job.status != 'pending':
+        logger.warning(f"Contact bulk job {job.id} is {job.status}, not running it again.")
+        return job
+    job.status = 'running'
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+
+    def progress(affected):
+        job.affected = affected
+        job.save(update_fields=['affected'])
+
+    try:
+        job.affected = run_bulk(job.owner_id, job.action, job.target, job.changes, progress=progress)
+        job.status = 'completed'
+    except Exception as e:
+        logger.error(f"Contact bulk job {job.id} failed after {job.affected} contacts: {e}")
+        job.status = 'failed'
+        job.error_message = str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['affected', 'status', 'error_message', 'finished_at'])
+    return job
@@ -0,0 +1,156 @@
+"""
+Promoted ("indexed") custom_fields keys.
+
+A filter on `custom_fields__industry` has to parse every contact's JSON. An owner can instead
+promote a key with an IndexedCustomField; each contact's value of that key is then kept in
+ContactFieldValue as text or as a number, indexed on (field, value). The side table is:
+
+- backfilled by the backfill_custom_field_index task when the key is promoted;
+- rewritten for the contacts involved whenever contacts are created or edited through the API
+  or imported (sync_contact_fields);
+- dropped with the IndexedCustomField (cascade).
+
+Segment rules (segments.py) and the contact list's `?custom_fields__<key>=` filter turn
+conditions on a promoted key that is ready into `id IN (SELECT contact_id ...)` over that
+index, and keep the JSON lookup for everything else.
+"""
+import json
+import logging
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Contact, ContactFieldValue, IndexedCustomField
+
+logger = logging.getLogger(__name__)
+
+TEXT_MAX_LENGTH = 255
+# Ops answered from the side table, per value type; others fall back to the JSON lookup
+TEXT_LOOKUPS = {'eq': 'exact', 'in': 'in', 'contains': 'icontains', 'startswith': 'istartswith',
+                'endswith': 'iendswith', 'gt': 'gt', 'gte': 'gte', 'lt': 'lt', 'lte': 'lte'}
+NUMBER_LOOKUPS = {'eq': 'exact', 'in': 'in', 'gt': 'gt', 'gte': 'gte', 'lt': 'lt', 'lte': 'lte'}
+
+
+def backfill_batch_size():
+    return getattr(settings, 'CUSTOM_FIELD_INDEX_BATCH_SIZE', 5000)
+
+
+def text_value(value):
+    """Stored text of a scalar JSON value: strings as they are, numbers and booleans as JSON."""
+    if isinstance(value, str):
+        return value[:TEXT_MAX_LENGTH]
+    if isinstance(value, (bool, int, float)):
+        return json.dumps(value)
+    return None
+
+
+def number_value(value):
+    """Numeric value, also of numeric strings (CSV imports); None for anything else."""
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def field_value_row(field, contact):
+    """The ContactFieldValue of `contact` for `field`, or None if the contact lacks the key."""
+    custom_fields = contact.custom_fields if isinstance(contact.custom_fields, dict) else {}
+    if field.key not in custom_fields:
+        return None
+    value = custom_fields[field.key]
+    # A row is kept even for values of the wrong type, so "exists" stays answerable from the index
+    if field.value_type == 'number':
+        return ContactFieldValue(field=field, contact_id=contact.id, value_number=number_value(value))
+    return ContactFieldValue(field=field, contact_id=contact.id, value_text=text_value(value))
+
+
+def maintained_fields(owner_ids):
+    """Promoted keys of the owners whose side table must follow contact writes (backfilling ones included)."""
+    return list(IndexedCustomField.objects.filter(owner_id__in=owner_ids).exclude(status='failed'))
+
+
+def sync_contact_fields(contacts, fields=None):
+    """
+    Rewrites the promoted values of the given Contact instances. `fields` (maintained_fields() of
+    their owners) saves the lookup when syncing many batches. Returns the number of rows written.
+    """
+    contacts = [contact for contact in contacts if contact.pk]
+    if not contacts:
+        return 0
+    if fields is None:
+        fields = maintained_fields({c.owner_id for c in contacts})
+    if not fields:
+        return 0
+    rows = [
+        row for field in fields for contact in contacts
+        if contact.owner_id == field.owner_id and (row := field_value_row(field, contact)) is not None
+    ]
+    with transaction.atomic():
+        ContactFieldValue.objects.filter(field__in=fields, contact_id__in=[c.pk for c in contacts]).delete()
+        ContactFieldValue.objects.bulk_create(rows, batch_size=backfill_batch_size())
+    return len(rows)
+
+
+def backfill_field(field):
+    """(Re)builds one promoted key over all of the owner's contacts, then marks it ready."""
+    try:
+        ContactFieldValue.objects.filter(field=field).delete()
+        contacts = (Contact.objects.filter(owner_id=field.owner_id, custom_fields__has_key=field.key)
+                    .only('id', 'owner_id', 'custom_fields').order_by())
+        batch = []
+        written = 0
+        for contact in contacts.iterator(chunk_size=backfill_batch_size()):
+            row = field_value_row(field, contact)
+            if row is not None:
+                batch.append(row)
+            if len(batch) >= backfill_batch_size():
+                # ignore_conflicts: an API edit may have synced the contact meanwhile
+                ContactFieldValue.objects.bulk_create(batch, ignore_conflicts=True)
+                written += len(batch)
+                batch = []
+        ContactFieldValue.objects.bulk_create(batch, ignore_conflicts=True)
+        written += len(batch)
+    except Exception as e:
+        logger.error(f"Custom field index: backfill of '{field.key}' for owner {field.owner_id} failed: {e}")
+        field.status = 'failed'
+        field.save(update_fields=['status'])
+        raise
+    field.status = 'ready'
+    field.backfilled_at = timezone.now()
+    field.save(update_fields=['status', 'backfilled_at'])
+    return written
+
+
+def ready_fields(owner_id):
+    """{key: IndexedCustomField} of the owner's promoted keys that queries may use."""
+    return {field.key: field for field in IndexedCustomField.objects.filter(owner_id=owner_id, status='ready')}
+
+
+def indexed_condition(field, op, value):
+    """
+    Q on Contact answering `custom_fields.<key> <op> <value>` from the side table, or None when the
+    op or value does not fit the field's type (the caller then uses the JSON lookup).
+    """
+    values = ContactFieldValue.objects.filter(field=field)
+    if op == 'exists':
+        condition = Q(id__in=values.values('contact_id'))
+        return condition if value else ~condition
+    negate = op == 'ne'
+    op = 'eq' if negate else op
+    if field.value_type == 'number':
+        convert, column, lookups = number_value, 'value_number', NUMBER_LOOKUPS
+    else:
+        convert, column, lookups = text_value, 'value_text', TEXT_LOOKUPS
+    if op not in lookups:
+        return None
+    converted = [convert(v) for v in value] if op == 'in' else convert(value)
+    if converted is None or (op == 'in' and None in converted):
+        return None
+    condition = Q(id__in=values.filter(**{f'{column}__{lookups[op]}': converted}).values('contact_id'))
+    return ~condition if negate else condition
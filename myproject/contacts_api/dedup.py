@@ -0,0 +1,213 @@
+"""
+Duplicate contacts: the same address uploaded with different case or surrounding spaces
+("John@X.com" and "john@x.com ") is stored as separate contacts of one owner.
+
+The job groups contacts on (owner, lower(trim(email))), served by the contact_owner_norm_email_idx
+expression index, with a single grouped query, and merges each cluster of duplicates into its
+oldest contact:
+
+- custom_fields are combined key by key, newer contacts winning over older ones (empty values
+  do not overwrite); empty names are filled from the other contacts;
+- allow_email is kept only if every contact of the cluster allows email (the most restrictive);
+- CampaignAnalytics events of the merged contacts are re-pointed to the survivor, whose email
+  becomes the normalized address;
+- the merged contacts are then deleted, and the survivor's engagement columns, promoted custom
+  fields and segment membership are recomputed.
+
+Clusters are merged CONTACT_DEDUP_BATCH_SIZE at a time, one short transaction per batch, so no lock is
+held on the contact table for the length of the job. Contacts without duplicates just get their
+email normalized. Once all batches are merged, the counters, link stats, rollups and sketches of
+every campaign that had events re-pointed are rebuilt and its cached reports invalidated.
+
+Events already archived to Parquet (campaigns_api/archive.py) are immutable and keep the ids of
+merged contacts; those events are no longer attributed to any contact.
+"""
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Case, Count, Exists, F, OuterRef, Value, When
+from django.db.models.functions import Lower, Trim
+
+from .custom_field_index import sync_contact_fields
+from .engagement import rebuild_contact_engagement
+from .models import Contact
+from .segments import forget_contacts, refresh_contact_segments
+
+logger = logging.getLogger(__name__)
+
+CAMPAIGN_REBUILD_BATCH_SIZE = 500 # Campaigns per grouped rebuild query, as in rebuild_campaign_stats
+
+
+def dedup_batch_size():
+    return getattr(settings, 'CONTACT_DEDUP_BATCH_SIZE', 500)
+
+
+def normalized_email():
+    """Expression of the duplicate key, matching the contact_owner_norm_email_idx index."""
+    return Lower(Trim('email'))
+
+
+def duplicate_clusters(owner_ids=None):
+    """
+    {'owner_id', 'normalized_email', 'contacts'} of every normalized address held by several
+    contacts of one owner (one grouped query), in key order.
+    """
+    contacts = Contact.objects.annotate(normalized_email=normalized_email())
+    if owner_ids:
+        contacts = contacts.filter(owner_id__in=owner_ids)
+    return (contacts.values('owner_id', 'normalized_email').annotate(contacts=Count('id'))
+            .filter(contacts__gt=1).order_by('owner_id', 'normalized_email'))
+
+
+def _merged_values(contacts):
+    """Survivor field values of a cluster ordered oldest first."""
+    custom_fields = {}
+    for contact in contacts:
+        if isinstance(contact.custom_fields, dict):
+            custom_fields.update({key: value for key, value in contact.custom_fields.items() if value not in (None, '')})
+    newest_first = contacts[::-1]
+    survivor = contacts[0]
+    return {
+        'first_name': survivor.first_name or next((c.first_name for c in newest_first if c.first_name), survivor.first_name),
+        'last_name': survivor.last_name or next((c.last_name for c in newest_first if c.last_name), survivor.last_name),
+        'custom_fields': custom_fields,
+        'allow_email': all(c.allow_email for c in contacts),
+    }
+
+
+def merge_clusters(keys):
+    """
+    Merges the clusters `keys` ((owner_id, normalized_email) pairs) in one transaction.
+    Returns (contacts merged away, events re-pointed, ids of the campaigns whose events moved).
+    """
+    from campaigns_api.models import CampaignAnalytics
+    wanted = set(keys)
+    contacts = (Contact.objects.annotate(normalized_email=normalized_email())
+                .filter(owner_id__in={owner_id for owner_id, _ in wanted},
+                        normalized_email__in={email for _, email in wanted})
+                .order_by('created_at', 'id'))
+    with transaction.atomic():
+        clusters = defaultdict(list)
+        for contact in contacts.select_for_update():
+            key = (contact.owner_id, contact.normalized_email)
+            if key in wanted:
+                clusters[key].append(contact)
+
+        survivors = []
+        stored_email = {}
+        survivor_of = {} # merged contact id -> survivor id
+        for (_, email), cluster in clusters.items():
+            if len(cluster) < 2: # Merged or deleted since the clusters were listed
+                continue
+            survivor = cluster[0]
+            stored_email[survivor.id] = survivor.email
+            for field, value in _merged_values(cluster).items():
+                setattr(survivor, field, value)
+            survivor.email = email
+            survivors.append(survivor)
+            survivor_of.update({contact.id: survivor.id for contact in cluster[1:]})
+        if not survivor_of:
+            return 0, 0, set()
+
+        merged_ids = list(survivor_of)
+        events = CampaignAnalytics.objects.filter(contact_id__in=merged_ids)
+        campaign_ids = set(events.values_list('campaign_id', flat=True).distinct().order_by())
+        repointed = events.update(contact_id=Case(
+            *[When(contact_id=merged_id, then=Value(survivor_id)) for merged_id, survivor_id in survivor_of.items()],
+            output_field=BigIntegerField(),
+        ))
+        forget_contacts(merged_ids)
+        Contact.objects.filter(id__in=merged_ids).delete()
+
+        # Email is unique across owners: keep the stored form if another contact has the normalized one,
+        # or if another owner's survivor in this batch takes it first
+        survivor_ids = [survivor.id for survivor in survivors]
+        taken = set(Contact.objects.filter(email__in=[s.email for s in survivors]).exclude(id__in=survivor_ids)
+                    .values_list('email', flat=True))
+        for survivor in survivors:
+            if survivor.email in taken:
+                survivor.email = stored_email[survivor.id]
+            taken.add(survivor.email)
+        Contact.objects.bulk_update(survivors, ['email', 'first_name', 'last_name', 'custom_fields', 'allow_email'])
+
+        sync_contact_fields(survivors)
+        rebuild_contact_engagement(Contact.objects.filter(id__in=survivor_ids))
+        refresh_contact_segments(survivor_ids)
+    return len(merged_ids), repointed, campaign_ids
+
+
+def normalize_emails(owner_ids=None, batch_size=None):
+    """
+    Rewrites stored emails to their normalized form where no other contact has it. Run after the
+    merge, when the remaining differences are contacts without duplicates. Returns the number updated.
+    """
+    batch_size = batch_size or dedup_batch_size()
+    pending = (Contact.objects.annotate(normalized_email=normalized_email())
+               .exclude(email=F('normalized_email'))
+               .filter(~Exists(Contact.objects.filter(email=OuterRef('normalized_email')))))
+    if owner_ids:
+        pending = pending.filter(owner_id__in=owner_ids)
+    updated = 0
+    last_id = 0
+    while True:
+        ids = list(pending.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return updated
+        last_id = ids[-1]
+        try:
+            with transaction.atomic():
+                updated += Contact.objects.filter(id__in=ids).update(email=normalized_email())
+        except IntegrityError:
+            # Two owners' contacts in this batch normalize to the same address: first one wins
+            for contact_id in ids:
+                try:
+                    with transaction.atomic():
+                        updated += Contact.objects.filter(id=contact_id).update(email=normalized_email())
+                except IntegrityError:
+                    pass
+
+
+def rebuild_campaigns(campaign_ids):
+    """Rebuilds the aggregates of campaigns whose events changed contact, and drops their cached reports."""
+    from campaigns_api.aggregates import STATS_FIELD_BY_EVENT_TYPE, rebuild_campaign_rollups, rebuild_campaign_stats
+    from campaigns_api.links import rebuild_link_stats
+    from campaigns_api.report_cache import bump_events_version
+    from campaigns_api.sketches import rebuild_campaign_sketches
+    campaign_ids = sorted(campaign_ids)
+    for i in range(0, len(campaign_ids), CAMPAIGN_REBUILD_BATCH_SIZE):
+        batch = campaign_ids[i:i + CAMPAIGN_REBUILD_BATCH_SIZE]
+        rebuild_campaign_stats(batch)
+        rebuild_link_stats(batch)
+        rebuild_campaign_rollups(batch)
+        rebuild_campaign_sketches(batch, list(STATS_FIELD_BY_EVENT_TYPE))
+        for campaign_id in batch:
+            bump_events_version(campaign_id)
+    return len(campaign_ids)
+
+
+def dedupe_contacts(owner_ids=None, batch_size=None, dry_run=False):
+    """
+    Merges every cluster of duplicate contacts (of the given owners, default all) and normalizes
+    the remaining emails. Returns a summary dict; with dry_run only the clusters are counted.
+    """
+    batch_size = batch_size or dedup_batch_size()
+    summary = {'clusters': 0, 'merged': 0, 'events_repointed': 0, 'emails_normalized': 0, 'campaigns_rebuilt': 0}
+    clusters = list(duplicate_clusters(owner_ids))
+    summary['clusters'] = len(clusters)
+    if dry_run:
+        summary['merged'] = sum(row['contacts'] - 1 for row in clusters)
+        return summary
+
+    campaign_ids = set()
+    for start in range(0, len(clusters), batch_size):
+        keys = [(row['owner_id'], row['normalized_email']) for row in clusters[start:start + batch_size]]
+        merged, repointed, touched = merge_clusters(keys)
+        summary['merged'] += merged
+        summary['events_repointed'] += repointed
+        campaign_ids |= touched
+        logger.info(f"Contact dedup: merged {summary['merged']} contacts ({start + len(keys)}/{len(clusters)} clusters).")
+    summary['emails_normalized'] = normalize_emails(owner_ids, batch_size)
+    summary['campaigns_rebuilt'] = rebuild_campaigns(campaign_ids)
+    return summary
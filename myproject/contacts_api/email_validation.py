@@ -0,0 +1,205 @@
+"""
+Offline email validation.
+
+Every contact carries an email_status the send path filters on (EMAIL_VALIDATION_SKIP_STATUSES,
+'invalid' by default), so bad addresses are dropped by the recipient query instead of turning
+into bounces. Nothing here touches the network (no DNS/MX lookup, no SMTP probe):
+
+- syntax: a stricter check than the importer's, vectorized with pandas over whole columns: a
+  dot-atom local part of at most 64 characters, LDH domain labels and an alphabetic TLD, at most
+  254 characters in all (quoted local parts and IP literals are rejected) -> 'invalid';
+- mistyped TLDs ("hotmail.con", "example.cmo"), which cannot be delivered -> 'invalid';
+- likely typos of common mailbox domains ("gmial.com"), one edit away from a domain in
+  COMMON_DOMAINS -> 'risky': real domains are one edit away too ("life.com", "zoo.com"), so the
+  guess alone does not stop the send;
+  both kinds carry the corrected address in email_suggestion;
+- disposable domains (DISPOSABLE_DOMAINS, their subdomains, plus one domain per line from the
+  optional EMAIL_DISPOSABLE_DOMAINS_FILE) -> 'risky';
+- role accounts (ROLE_ACCOUNTS: info@, support@, ...) -> 'risky'.
+
+Domain checks run once per distinct domain of a batch and are cached per process
+(domain_verdict), so a million addresses over a few thousand domains cost a few thousand checks.
+
+Imports and API writes set the status of the contacts they create; existing lists are checked by
+the validate_contact_emails task / management command.
+"""
+import logging
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+
+from .models import Contact
+
+logger = logging.getLogger(__name__)
+
+LOCAL_PART = r"[a-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*"
+DOMAIN = r"(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}"
+ADDRESS_PATTERN = f'{LOCAL_PART}@{DOMAIN}' # Matched against the lowercased address
+MAX_LOCAL_LENGTH = 64
+MAX_ADDRESS_LENGTH = 254
+
+COMMON_DOMAINS = frozenset({
+    'gmail.com', 'googlemail.com', 'yahoo.com', 'yahoo.co.uk', 'yahoo.fr', 'hotmail.com', 'hotmail.co.uk',
+    'hotmail.fr', 'outlook.com', 'live.com', 'msn.com', 'aol.com', 'icloud.com', 'me.com', 'mac.com',
+    'protonmail.com', 'proton.me', 'gmx.com', 'gmx.de', 'gmx.net', 'web.de', 't-online.de', 'yandex.ru',
+    'mail.ru', 'qq.com', '163.com', 'comcast.net', 'verizon.net', 'att.net', 'sbcglobal.net', 'btinternet.com',
+    'orange.fr', 'free.fr', 'wanadoo.fr', 'laposte.net', 'sfr.fr', 'libero.it', 'zoho.com',
+})
+# Real domains one edit away from a common one, never reported as typos
+LOOKALIKE_DOMAINS = frozenset({'mail.com', 'email.com', 'ymail.com', 'cloud.com', 'gmx.at', 'gmx.ch', 'live.fr'})
+# Typo targets: short domains are one edit away from too many real ones
+TYPO_MIN_LENGTH = 8
+TLD_TYPOS = {
+    'con': 'com', 'cmo': 'com', 'ocm': 'com', 'vom': 'com', 'xom': 'com', 'cpm': 'com', 'comm': 'com',
+    'coom': 'com', 'nte': 'net', 'nett': 'net', 'ogr': 'org', 'orgg': 'org',
+}
+DISPOSABLE_DOMAINS = frozenset({
+    '10minutemail.com', '20minutemail.com', 'discard.email', 'dispostable.com', 'emailondeck.com',
+    'fakeinbox.com', 'getairmail.com', 'getnada.com', 'guerrillamail.com', 'guerrillamail.net',
+    'guerrillamailblock.com', 'inboxkitten.com', 'maildrop.cc', 'mailinator.com', 'mailnesia.com',
+    'mintemail.com', 'mohmal.com', 'mytemp.email', 'sharklasers.com', 'spam4.me', 'temp-mail.org',
+    'tempail.com', 'tempmail.com', 'tempmailo.com', 'tempr.email', 'throwawaymail.com', 'trashmail.com',
+    'yopmail.com', 'yopmail.fr', 'moakt.com',
+})
+ROLE_ACCOUNTS = frozenset({
+    'abuse', 'admin', 'administrator', 'billing', 'careers', 'contact', 'donotreply', 'do-not-reply',
+    'enquiries', 'help', 'hello', 'hostmaster', 'info', 'jobs', 'mailer-daemon', 'marketing', 'no-reply',
+    'noreply', 'office', 'postmaster', 'root', 'sales', 'security', 'support', 'team', 'webmaster',
+})
+
+
+def validation_batch_size():
+    return getattr(settings, 'EMAIL_VALIDATION_BATCH_SIZE', 5000)
+
+
+def skip_statuses():
+    """email_status values the send path leaves out."""
+    return list(getattr(settings, 'EMAIL_VALIDATION_SKIP_STATUSES', ['invalid']))
+
+
+@lru_cache(maxsize=1)
+def disposable_domains():
+    domains = set(DISPOSABLE_DOMAINS)
+    path = getattr(settings, 'EMAIL_DISPOSABLE_DOMAINS_FILE', None)
+    if path:
+        try:
+            with open(path, encoding='utf-8') as f:
+                domains.update(line.strip().lower() for line in f if line.strip() and not line.startswith('#'))
+        except OSError as e:
+            logger.error(f"Email validation: cannot read disposable domain list {path}: {e}")
+    return frozenset(domains)
+
+
+def _one_edit_apart(a, b):
+    """True if `a` becomes `b` with one insertion, deletion, substitution or swap of adjacent characters."""
+    if a == b or abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i + 2:] == b[i + 2:] and a[i:i + 2] == b[i:i + 2][::-1])
+    shorter, longer = (a, b) if len(a) < len(b) else (b, a)
+    return shorter[i:] == longer[i + 1:]
+
+
+def suggest_domain(domain):
+    """
+    (corrected domain, certain) for a probable typo, or None. `certain` is True for a mistyped TLD,
+    which no real address has, and False for a near miss of a common domain.
+    """
+    if domain in COMMON_DOMAINS or domain in LOOKALIKE_DOMAINS:
+        return None
+    name, _, tld = domain.rpartition('.')
+    if tld in TLD_TYPOS:
+        return f'{name}.{TLD_TYPOS[tld]}', True
+    for common in sorted(COMMON_DOMAINS): # Deterministic when two are one edit away
+        if len(common) >= TYPO_MIN_LENGTH and _one_edit_apart(domain, common):
+            return common, False
+    return None
+
+
+@lru_cache(maxsize=100_000)
+def domain_verdict(domain):
+    """(status, reason, suggested domain) of a syntactically valid domain, cached per process."""
+    typo = suggest_domain(domain)
+    if typo:
+        suggestion, certain = typo
+        return ('invalid' if certain else 'risky'), 'typo', suggestion
+    labels = domain.split('.')
+    disposable = disposable_domains()
+    if any('.'.join(labels[i:]) in disposable for i in range(len(labels) - 1)):
+        return 'risky', 'disposable', None
+    return 'valid', '', None
+
+
+def validate_emails(emails):
+    """
+    Checks a column of addresses. Returns a DataFrame on the same index with `status`, `reason`
+    ('syntax', 'typo', 'disposable', 'role' or '') and `suggestion` (corrected address or None).
+    """
+    emails = pd.Series(emails, dtype=object).astype('string').str.strip().str.lower()
+    if emails.empty: # rpartition() of an empty column has no columns to unpack
+        return pd.DataFrame({'status': [], 'reason': [], 'suggestion': []}, index=emails.index, dtype=object)
+    parts = emails.str.rpartition('@')
+    local, domain = parts[0], parts[2]
+    syntax_ok = (emails.str.fullmatch(ADDRESS_PATTERN).fillna(False).to_numpy(dtype=bool)
+                 & (local.str.len() <= MAX_LOCAL_LENGTH).fillna(False).to_numpy(dtype=bool)
+                 & (emails.str.len() <= MAX_ADDRESS_LENGTH).fillna(False).to_numpy(dtype=bool))
+
+    status = np.full(len(emails), 'invalid', dtype=object)
+    reason = np.full(len(emails), 'syntax', dtype=object)
+    suggestion = np.full(len(emails), None, dtype=object)
+    if syntax_ok.any():
+        ok_domains = domain[syntax_ok].astype(object)
+        verdicts = {name: domain_verdict(name) for name in ok_domains.unique()} # Once per distinct domain
+        checked = pd.DataFrame([verdicts[name] for name in ok_domains], columns=['status', 'reason', 'suggestion'])
+        # Role accounts are only flagged on otherwise valid addresses; "+tag" is ignored
+        role = (local[syntax_ok].str.split('+', n=1).str[0].isin(ROLE_ACCOUNTS).to_numpy(dtype=bool)
+                & (checked['status'] == 'valid').to_numpy(dtype=bool))
+        checked.loc[role, ['status', 'reason']] = ['risky', 'role']
+        typo = (checked['reason'] == 'typo').to_numpy(dtype=bool)
+        suggested = checked['suggestion'].astype(object).to_numpy()
+        ok_locals = local[syntax_ok].astype(object).to_numpy()
+        suggested[typo] = ok_locals[typo] + '@' + suggested[typo]
+        status[syntax_ok] = checked['status'].to_numpy()
+        reason[syntax_ok] = checked['reason'].to_numpy()
+        suggestion[syntax_ok] = suggested
+    return pd.DataFrame({'status': status, 'reason': reason, 'suggestion': suggestion}, index=emails.index)
+
+
+def email_validation_fields(email):
+    """Contact field values for one address (API writes)."""
+    result = validate_emails([email]).iloc[0]
+    return {'email_status': result['status'], 'email_status_reason': result['reason'],
+            'email_suggestion': result['suggestion']}
+
+
+def validate_contacts(contacts=None, batch_size=None):
+    """
+    Checks the emails of a Contact queryset (default: all contacts) in id-ordered batches and
+    writes the results with one UPDATE per distinct outcome. Returns a Counter of statuses.
+    """
+    contacts = contacts if contacts is not None else Contact.objects.all()
+    batch_size = batch_size or validation_batch_size()
+    statuses = Counter()
+    last_id = 0
+    while True:
+        # Keyset on id: contacts leaving the queryset once checked (status 'unknown') are not skipped
+        rows = list(contacts.filter(id__gt=last_id).order_by('id').values_list('id', 'email')[:batch_size])
+        if not rows:
+            return statuses
+        last_id = rows[-1][0]
+        ids = [pk for pk, _ in rows]
+        results = validate_emails([email for _, email in rows])
+        results['id'] = ids
+        results['suggestion'] = results['suggestion'].fillna('')
+        with transaction.atomic():
+            for (status, reason, suggestion), group in results.groupby(['status', 'reason', 'suggestion'], sort=False):
+                Contact.objects.filter(id__in=group['id'].tolist()).update(
+                    email_status=status, email_status_reason=reason, email_suggestion=suggestion or None)
+        statuses.update(results['status'].tolist())
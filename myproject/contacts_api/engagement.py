@@ -0,0 +1,193 @@
+"""
+Contact engagement maintained from the event stream.
+
+Opens and clicks update the Contact columns last_opened_at, last_clicked_at,
+recent_open_count / recent_click_count (events within CONTACT_ENGAGEMENT_WINDOW_DAYS)
+and an exponentially decayed engagement score. Ingestion queues events on an
+EngagementSink and applies them once per batch, like SuppressionSink.
+
+The score halves every CONTACT_ENGAGEMENT_HALF_LIFE_DAYS. Rather than rewriting every
+contact as time passes, each event adds `weight * 2 ** (age_since_epoch / half_life)` to
+`engagement_points`; the current score is points / 2 ** (now_since_epoch / half_life).
+"score >= X" therefore becomes the indexed predicate points >= X * growth(now).
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Contact
+
+logger = logging.getLogger(__name__)
+
+ENGAGEMENT_EVENT_TYPES = ('opened', 'clicked')
+SCORE_EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def half_life_days():
+    return getattr(settings, 'CONTACT_ENGAGEMENT_HALF_LIFE_DAYS', 30)
+
+
+def window_days():
+    return getattr(settings, 'CONTACT_ENGAGEMENT_WINDOW_DAYS', 90)
+
+
+def event_weight(event_type):
+    if event_type == 'clicked':
+        return getattr(settings, 'CONTACT_ENGAGEMENT_CLICK_WEIGHT', 3.0)
+    return getattr(settings, 'CONTACT_ENGAGEMENT_OPEN_WEIGHT', 1.0)
+
+
+def _growth(moment):
+    return 2 ** ((moment - SCORE_EPOCH).total_seconds() / (half_life_days() * 86400))
+
+
+def event_points(event_type, moment):
+    return event_weight(event_type) * _growth(moment)
+
+
+def score_from_points(points, now=None):
+    """Current decayed score: each open counts `open weight` today, half that one half-life ago, etc."""
+    return points / _growth(now or timezone.now())
+
+
+def engagement_q(min_score=None, engaged_within_days=None, now=None):
+    """Filter for contacts with a score of at least min_score and/or an open or click in the last N days."""
+    now = now or timezone.now()
+    condition = Q()
+    if min_score is not None:
+        condition &= Q(engagement_points__gte=min_score * _growth(now))
+    if engaged_within_days is not None:
+        since = now - timedelta(days=engaged_within_days)
+        condition &= Q(last_opened_at__gte=since) | Q(last_clicked_at__gte=since)
+    return condition
+
+
+class EngagementSink:
+    """
+    Collects opens and clicks per contact and applies them on flush(), one UPDATE per contact
+    with all of that contact's events folded in. Flushes automatically at `max_pending` contacts.
+    """
+
+    def __init__(self, max_pending=1000):
+        self.max_pending = max_pending
+        self._pending = {} # contact_id -> accumulated changes
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, contact_id, event_type, moment):
+        if event_type not in ENGAGEMENT_EVENT_TYPES:
+            return
+        entry = self._pending.setdefault(contact_id, {'opens': 0, 'clicks': 0, 'last_opened_at': None,
+                                                      'last_clicked_at': None, 'points': 0.0})
+        recent = moment >= timezone.now() - timedelta(days=window_days())
+        kind = 'opened' if event_type == 'opened' else 'clicked'
+        if recent:
+            entry['opens' if kind == 'opened' else 'clicks'] += 1
+        last_field = f'last_{kind}_at'
+        if entry[last_field] is None or moment > entry[last_field]:
+            entry[last_field] = moment
+        entry['points'] += event_points(event_type, moment)
+        if len(self) >= self.max_pending:
+            self.flush()
+
+    def flush(self):
+        """Applies pending engagement. Returns the number of contacts updated."""
+        if not self._pending:
+            return 0
+        with transaction.atomic():
+            for contact_id, entry in self._pending.items():
+                updates = {'engagement_points': F('engagement_points') + entry['points']}
+                if entry['opens']:
+                    updates['recent_open_count'] = F('recent_open_count') + entry['opens']
+                if entry['clicks']:
+                    updates['recent_click_count'] = F('recent_click_count') + entry['clicks']
+                for field in ('last_opened_at', 'last_clicked_at'):
+                    if entry[field]:
+                        # Events can arrive out of order; never move the timestamp backwards.
+                        updates[field] = Greatest(Coalesce(F(field), entry[field]), entry[field])
+                Contact.objects.filter(id=contact_id).update(**updates)
+        from .segments import ENGAGEMENT_FIELDS, refresh_contact_segments # Segments import this module
+        # Only segments with engagement rules; the periodic refresh_segments task covers the rest
+        refresh_contact_segments(self._pending, fields=ENGAGEMENT_FIELDS)
+        updated = len(self._pending)
+        self._pending.clear()
+        return updated
+
+
+def _event_rows(contact_ids):
+    """(contact_id, event_type, timestamp) of every open/click of the contacts, archived ones included."""
+    from campaigns_api.archive import load_archived_events
+    from campaigns_api.models import CampaignAnalytics
+    events = CampaignAnalytics.objects.filter(contact_id__in=contact_ids, event_type__in=ENGAGEMENT_EVENT_TYPES)
+    yield from events.values_list('contact_id', 'event_type', 'event_timestamp').order_by().iterator(chunk_size=5000)
+    campaign_ids = set(events.values_list('campaign_id', flat=True).distinct().order_by())
+    archived = load_archived_events(campaign_ids, columns=['contact_id', 'event_type', 'event_timestamp'])
+    archived = archived[archived['contact_id'].isin(list(contact_ids)) & archived['event_type'].isin(ENGAGEMENT_EVENT_TYPES)]
+    for contact_id, event_type, moment in archived.itertuples(index=False):
+        yield int(contact_id), event_type, moment.to_pydatetime()
+
+
+def rebuild_contact_engagement(contacts=None, batch_size=1000):
+    """
+    Recomputes the engagement columns from raw events (backfill, or repair after a settings change).
+    `contacts` is a Contact queryset (default: all). Returns the number of contacts written.
+    """
+    contacts = contacts if contacts is not None else Contact.objects.all()
+    contact_ids = list(contacts.order_by('id').values_list('id', flat=True))
+    cutoff = timezone.now() - timedelta(days=window_days())
+    written = 0
+    for i in range(0, len(contact_ids), batch_size):
+        batch = contact_ids[i:i + batch_size]
+        state = defaultdict(lambda: {'last_opened_at': None, 'last_clicked_at': None, 'recent_open_count': 0,
+                                     'recent_click_count': 0, 'engagement_points': 0.0})
+        for contact_id, event_type, moment in _event_rows(batch):
+            entry = state[contact_id]
+            kind = 'opened' if event_type == 'opened' else 'clicked'
+            if entry[f'last_{kind}_at'] is None or moment > entry[f'last_{kind}_at']:
+                entry[f'last_{kind}_at'] = moment
+            if moment >= cutoff:
+                entry['recent_open_count' if kind == 'opened' else 'recent_click_count'] += 1
+            entry['engagement_points'] += event_points(event_type, moment)
+
+        updated = []
+        for contact_id in batch:
+            contact = Contact(id=contact_id)
+            for field, value in state[contact_id].items():
+                setattr(contact, field, value)
+            updated.append(contact)
+        Contact.objects.bulk_update(updated, ['last_opened_at', 'last_clicked_at', 'recent_open_count',
+                                              'recent_click_count', 'engagement_points'], batch_size=500)
+        written += len(updated)
+    return written
+
+
+def refresh_recent_counts(batch_size=1000):
+    """
+    Re-derives recent_open_count / recent_click_count for contacts that have any, so events that
+    slid out of the window stop counting. Intended for a daily periodic task. Returns contacts updated.
+    """
+    from campaigns_api.models import CampaignAnalytics
+    cutoff = timezone.now() - timedelta(days=window_days())
+    candidates = list(Contact.objects.filter(Q(recent_open_count__gt=0) | Q(recent_click_count__gt=0))
+                      .order_by('id').values_list('id', flat=True))
+    updated = 0
+    for i in range(0, len(candidates), batch_size):
+        batch = candidates[i:i + batch_size]
+        counts = defaultdict(lambda: {'opened': 0, 'clicked': 0})
+        rows = (CampaignAnalytics.objects
+                .filter(contact_id__in=batch, event_type__in=ENGAGEMENT_EVENT_TYPES, event_timestamp__gte=cutoff)
+                .values('contact_id', 'event_type').annotate(n=Count('id')).order_by())
+        for row in rows:
+            counts[row['contact_id']][row['event_type']] = row['n']
+        contacts = [Contact(id=cid, recent_open_count=counts[cid]['opened'], recent_click_count=counts[cid]['clicked'])
+                    for cid in batch]
+        Contact.objects.bulk_update(contacts, ['recent_open_count', 'recent_click_count'], batch_size=500)
+        updated += len(contacts)
+    return updated
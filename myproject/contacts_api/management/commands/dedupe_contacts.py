@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from contacts_api.dedup import dedupe_contacts
+
+
+class Command(BaseCommand):
+    help = 'Merge contacts whose emails differ only in case or surrounding spaces, and normalize stored emails'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', type=int, action='append', dest='owner_ids',
+                            help='Owner (user) id whose contacts to dedupe (repeatable). Defaults to all contacts.')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Duplicate clusters merged per transaction (default: CONTACT_DEDUP_BATCH_SIZE)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the duplicate clusters')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size']) if options['batch_size'] else None
+        summary = dedupe_contacts(options['owner_ids'], batch_size=batch_size, dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f"{summary['clusters']} duplicate clusters, {summary['merged']} contacts would be merged.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Merged {summary['merged']} contacts in {summary['clusters']} clusters ({summary['events_repointed']} events "
+            f"re-pointed), normalized {summary['emails_normalized']} emails, rebuilt {summary['campaigns_rebuilt']} campaigns."))
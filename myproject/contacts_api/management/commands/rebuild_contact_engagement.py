@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from contacts_api.engagement import rebuild_contact_engagement
+from contacts_api.models import Contact
+
+
+class Command(BaseCommand):
+    help = 'Recompute contact engagement columns (last open/click, recent counts, score) from analytics events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', type=int, action='append', dest='owner_ids',
+                            help='Owner (user) id whose contacts to rebuild (repeatable). Defaults to all contacts.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Contacts per batch')
+
+    def handle(self, *args, **options):
+        contacts = Contact.objects.all()
+        if options['owner_ids']:
+            contacts = contacts.filter(owner_id__in=options['owner_ids'])
+        written = rebuild_contact_engagement(contacts, batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt engagement for {written} contacts."))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from contacts_api.email_validation import validate_contacts
+from contacts_api.models import Contact
+
+
+class Command(BaseCommand):
+    help = 'Check contact emails offline (syntax, domain typos, disposable domains, role accounts) and store email_status'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', type=int, action='append', dest='owner_ids',
+                            help='Owner (user) id whose contacts to check (repeatable). Defaults to all contacts.')
+        parser.add_argument('--all', action='store_true', dest='revalidate',
+                            help='Re-check every contact, not only those never checked')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Contacts per batch (default: EMAIL_VALIDATION_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        contacts = Contact.objects.all() if options['revalidate'] else Contact.objects.filter(email_status='unknown')
+        if options['owner_ids']:
+            contacts = contacts.filter(owner_id__in=options['owner_ids'])
+        batch_size = max(1, options['batch_size']) if options['batch_size'] else None
+        statuses = validate_contacts(contacts, batch_size=batch_size)
+        details = ', '.join(f"{count} {status}" for status, count in sorted(statuses.items())) or 'none'
+        self.stdout.write(self.style.SUCCESS(f"Validated {sum(statuses.values())} contact emails ({details})."))
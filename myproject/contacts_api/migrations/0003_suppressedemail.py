@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contacts_api', '0002_contact_allow_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuppressedEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.CharField(max_length=255)),
+                ('reason', models.CharField(choices=[('bounced', 'Bounced'), ('complaint', 'Complaint'), ('manual', 'Manual')], default='manual', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suppressed_emails', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Suppressed Email',
+                'verbose_name_plural': 'Suppressed Emails',
+                'ordering': ['-created_at'],
+                'unique_together': {('owner', 'email')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts_api', '0003_suppressedemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contact',
+            name='engagement_points',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='last_clicked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='last_opened_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='recent_click_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='recent_open_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['owner', 'last_opened_at'], name='contacts_ap_owner_i_c7bff8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['owner', 'last_clicked_at'], name='contacts_ap_owner_i_93cfc0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['owner', 'engagement_points'], name='contacts_ap_owner_i_908eb2_idx'),
+        ),
+    ]
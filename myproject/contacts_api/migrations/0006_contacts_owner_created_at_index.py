@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts_api', '0005_importjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='contacts_ap_owner_i_6a9b2a_idx'),
+        ),
+    ]
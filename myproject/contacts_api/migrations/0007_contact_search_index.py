@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from contacts_api.search import create_search_index
+    create_search_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from contacts_api.search import drop_search_index
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """Full-text index over contacts (FTS5 on SQLite, tsvector + pg_trgm on PostgreSQL); see contacts_api/search.py."""
+
+    dependencies = [
+        ('contacts_api', '0006_contacts_owner_created_at_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
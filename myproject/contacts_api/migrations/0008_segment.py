@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contacts_api', '0007_contact_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Segment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('rules', models.JSONField(default=dict)),
+                ('materialized', models.BooleanField(default=False)),
+                ('member_count', models.PositiveIntegerField(blank=True, null=True)),
+                ('last_refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Segment',
+                'verbose_name_plural': 'Segments',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SegmentMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('added_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('contact', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segment_memberships', to='contacts_api.contact')),
+                ('segment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='contacts_api.segment')),
+            ],
+            options={
+                'unique_together': {('segment', 'contact')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='segment',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='contacts_ap_owner_i_39ed8a_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='segment',
+            unique_together={('owner', 'name')},
+        ),
+    ]
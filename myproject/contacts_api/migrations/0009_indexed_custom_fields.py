@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contacts_api', '0008_segment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexedCustomField',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100)),
+                ('value_type', models.CharField(choices=[('text', 'Text'), ('number', 'Number')], default='text', max_length=10)),
+                ('status', models.CharField(choices=[('backfilling', 'Backfilling'), ('ready', 'Ready'), ('failed', 'Failed')], default='backfilling', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('backfilled_at', models.DateTimeField(blank=True, null=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='indexed_custom_fields', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Indexed Custom Field',
+                'verbose_name_plural': 'Indexed Custom Fields',
+                'ordering': ['-created_at'],
+                'unique_together': {('owner', 'key')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ContactFieldValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value_text', models.CharField(blank=True, max_length=255, null=True)),
+                ('value_number', models.FloatField(blank=True, null=True)),
+                ('contact', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='indexed_field_values', to='contacts_api.contact')),
+                ('field', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='contacts_api.indexedcustomfield')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['field', 'value_text'], name='contacts_ap_field_i_54be76_idx'), models.Index(fields=['field', 'value_number'], name='contacts_ap_field_i_bbd847_idx')],
+                'unique_together': {('field', 'contact')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:10
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts_api', '0010_contactbulkjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(models.F('owner'), django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('email')), name='contact_owner_norm_email_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts_api', '0011_contact_normalized_email_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contact',
+            name='email_status',
+            field=models.CharField(choices=[('unknown', 'Unknown'), ('valid', 'Valid'), ('risky', 'Risky'), ('invalid', 'Invalid')], default='unknown', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='email_status_reason',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='email_suggestion',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['owner', 'email_status'], name='contacts_ap_owner_i_1c9abb_idx'),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Lower, Trim
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -15,6 +17,26 @@ class Contact(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     # updated_at = models.DateTimeField(auto_now=True) # Optional: if you want to track updates
 
+    # Denormalized engagement, maintained from the event stream (contacts_api/engagement.py)
+    # so audience and sunset queries can filter without touching CampaignAnalytics.
+    last_opened_at = models.DateTimeField(null=True, blank=True)
+    last_clicked_at = models.DateTimeField(null=True, blank=True)
+    recent_open_count = models.PositiveIntegerField(default=0) # Opens within CONTACT_ENGAGEMENT_WINDOW_DAYS
+    recent_click_count = models.PositiveIntegerField(default=0)
+    # Exponentially decayed score, stored scaled to a fixed epoch; see engagement.score_from_points()
+    engagement_points = models.FloatField(default=0)
+
+    # Offline address check (contacts_api/email_validation.py); the send path skips blocked statuses
+    EMAIL_STATUS_CHOICES = [
+        ('unknown', 'Unknown'), # Not checked yet
+        ('valid', 'Valid'),
+        ('risky', 'Risky'), # Disposable domain, role account or likely typo of a common domain
+        ('invalid', 'Invalid'), # Bad syntax or a mistyped TLD
+    ]
+    email_status = models.CharField(max_length=10, choices=EMAIL_STATUS_CHOICES, default='unknown')
+    email_status_reason = models.CharField(max_length=20, blank=True, default='')
+    email_suggestion = models.CharField(max_length=255, blank=True, null=True) # Corrected address of a domain typo
+
     def __str__(self):
         return f"{self.first_name} {self.last_name}" if self.first_name and self.last_name else self.email
 
@@ -22,4 +44,189 @@ class Contact(models.Model):
         ordering = ['-created_at']
         # Add any other meta options if needed, e.g., unique_together constraints
         # unique_together = [['owner', 'email']] # If email should be unique per owner instead of globally
-        pass
+        indexes = [
+            models.Index(fields=['owner', 'last_opened_at']),
+            models.Index(fields=['owner', 'last_clicked_at']),
+            models.Index(fields=['owner', 'engagement_points']),
+            models.Index(fields=['owner', '-created_at', '-id']), # Keyset pagination of the list endpoint
+            models.Index(fields=['owner', 'email_status']),
+            # Duplicate detection groups on the normalized address (contacts_api/dedup.py)
+            models.Index(F('owner'), Lower(Trim('email')), name='contact_owner_norm_email_idx'),
+        ]
+
+
+class SuppressedEmail(models.Model):
+    """
+    Account-wide suppression list. Addresses land here from bounce/complaint events
+    (see contacts_api/suppression.py) and are skipped by the send path even if the
+    contact row is re-imported or recreated.
+    """
+    REASON_CHOICES = [
+        ('bounced', 'Bounced'),
+        ('complaint', 'Complaint'),
+        ('manual', 'Manual'),
+    ]
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='suppressed_emails')
+    email = models.CharField(max_length=255)
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, default='manual')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.email} ({self.get_reason_display()})"
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = [['owner', 'email']]
+        verbose_name = "Suppressed Email"
+        verbose_name_plural = "Suppressed Emails"
+
+
+class ImportJob(models.Model):
+    """
+    A contact upload processed in the background (contacts_api/importer.py, task import_contacts).
+    The uploaded file is kept under CONTACT_IMPORT_DIR until the job finishes; counters are
+    updated after every chunk so clients can poll progress.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='import_jobs')
+    file_name = models.CharField(max_length=255) # Name of the uploaded file, for display
+    file_path = models.CharField(max_length=1024, blank=True) # Relative to CONTACT_IMPORT_DIR; cleared when done
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    rows_processed = models.PositiveIntegerField(default=0)
+    contacts_created = models.PositiveIntegerField(default=0)
+    rows_skipped = models.PositiveIntegerField(default=0)
+    # Per-row errors in the upload report format, capped at CONTACT_IMPORT_MAX_ERRORS (rows_skipped has the full count)
+    errors = models.JSONField(default=list, blank=True)
+    error_message = models.TextField(blank=True) # Why the job failed as a whole (unreadable file, missing column...)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Import Job"
+        verbose_name_plural = "Import Jobs"
+
+    def __str__(self):
+        return f"Import {self.id} of {self.file_name} ({self.get_status_display()})"
+
+
+class Segment(models.Model):
+    """
+    A saved audience: an AND/OR tree of rules over contact fields, custom_fields keys and
+    engagement columns (see contacts_api/segments.py for the rule format). The tree is compiled
+    into one SQL filter. With `materialized` set, membership is also kept in SegmentMembership
+    and refreshed by diff, so sends and counts read an indexed join instead of re-evaluating the rules.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='segments')
+    name = models.CharField(max_length=255)
+    rules = models.JSONField(default=dict)
+    materialized = models.BooleanField(default=False)
+    member_count = models.PositiveIntegerField(null=True, blank=True) # Materialized segments only
+    last_refreshed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = [['owner', 'name']]
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id']), # Keyset pagination of the list endpoint
+        ]
+        verbose_name = "Segment"
+        verbose_name_plural = "Segments"
+
+    def __str__(self):
+        return f"{self.name} (Owner: {self.owner.username})"
+
+
+class SegmentMembership(models.Model):
+    """Materialized membership of a Segment, maintained by segments.refresh_segment()."""
+    segment = models.ForeignKey(Segment, on_delete=models.CASCADE, related_name='memberships')
+    contact = models.ForeignKey(Contact, on_delete=models.CASCADE, related_name='segment_memberships')
+    added_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = [['segment', 'contact']] # Also the index sends join through
+
+
+class IndexedCustomField(models.Model):
+    """
+    A custom_fields key an owner filters on often, promoted to the typed ContactFieldValue side
+    table (see contacts_api/custom_field_index.py). Queries use it once the backfill has finished.
+    """
+    VALUE_TYPE_CHOICES = [
+        ('text', 'Text'),
+        ('number', 'Number'),
+    ]
+    STATUS_CHOICES = [
+        ('backfilling', 'Backfilling'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='indexed_custom_fields')
+    key = models.CharField(max_length=100)
+    value_type = models.CharField(max_length=10, choices=VALUE_TYPE_CHOICES, default='text')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='backfilling')
+    created_at = models.DateTimeField(auto_now_add=True)
+    backfilled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = [['owner', 'key']]
+        verbose_name = "Indexed Custom Field"
+        verbose_name_plural = "Indexed Custom Fields"
+
+    def __str__(self):
+        return f"{self.key} ({self.get_value_type_display()}) - Owner: {self.owner.username}"
+
+
+class ContactFieldValue(models.Model):
+    """One contact's value of an IndexedCustomField, typed so equality and range filters hit an index."""
+    field = models.ForeignKey(IndexedCustomField, on_delete=models.CASCADE, related_name='values')
+    contact = models.ForeignKey(Contact, on_delete=models.CASCADE, related_name='indexed_field_values')
+    value_text = models.CharField(max_length=255, null=True, blank=True)
+    value_number = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        unique_together = [['field', 'contact']]
+        indexes = [
+            models.Index(fields=['field', 'value_text']),
+            models.Index(fields=['field', 'value_number']),
+        ]
+
+
+class ContactBulkJob(models.Model):
+    """
+    A bulk update or delete too large to run inside the request (contacts_api/bulk.py, task
+    run_contact_bulk_job). Contacts are processed in id order, one chunk per transaction, and
+    `affected` is saved after every chunk so clients can poll progress.
+    """
+    ACTION_CHOICES = [
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+    ]
+    STATUS_CHOICES = ImportJob.STATUS_CHOICES
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='contact_bulk_jobs')
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    target = models.JSONField(default=dict) # {"ids": [...]}, {"filter": <segment rules>} or {"segment_id": ...}
+    changes = models.JSONField(default=dict, blank=True) # Update only: {"allow_email": ..., "custom_fields": {...}}
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    matched = models.PositiveIntegerField(default=0) # Contacts targeted when the job was queued
+    affected = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Contact Bulk Job"
+        verbose_name_plural = "Contact Bulk Jobs"
+
+    def __str__(self):
+        return f"Bulk {self.action} {self.id} ({self.get_status_display()})"
@@ -0,0 +1,301 @@
+"""
+Segment rule trees, compiled into a single SQL filter over Contact.
+
+A rule tree is either a group or a condition:
+
+    {"all": [<rule>, ...]}                         every rule matches (AND)
+    {"any": [<rule>, ...]}                         at least one matches (OR)
+    {"not": <rule>}
+    {"field": "<field>", "op": "<op>", "value": ...}
+
+Fields are the Contact columns in CONTACT_FIELDS, the computed "engagement_score" and
+"custom_fields.<key>" for a top-level custom_fields key (answered from the typed side table when
+the owner has promoted the key, see custom_field_index.py). Ops are listed in OPS; "within_days" and
+"older_than_days" take a number of days and apply to the date fields. For example, contacts in
+Lyon who clicked in the last 30 days or score at least 5:
+
+    {"all": [
+        {"field": "custom_fields.city", "op": "eq", "value": "Lyon"},
+        {"any": [{"field": "last_clicked_at", "op": "within_days", "value": 30},
+                 {"field": "engagement_score", "op": "gte", "value": 5}]}
+    ]}
+
+Materialized segments keep their members in SegmentMembership. refresh_segment() rewrites only
+the difference between the stored members and the current matches, for the whole segment or
+for a few contacts (refresh_contact_segments(), called when contacts or their engagement change).
+Rules relative to "now" (within_days, engagement_score) drift over time, so the periodic
+refresh_segments task re-diffs every materialized segment.
+"""
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .custom_field_index import indexed_condition, ready_fields
+from .engagement import engagement_q
+from .models import Contact, Segment, SegmentMembership
+
+CONTACT_FIELDS = {
+    'email': 'text',
+    'first_name': 'text',
+    'last_name': 'text',
+    'allow_email': 'bool',
+    'email_status': 'text',
+    'created_at': 'date',
+    'last_opened_at': 'date',
+    'last_clicked_at': 'date',
+    'recent_open_count': 'number',
+    'recent_click_count': 'number',
+    'engagement_score': 'score',
+}
+# Fields the event stream changes (EngagementSink); only segments using them follow each open/click
+ENGAGEMENT_FIELDS = frozenset({'last_opened_at', 'last_clicked_at', 'recent_open_count', 'recent_click_count',
+                               'engagement_score'})
+CUSTOM_FIELD_PREFIX = 'custom_fields.'
+CUSTOM_FIELD_KEY = re.compile(r'^[A-Za-z0-9_]+$') # No "__", which Django would read as a lookup
+DOUBLE_UNDERSCORE = '__'
+
+# op -> field kinds it applies to ('custom' is any custom_fields key)
+OPS = {
+    'eq': {'text', 'bool', 'number', 'date', 'custom'},
+    'ne': {'text', 'bool', 'number', 'date', 'custom'},
+    'in': {'text', 'number', 'custom'},
+    'contains': {'text', 'custom'},
+    'startswith': {'text', 'custom'},
+    'endswith': {'text', 'custom'},
+    'gt': {'number', 'date', 'score', 'custom'},
+    'gte': {'number', 'date', 'score', 'custom'},
+    'lt': {'number', 'date', 'score', 'custom'},
+    'lte': {'number', 'date', 'score', 'custom'},
+    'exists': {'text', 'date', 'custom'},
+    'within_days': {'date'},
+    'older_than_days': {'date'},
+}
+LOOKUPS = {'eq': 'exact', 'in': 'in', 'contains': 'icontains', 'startswith': 'istartswith',
+           'endswith': 'iendswith', 'gt': 'gt', 'gte': 'gte', 'lt': 'lt', 'lte': 'lte'}
+MAX_DEPTH = 10
+MAX_CONDITIONS = 100
+
+
+class SegmentRuleError(ValueError):
+    pass
+
+
+def refresh_batch_size():
+    return getattr(settings, 'SEGMENT_REFRESH_BATCH_SIZE', 5000)
+
+
+def _field_kind(field):
+    if not isinstance(field, str):
+        raise SegmentRuleError("Condition field must be a string.")
+    if field.startswith(CUSTOM_FIELD_PREFIX):
+        key = field[len(CUSTOM_FIELD_PREFIX):]
+        if not CUSTOM_FIELD_KEY.match(key) or DOUBLE_UNDERSCORE in key:
+            raise SegmentRuleError(f"Invalid custom field key: '{key}'.")
+        return 'custom'
+    if field not in CONTACT_FIELDS:
+        raise SegmentRuleError(f"Unknown field: '{field}'.")
+    return CONTACT_FIELDS[field]
+
+
+def validate_rules(node, depth=0, _count=None):
+    """Raises SegmentRuleError if `node` is not a well-formed rule tree. Returns the condition count."""
+    count = _count if _count is not None else [0]
+    if depth > MAX_DEPTH:
+        raise SegmentRuleError(f"Rules are nested deeper than {MAX_DEPTH} levels.")
+    if not isinstance(node, dict):
+        raise SegmentRuleError("Each rule must be an object.")
+    if 'all' in node or 'any' in node:
+        children = node.get('all', node.get('any'))
+        if len(node) != 1 or not isinstance(children, list) or not children:
+            raise SegmentRuleError("'all' / 'any' must be the only key and hold a non-empty list of rules.")
+        for child in children:
+            validate_rules(child, depth + 1, count)
+    elif 'not' in node:
+        if len(node) != 1:
+            raise SegmentRuleError("'not' must be the only key of its rule.")
+        validate_rules(node['not'], depth + 1, count)
+    else:
+        if set(node) - {'field', 'op', 'value'} or 'field' not in node or 'op' not in node:
+            raise SegmentRuleError("A condition has exactly the keys 'field', 'op' and 'value'.")
+        kind = _field_kind(node['field'])
+        op = node['op']
+        if op not in OPS:
+            raise SegmentRuleError(f"Unknown op: '{op}'.")
+        if kind not in OPS[op]:
+            raise SegmentRuleError(f"Op '{op}' does not apply to field '{node['field']}'.")
+        value = node.get('value')
+        if op == 'in' and not isinstance(value, list):
+            raise SegmentRuleError("'in' takes a list of values.")
+        if op in ('within_days', 'older_than_days') or (kind in ('number', 'score') and op in LOOKUPS):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise SegmentRuleError(f"'{node['field']} {op}' takes a number.")
+        elif kind == 'date' and op in ('eq', 'ne', 'gt', 'gte', 'lt', 'lte'):
+            if not isinstance(value, str) or parse_datetime(value) is None:
+                raise SegmentRuleError(f"'{node['field']} {op}' takes an ISO 8601 datetime.")
+        if op == 'exists' and not isinstance(value, bool):
+            raise SegmentRuleError("'exists' takes true or false.")
+        count[0] += 1
+        if count[0] > MAX_CONDITIONS:
+            raise SegmentRuleError(f"A segment can have at most {MAX_CONDITIONS} conditions.")
+    return count[0]
+
+
+def _condition_q(field, op, value, now, indexed):
+    kind = _field_kind(field)
+    if kind == 'score':
+        # Same indexed points comparison as engagement_q(); score <= X is the negation of score > X
+        if op in ('gte', 'gt'):
+            return engagement_q(min_score=value, now=now)
+        return ~engagement_q(min_score=value, now=now)
+    if kind == 'custom':
+        key = field[len(CUSTOM_FIELD_PREFIX):]
+        if key in indexed:
+            condition = indexed_condition(indexed[key], op, value)
+            if condition is not None:
+                return condition
+        if op == 'exists':
+            condition = Q(custom_fields__has_key=key)
+            return condition if value else ~condition
+        path = f'custom_fields__{key}'
+    else:
+        path = field
+        if kind == 'date' and isinstance(value, str):
+            value = parse_datetime(value)
+            if timezone.is_naive(value):
+                value = timezone.make_aware(value)
+        if op == 'exists':
+            condition = Q(**{f'{path}__isnull': True})
+            return ~condition if value else condition
+    if op == 'within_days':
+        return Q(**{f'{path}__gte': now - timedelta(days=value)})
+    if op == 'older_than_days':
+        return Q(**{f'{path}__lt': now - timedelta(days=value)})
+    if op == 'ne':
+        return ~Q(**{path: value})
+    return Q(**{f'{path}__{LOOKUPS[op]}': value})
+
+
+def rule_fields(node):
+    """Set of the fields a validated rule tree refers to."""
+    if 'all' in node or 'any' in node:
+        return set().union(*(rule_fields(child) for child in node.get('all', node.get('any'))))
+    if 'not' in node:
+        return rule_fields(node['not'])
+    return {node['field']}
+
+
+def compile_rules(node, now=None, indexed=None):
+    """
+    Django Q for a validated rule tree; `now` anchors within_days and engagement_score and
+    `indexed` maps promoted custom_fields keys to their IndexedCustomField (ready_fields()).
+    """
+    now = now or timezone.now()
+    indexed = indexed or {}
+    if 'all' in node or 'any' in node:
+        compiled = [compile_rules(child, now, indexed) for child in node.get('all', node.get('any'))]
+        combined = compiled[0]
+        for condition in compiled[1:]:
+            combined = combined & condition if 'all' in node else combined | condition
+        return combined
+    if 'not' in node:
+        return ~compile_rules(node['not'], now, indexed)
+    return _condition_q(node['field'], node['op'], node.get('value'), now, indexed)
+
+
+def matching_contacts(segment, now=None):
+    """The owner's contacts matching the segment's rules, evaluated now (one query)."""
+    condition = compile_rules(segment.rules, now, indexed=ready_fields(segment.owner_id))
+    return Contact.objects.filter(condition, owner_id=segment.owner_id)
+
+
+def segment_contacts(segment):
+    """Members of the segment: the materialized membership if kept, otherwise the rules evaluated now."""
+    if segment.materialized:
+        return Contact.objects.filter(segment_memberships__segment=segment)
+    return matching_contacts(segment)
+
+
+def refresh_segment(segment, contact_ids=None, now=None):
+    """
+    Brings the segment's stored membership in line with its rules, writing only the difference.
+    With `contact_ids`, only those contacts are re-checked. Returns (added, removed).
+    """
+    now = now or timezone.now()
+    matching = matching_contacts(segment, now)
+    members = SegmentMembership.objects.filter(segment=segment)
+    if contact_ids is not None:
+        matching = matching.filter(id__in=contact_ids)
+        members = members.filter(contact_id__in=contact_ids)
+
+    with transaction.atomic():
+        removed, _ = members.exclude(contact_id__in=matching.values('id')).delete()
+        new_ids = list(matching.exclude(id__in=members.values('contact_id')).values_list('id', flat=True).order_by())
+        batch_size = refresh_batch_size()
+        for start in range(0, len(new_ids), batch_size):
+            SegmentMembership.objects.bulk_create(
+                [SegmentMembership(segment=segment, contact_id=pk, added_at=now) for pk in new_ids[start:start + batch_size]],
+                ignore_conflicts=True,
+            )
+        if contact_ids is None:
+            segment.member_count = SegmentMembership.objects.filter(segment=segment).count()
+            segment.last_refreshed_at = now
+            segment.save(update_fields=['member_count', 'last_refreshed_at'])
+        elif new_ids or removed:
+            Segment.objects.filter(pk=segment.pk).update(member_count=F('member_count') + len(new_ids) - removed)
+    return len(new_ids), removed
+
+
+def clear_segment(segment):
+    """Drops the stored membership (segment no longer materialized)."""
+    SegmentMembership.objects.filter(segment=segment).delete()
+    segment.member_count = None
+    segment.save(update_fields=['member_count'])
+
+
+def refresh_contact_segments(contact_ids, fields=None):
+    """
+    Re-checks the given contacts against the materialized segments of their owners; with `fields`,
+    only against segments whose rules use one of them (the others cannot have changed).
+    """
+    contact_ids = list(contact_ids)
+    if not contact_ids:
+        return 0
+    owners = Contact.objects.filter(id__in=contact_ids).values('owner_id')
+    segments = list(Segment.objects.filter(materialized=True, owner_id__in=owners))
+    if fields is not None:
+        segments = [segment for segment in segments if rule_fields(segment.rules) & set(fields)]
+    for segment in segments:
+        refresh_segment(segment, contact_ids=contact_ids)
+    return len(segments)
+
+
+def forget_contacts(contact_ids):
+    """Drops contacts about to be deleted from materialized segments, keeping member_count right."""
+    memberships = SegmentMembership.objects.filter(contact_id__in=contact_ids)
+    for row in memberships.values('segment_id').annotate(members=Count('id')).order_by():
+        Segment.objects.filter(pk=row['segment_id']).update(member_count=F('member_count') - row['members'])
+    memberships.delete()
+
+
+def refresh_owner_segments(owner_id):
+    """Full refresh of an owner's materialized segments (e.g. after a bulk import)."""
+    segments = list(Segment.objects.filter(materialized=True, owner_id=owner_id))
+    for segment in segments:
+        refresh_segment(segment)
+    return len(segments)
+
+
+def segment_recipients(owner, segment_id):
+    """Send audience for recipient_group {"type": "segment", "id": ...}; refreshes materialized membership first."""
+    try:
+        segment = Segment.objects.get(pk=segment_id, owner=owner)
+    except (Segment.DoesNotExist, ValueError, TypeError):
+        raise ValueError(f"Segment {segment_id} not found.")
+    if segment.materialized:
+        refresh_segment(segment)
+    return segment_contacts(segment)
@@ -1,17 +1,29 @@
 from rest_framework import serializers
-from .models import Contact
+from .engagement import score_from_points
+from .models import Contact, ContactBulkJob, ImportJob, IndexedCustomField, Segment
+from .segments import CUSTOM_FIELD_KEY, DOUBLE_UNDERSCORE, SegmentRuleError, validate_rules
 from django.contrib.auth.models import User
 
 class ContactSerializer(serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source='owner.username')
     # Or, if you want to show the owner's ID:
     # owner = serializers.PrimaryKeyRelatedField(read_only=True)
+    engagement_score = serializers.SerializerMethodField()
 
     class Meta:
         model = Contact
-        fields = ['id', 'owner', 'email', 'first_name', 'last_name', 'custom_fields', 'allow_email', 'created_at']
+        fields = ['id', 'owner', 'email', 'first_name', 'last_name', 'custom_fields', 'allow_email', 'created_at',
+                  'last_opened_at', 'last_clicked_at', 'recent_open_count', 'recent_click_count', 'engagement_score',
+                  'email_status', 'email_status_reason', 'email_suggestion']
         # You can make some fields read-only if they shouldn't be updated via API, e.g., 'created_at'
-        read_only_fields = ['created_at']
+        # Engagement columns are maintained from the event stream only.
+        # Email validation results are computed from the address (contacts_api/email_validation.py).
+        read_only_fields = ['created_at', 'last_opened_at', 'last_clicked_at', 'recent_open_count', 'recent_click_count',
+                            'email_status', 'email_status_reason', 'email_suggestion']
+
+    def get_engagement_score(self, obj):
+        # Stored as epoch-scaled points; decay to "now" on the way out.
+        return round(score_from_points(obj.engagement_points), 4)
 
     def validate_email(self, value):
         """
@@ -31,3 +43,60 @@ class ContactSerializer(serializers.ModelSerializer):
     #     # Example: automatically set owner if not already handled by view
     #     # validated_data['owner'] = self.context['request'].user
     #     return super().create(validated_data)
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = ['id', 'file_name', 'status', 'rows_processed', 'contacts_created', 'rows_skipped',
+                  'errors', 'error_message', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+
+class SegmentSerializer(serializers.ModelSerializer):
+    owner = serializers.ReadOnlyField(source='owner.username')
+
+    class Meta:
+        model = Segment
+        fields = ['id', 'owner', 'name', 'rules', 'materialized', 'member_count', 'last_refreshed_at', 'created_at']
+        read_only_fields = ['member_count', 'last_refreshed_at', 'created_at']
+
+    def validate_rules(self, value):
+        try:
+            validate_rules(value)
+        except SegmentRuleError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+    def validate_name(self, value):
+        request = self.context.get('request', None)
+        if request and request.user.is_authenticated:
+            others = Segment.objects.filter(owner=request.user, name=value)
+            if self.instance:
+                others = others.exclude(pk=self.instance.pk)
+            if others.exists():
+                raise serializers.ValidationError("You already have a segment with this name.")
+        return value
+
+
+class IndexedCustomFieldSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = IndexedCustomField
+        fields = ['id', 'key', 'value_type', 'status', 'created_at', 'backfilled_at']
+        read_only_fields = ['status', 'created_at', 'backfilled_at']
+
+    def validate_key(self, value):
+        if not CUSTOM_FIELD_KEY.match(value) or DOUBLE_UNDERSCORE in value:
+            raise serializers.ValidationError("Keys may contain letters, digits and single underscores only.")
+        request = self.context.get('request', None)
+        if request and request.user.is_authenticated and IndexedCustomField.objects.filter(owner=request.user, key=value).exists():
+            raise serializers.ValidationError("This key is already indexed.")
+        return value
+
+
+class ContactBulkJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ContactBulkJob
+        fields = ['id', 'action', 'changes', 'status', 'matched', 'affected', 'error_message',
+                  'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
@@ -0,0 +1,69 @@
+"""
+Batched contact suppression.
+
+Bounce and complaint events used to issue one `Contact.save(update_fields=['allow_email'])`
+per event. SuppressionSink accumulates the affected contacts and addresses and applies them
+with one UPDATE on contacts plus one bulk INSERT into the account-wide SuppressedEmail list
+per flush. The send path loads that list once per campaign and checks it in memory.
+"""
+import logging
+
+from .models import Contact, SuppressedEmail
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+class SuppressionSink:
+    """
+    Collects suppressions and writes them in bulk on flush().
+    Flushes automatically once `max_pending` contacts are buffered; callers that batch
+    ingestion in a transaction should flush() before committing.
+    """
+
+    def __init__(self, max_pending=1000):
+        self.max_pending = max_pending
+        self._contact_ids = set()
+        self._entries = {} # (owner_id, email) -> reason; first reason wins
+
+    def __len__(self):
+        return len(self._contact_ids) + len(self._entries)
+
+    def add(self, owner_id, reason, contact_id=None, emails=()):
+        if contact_id is not None:
+            self._contact_ids.add(contact_id)
+        for email in emails:
+            email = normalize_email(email)
+            if email:
+                self._entries.setdefault((owner_id, email), reason)
+        if len(self) >= self.max_pending:
+            self.flush()
+
+    def flush(self):
+        """Applies pending suppressions. Returns (contacts_updated, addresses_recorded)."""
+        contacts_updated = 0
+        addresses_recorded = len(self._entries)
+        if self._contact_ids:
+            # Single set-based UPDATE; rows already suppressed are not rewritten.
+            contacts_updated = Contact.objects.filter(
+                id__in=self._contact_ids, allow_email=True
+            ).update(allow_email=False)
+        if self._entries:
+            SuppressedEmail.objects.bulk_create(
+                [SuppressedEmail(owner_id=owner_id, email=email, reason=reason)
+                 for (owner_id, email), reason in self._entries.items()],
+                ignore_conflicts=True, # Already-suppressed addresses are fine
+            )
+        if contacts_updated or addresses_recorded:
+            logger.info(f"Suppression flush: {contacts_updated} contacts set allow_email=False, {addresses_recorded} addresses recorded.")
+        self._contact_ids.clear()
+        self._entries.clear()
+        return contacts_updated, addresses_recorded
+
+
+def load_suppressed_emails(owner):
+    """Returns the owner's suppression list as a set of normalized addresses for in-memory checks."""
+    return set(SuppressedEmail.objects.filter(owner=owner).values_list('email', flat=True))
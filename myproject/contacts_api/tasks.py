@@ -31,3 +31,74 @@ def simple_test_task(message: str):
 #     except User.DoesNotExist:
 #         print(f"User with id {user_id} not found.")
 #         return 0
+
+
+@shared_task(name='refresh_contact_engagement')
+def refresh_contact_engagement():
+    """Daily periodic task: drops opens/clicks that slid out of CONTACT_ENGAGEMENT_WINDOW_DAYS from recent counts."""
+    from .engagement import refresh_recent_counts
+    return f"Refreshed recent engagement counts for {refresh_recent_counts()} contacts."
+
+
+@shared_task(name='import_contacts')
+def import_contacts(job_id):
+    """Runs a queued contact upload (ImportJob) chunk by chunk; see contacts_api/importer.py."""
+    from .importer import run_import_job
+    job = run_import_job(job_id)
+    return f"Import job {job.id} {job.status}: {job.contacts_created} created, {job.rows_skipped} skipped."
+
+
+@shared_task(name='refresh_segments')
+def refresh_segments():
+    """Periodic task: re-diffs every materialized segment, picking up drift in time-relative rules."""
+    from .models import Segment
+    from .segments import refresh_segment
+    added = removed = 0
+    segments = Segment.objects.filter(materialized=True)
+    for segment in segments.iterator():
+        segment_added, segment_removed = refresh_segment(segment)
+        added += segment_added
+        removed += segment_removed
+    return f"Refreshed {segments.count()} segments: {added} members added, {removed} removed."
+
+
+@shared_task(name='backfill_custom_field_index')
+def backfill_custom_field_index(field_id):
+    """Fills the side table of a newly promoted custom_fields key; see contacts_api/custom_field_index.py."""
+    from .custom_field_index import backfill_field
+    from .models import IndexedCustomField
+    try:
+        field = IndexedCustomField.objects.get(pk=field_id)
+    except IndexedCustomField.DoesNotExist:
+        return f"Indexed custom field {field_id} not found."
+    written = backfill_field(field)
+    return f"Indexed custom field '{field.key}' backfilled with {written} values."
+
+
+@shared_task(name='run_contact_bulk_job')
+def run_contact_bulk_job(job_id):
+    """Runs a queued bulk contact update or delete chunk by chunk; see contacts_api/bulk.py."""
+    from .bulk import run_bulk_job
+    job = run_bulk_job(job_id)
+    return f"Contact bulk job {job.id} {job.status}: {job.affected} of {job.matched} contacts."
+
+
+@shared_task(name='dedupe_contacts')
+def dedupe_contacts(owner_ids=None):
+    """Merges contacts whose emails differ only in case or surrounding spaces; see contacts_api/dedup.py."""
+    from .dedup import dedupe_contacts as run_dedup
+    summary = run_dedup(owner_ids)
+    return (f"Merged {summary['merged']} duplicate contacts in {summary['clusters']} clusters, "
+            f"normalized {summary['emails_normalized']} emails, rebuilt {summary['campaigns_rebuilt']} campaigns.")
+
+
+@shared_task(name='validate_contact_emails')
+def validate_contact_emails(owner_ids=None, revalidate=False):
+    """Offline check of stored emails (unchecked ones unless revalidate); see contacts_api/email_validation.py."""
+    from .email_validation import validate_contacts
+    from .models import Contact
+    contacts = Contact.objects.all() if revalidate else Contact.objects.filter(email_status='unknown')
+    if owner_ids:
+        contacts = contacts.filter(owner_id__in=owner_ids)
+    statuses = validate_contacts(contacts)
+    return f"Validated {sum(statuses.values())} contact emails: " + ", ".join(f"{n} {s}" for s, n in sorted(statuses.items()))
@@ -1,3 +1,698 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from .engagement import EngagementSink, rebuild_contact_engagement, refresh_recent_counts, score_from_points
+from .importer import ContactImporter
+from .models import Contact, ContactBulkJob, ContactFieldValue, ImportJob, IndexedCustomField, Segment, SegmentMembership, SuppressedEmail
+from .segments import SegmentRuleError, matching_contacts, refresh_segment, validate_rules
+from .suppression import SuppressionSink, load_suppressed_emails
+
+
+class SuppressionSinkTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='sinkowner', password='password123')
+        self.contacts = [
+            Contact.objects.create(owner=self.owner, email=f'sink{i}@example.com') for i in range(3)
+        ]
+
+    def test_flush_applies_one_update_for_all_contacts(self):
+        sink = SuppressionSink()
+        for contact in self.contacts:
+            sink.add(self.owner.id, 'bounced', contact_id=contact.id, emails=[contact.email])
+        self.assertEqual(Contact.objects.filter(allow_email=False).count(), 0) # Nothing written before flush
+        with self.assertNumQueries(2): # One UPDATE + one bulk INSERT
+            contacts_updated, addresses_recorded = sink.flush()
+        self.assertEqual((contacts_updated, addresses_recorded), (3, 3))
+        self.assertEqual(Contact.objects.filter(allow_email=False).count(), 3)
+        self.assertEqual(len(sink), 0)
+
+    def test_suppression_list_is_normalized_and_idempotent(self):
+        sink = SuppressionSink()
+        sink.add(self.owner.id, 'complaint', emails=[' Sink0@Example.com '])
+        sink.flush()
+        sink.add(self.owner.id, 'bounced', emails=['sink0@example.com'])
+        sink.flush()
+        self.assertEqual(SuppressedEmail.objects.count(), 1)
+        self.assertEqual(SuppressedEmail.objects.get().reason, 'complaint')
+        self.assertEqual(load_suppressed_emails(self.owner), {'sink0@example.com'})
+
+    def test_auto_flush_when_buffer_is_full(self):
+        sink = SuppressionSink(max_pending=2)
+        sink.add(self.owner.id, 'bounced', contact_id=self.contacts[0].id)
+        sink.add(self.owner.id, 'bounced', contact_id=self.contacts[1].id)
+        self.assertEqual(len(sink), 0)
+        self.assertEqual(Contact.objects.filter(allow_email=False).count(), 2)
+
+
+@override_settings(CONTACT_ENGAGEMENT_HALF_LIFE_DAYS=30, CONTACT_ENGAGEMENT_WINDOW_DAYS=90,
+                   CONTACT_ENGAGEMENT_OPEN_WEIGHT=1.0, CONTACT_ENGAGEMENT_CLICK_WEIGHT=3.0)
+class ContactEngagementTests(TestCase):
+    def setUp(self):
+        from campaigns_api.models import Campaign
+        self.owner = User.objects.create_user(username='engowner', password='password123')
+        self.active = Contact.objects.create(owner=self.owner, email='active@example.com')
+        self.stale = Contact.objects.create(owner=self.owner, email='stale@example.com')
+        self.campaign = Campaign.objects.create(owner=self.owner, name='Engagement')
+        self.now = timezone.now()
+
+    def _event(self, contact, event_type, moment):
+        from campaigns_api.models import CampaignAnalytics
+        return CampaignAnalytics.objects.create(campaign=self.campaign, contact=contact, event_type=event_type,
+                                                event_timestamp=moment)
+
+    def test_sink_folds_events_per_contact(self):
+        sink = EngagementSink()
+        sink.add(self.active.id, 'opened', self.now - timedelta(days=1))
+        sink.add(self.active.id, 'opened', self.now - timedelta(days=2)) # Out of order
+        sink.add(self.active.id, 'clicked', self.now)
+        sink.add(self.active.id, 'bounced', self.now) # Not an engagement event
+        with self.assertNumQueries(4): # SAVEPOINT + one UPDATE + RELEASE, then the materialized segments lookup
+            self.assertEqual(sink.flush(), 1)
+        self.active.refresh_from_db()
+        self.assertEqual((self.active.recent_open_count, self.active.recent_click_count), (2, 1))
+        self.assertEqual(self.active.last_opened_at, self.now - timedelta(days=1))
+        self.assertEqual(self.active.last_clicked_at, self.now)
+        self.assertAlmostEqual(score_from_points(self.active.engagement_points, self.now), 3 + 2 ** (-1 / 30) + 2 ** (-2 / 30))
+
+        sink.add(self.active.id, 'opened', self.now - timedelta(days=5)) # Older than what is stored
+        sink.flush()
+        self.active.refresh_from_db()
+        self.assertEqual(self.active.last_opened_at, self.now - timedelta(days=1))
+
+    def test_ingested_opens_use_the_open_time(self):
+        from campaigns_api.ingestion import ingest_ses_event
+        from campaigns_api.models import CampaignAnalytics
+        sent_at = self.now - timedelta(days=120)
+        opened_at = self.now - timedelta(days=2)
+        CampaignAnalytics.objects.create(campaign=self.campaign, contact=self.active, event_type='sent',
+                                         ses_message_id='eng-msg-1', event_timestamp=sent_at)
+        ingest_ses_event({'eventType': 'Open', 'mail': {'messageId': 'eng-msg-1', 'timestamp': sent_at.isoformat()},
+                          'open': {'timestamp': opened_at.isoformat()}})
+        self.active.refresh_from_db()
+        self.assertEqual(self.active.last_opened_at, opened_at)
+        self.assertEqual(self.active.recent_open_count, 1) # The send is outside the 90-day window, the open is not
+        self.assertAlmostEqual(score_from_points(self.active.engagement_points, self.now), 2 ** (-2 / 30))
+
+    def test_score_halves_every_half_life(self):
+        sink = EngagementSink()
+        sink.add(self.active.id, 'opened', self.now)
+        sink.flush()
+        self.active.refresh_from_db()
+        later = self.now + timedelta(days=30)
+        self.assertAlmostEqual(score_from_points(self.active.engagement_points, later), 0.5)
+
+    def test_rebuild_matches_incremental_updates(self):
+        moments = [(self.active, 'opened', self.now - timedelta(days=3)), (self.active, 'clicked', self.now),
+                   (self.stale, 'opened', self.now - timedelta(days=200))]
+        sink = EngagementSink()
+        for contact, event_type, moment in moments:
+            self._event(contact, event_type, moment)
+            sink.add(contact.id, event_type, moment)
+        sink.flush()
+        incremental = {c.id: c for c in Contact.objects.all()}
+
+        Contact.objects.update(engagement_points=0, recent_open_count=0, recent_click_count=0,
+                               last_opened_at=None, last_clicked_at=None)
+        self.assertEqual(rebuild_contact_engagement(batch_size=1), 2)
+        for contact in Contact.objects.all():
+            expected = incremental[contact.id]
+            self.assertEqual(contact.last_opened_at, expected.last_opened_at)
+            self.assertEqual(contact.last_clicked_at, expected.last_clicked_at)
+            self.assertEqual((contact.recent_open_count, contact.recent_click_count),
+                             (expected.recent_open_count, expected.recent_click_count))
+            self.assertAlmostEqual(contact.engagement_points, expected.engagement_points)
+        self.stale.refresh_from_db()
+        self.assertEqual(self.stale.recent_open_count, 0) # Outside the 90-day window
+
+    def test_refresh_drops_events_outside_window(self):
+        self._event(self.active, 'opened', self.now - timedelta(days=100))
+        Contact.objects.filter(id=self.active.id).update(recent_open_count=1)
+        self.assertEqual(refresh_recent_counts(), 1)
+        self.active.refresh_from_db()
+        self.assertEqual(self.active.recent_open_count, 0)
+
+    def test_list_filters_by_score_and_recency(self):
+        sink = EngagementSink()
+        sink.add(self.active.id, 'clicked', self.now)
+        sink.add(self.stale.id, 'opened', self.now - timedelta(days=60))
+        sink.flush()
+        client = APIClient()
+        client.force_authenticate(user=self.owner)
+        url = reverse('contact-list')
+
+        response = client.get(url, {'min_engagement_score': 1})
+        self.assertEqual([c['email'] for c in response.data['results']], ['active@example.com'])
+        self.assertAlmostEqual(response.data['results'][0]['engagement_score'], 3, places=2)
+        response = client.get(url, {'engaged_within_days': 90})
+        self.assertEqual(len(response.data['results']), 2)
+        response = client.get(url, {'engaged_within_days': 30})
+        self.assertEqual(len(response.data['results']), 1)
+        response = client.get(url, {'min_engagement_score': 'high'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ContactImportTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='importowner', password='password123')
+        Contact.objects.create(owner=self.owner, email='existing@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner)
+        import_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, import_dir, ignore_errors=True)
+        settings_override = override_settings(CONTACT_IMPORT_DIR=import_dir, CONTACT_IMPORT_CHUNK_SIZE=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _upload(self, content, name='contacts.csv'):
+        """Uploads a file and runs the queued task inline, as a worker would."""
+        from .tasks import import_contacts
+        with patch('contacts_api.views.import_contacts.delay', side_effect=import_contacts) as delay:
+            response = self.client.post(reverse('contact-upload'), {'file': SimpleUploadedFile(name, content)},
+                                        format='multipart')
+        return response, delay
+
+    def _job(self, response):
+        return self.client.get(reverse('import-job-detail', kwargs={'pk': response.data['job_id']})).data
+
+    def test_upload_runs_as_job_and_reports_errors(self):
+        response, delay = self._upload(
+            b"Email,First_Name,Last_Name,Company\n"
+            b"a@example.com,Ann,Lee,Acme\n"
+            b"existing@example.com,Old,Row,\n"
+            b",No,Email,\n"
+            b"b@example.com,Bob,,Initech\n"
+            b"a@example.com,Ann,Again,Acme\n" # Duplicate from an earlier chunk
+        )
+        self.assertEqual(response.status_code, 202)
+        delay.assert_called_once_with(response.data['job_id'])
+        job = self._job(response)
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual((job['rows_processed'], job['contacts_created'], job['rows_skipped']), (5, 2, 3))
+        self.assertEqual(job['errors'], [
+            {'row': 3, 'email': 'existing@example.com', 'error': 'Email already exists for this user or globally.'},
+            {'row': 4, 'error': 'Email is missing.'},
+            {'row': 6, 'email': 'a@example.com', 'error': 'Email already exists for this user or globally.'},
+        ])
+        contact = Contact.objects.get(email='b@example.com')
+        self.assertEqual((contact.first_name, contact.last_name), ('Bob', None))
+        self.assertEqual(contact.custom_fields, {'company': 'Initech'})
+        self.assertEqual(os.listdir(os.path.join(settings.CONTACT_IMPORT_DIR, f'owner={self.owner.id}')), []) # File removed
+
+    def test_xlsx_is_streamed_in_chunks(self):
+        import openpyxl
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['email', 'first_name', 'industry'])
+        for i in range(5):
+            sheet.append([f'xl{i}@example.com', f'Name{i}', 'retail'])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        response, _ = self._upload(buffer.getvalue(), name='contacts.xlsx')
+        job = self._job(response)
+        self.assertEqual((job['status'], job['rows_processed'], job['contacts_created']), ('completed', 5, 5))
+        self.assertEqual(Contact.objects.get(email='xl4@example.com').custom_fields, {'industry': 'retail'})
+
+    def test_missing_email_column_fails_job(self):
+        response, _ = self._upload(b"name\nAnn\n")
+        job = self._job(response)
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error_message'], "Required column 'email' not found in the file.")
+
+    def test_unsupported_file_and_other_users_jobs(self):
+        response, delay = self._upload(b"email\n", name='contacts.txt')
+        self.assertEqual(response.status_code, 400)
+        delay.assert_not_called()
+        other = User.objects.create_user(username='otherimporter', password='password123')
+        job = ImportJob.objects.create(owner=other, file_name='theirs.csv')
+        self.assertEqual(self.client.get(reverse('import-job-detail', kwargs={'pk': job.id})).status_code, 404)
+
+    def test_normalize_frame_is_column_wise(self):
+        import numpy as np
+        import pandas as pd
+        from .importer import normalize_frame
+        df = pd.DataFrame({
+            'EMAIL': ['  Mixed@Example.COM ', None, 'no-at-sign', 'x@y.io'],
+            'first_name': [' Ann ', 'Bo', None, np.nan],
+            'Plan': ['gold ', None, 'free', np.nan],
+            'seats': [3, 4, 5, 6],
+        })
+        valid, errors = normalize_frame(df, first_row=10)
+        self.assertEqual(valid['email'].tolist(), ['mixed@example.com', 'x@y.io'])
+        self.assertEqual(valid['row'].tolist(), [10, 13])
+        self.assertEqual(valid['first_name'].tolist(), ['Ann', None])
+        self.assertEqual(valid['last_name'].tolist(), [None, None]) # Column absent
+        self.assertEqual(valid['custom_fields'].tolist(), [{'plan': 'gold', 'seats': '3'}, {'plan': None, 'seats': '6'}])
+        self.assertEqual(errors.to_dict('records'), [
+            {'row': 11, 'email': None, 'error': 'Email is missing.'},
+            {'row': 12, 'email': 'no-at-sign', 'error': 'Email address is not valid.'},
+        ])
+
+    def test_inserts_in_batches_with_one_lookup(self):
+        import pandas as pd
+        df = pd.DataFrame({'email': [f'bulk{i}@example.com' for i in range(25)]})
+        importer = ContactImporter(self.owner, batch_size=10)
+        with self.assertNumQueries(2 + 3 * 3): # Existing-email and indexed-key lookups + 3 batches (SAVEPOINT, INSERT, RELEASE)
+            self.assertEqual(importer.import_frame(df), 25)
+        self.assertEqual(Contact.objects.filter(email__startswith='bulk').count(), 25)
+
+    def test_stored_address_with_other_case_is_a_duplicate(self):
+        import pandas as pd
+        Contact.objects.create(owner=self.owner, email=' John@Example.com')
+        other = User.objects.create_user(username='case-other', password='password')
+        Contact.objects.create(owner=other, email='Mary@Example.com') # Another owner's contact is not a duplicate
+        importer = ContactImporter(self.owner)
+        df = pd.DataFrame({'email': ['john@example.com', 'mary@example.com']})
+        self.assertEqual(importer.import_frame(df), 1)
+        self.assertEqual(importer.errors, [{'row': 2, 'email': 'john@example.com',
+                                            'error': 'Email already exists for this user or globally.'}])
+        self.assertFalse(Contact.objects.filter(email='john@example.com').exists())
+        self.assertTrue(Contact.objects.filter(owner=self.owner, email='mary@example.com').exists())
+
+    def test_conflicting_batch_falls_back_to_row_inserts(self):
+        import pandas as pd
+        importer = ContactImporter(self.owner)
+        df = pd.DataFrame({'email': ['race1@example.com', 'race2@example.com']})
+        with patch('contacts_api.importer.existing_emails', return_value=set()):
+            Contact.objects.create(owner=self.owner, email='race2@example.com') # Inserted after the lookup
+            self.assertEqual(importer.import_frame(df), 1)
+        self.assertEqual(importer.errors, [{'row': 3, 'email': 'race2@example.com',
+                                            'error': 'Email already exists for this user or globally.'}])
+
+
+class ContactPaginationTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='pager', password='password')
+        other = User.objects.create_user(username='other-pager', password='password')
+        Contact.objects.create(owner=other, email='not-mine@example.com')
+        created_at = timezone.now()
+        Contact.objects.bulk_create([
+            # Every contact in the same instant: only the id tie-breaker orders them
+            Contact(owner=self.owner, email=f'page{i}@example.com', created_at=created_at)
+            for i in range(7)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner)
+
+    def test_cursor_walks_every_contact_once(self):
+        emails = []
+        response = self.client.get(reverse('contact-list'), {'page_size': 3})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 3)
+            emails.extend(c['email'] for c in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(emails, [f'page{i}@example.com' for i in reversed(range(7))])
+
+    @override_settings(API_PAGE_SIZE=2, API_MAX_PAGE_SIZE=4)
+    def test_page_size_is_bounded(self):
+        self.assertEqual(len(self.client.get(reverse('contact-list')).data['results']), 2)
+        self.assertEqual(len(self.client.get(reverse('contact-list'), {'page_size': 100}).data['results']), 4)
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(reverse('contact-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ContactSearchTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='searcher', password='password')
+        other = User.objects.create_user(username='other-searcher', password='password')
+        self.alice = Contact.objects.create(owner=self.owner, email='alice@example.com', first_name='Alice',
+                                            last_name='Martin', custom_fields={'city': 'Lyon', 'plan': {'tier': 'Gold'}})
+        Contact.objects.create(owner=self.owner, email='bob@sample.org', first_name='Bob', custom_fields={'city': 'Paris'})
+        Contact.objects.create(owner=other, email='alice@other.com', first_name='Alice')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner)
+
+    def search(self, q):
+        response = self.client.get(reverse('contact-search'), {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [c['email'] for c in response.data['results']]
+
+    def test_prefix_terms_across_fields(self):
+        self.assertEqual(self.search('ali'), ['alice@example.com']) # Other owners' contacts are excluded
+        self.assertEqual(self.search('mart exam'), ['alice@example.com'])
+        self.assertEqual(self.search('gold'), ['alice@example.com']) # Nested custom_fields values
+        self.assertEqual(self.search('bob@sample.o'), ['bob@sample.org'])
+        self.assertEqual(self.search('lyon paris'), [])
+
+    def test_index_follows_updates_bulk_inserts_and_deletes(self):
+        self.alice.custom_fields = {'city': 'Nantes'}
+        self.alice.save()
+        self.assertEqual(self.search('lyon'), [])
+        self.assertEqual(self.search('nantes'), ['alice@example.com'])
+        Contact.objects.bulk_create([Contact(owner=self.owner, email='carol@example.com', first_name='Carol')])
+        self.assertEqual(self.search('carol'), ['carol@example.com'])
+        Contact.objects.filter(email='carol@example.com').delete()
+        self.assertEqual(self.search('carol'), [])
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get(reverse('contact-search')).status_code, 400)
+
+
+class SegmentTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='segmenter', password='password')
+        other = User.objects.create_user(username='other-segmenter', password='password')
+        self.now = timezone.now()
+        self.lyon = Contact.objects.create(owner=self.owner, email='lyon@example.com', first_name='Ana',
+                                           custom_fields={'city': 'Lyon', 'age': 41}, last_clicked_at=self.now - timedelta(days=3))
+        self.paris = Contact.objects.create(owner=self.owner, email='paris@sample.org',
+                                            custom_fields={'city': 'Paris', 'age': 25})
+        self.bare = Contact.objects.create(owner=self.owner, email='bare@example.com')
+        Contact.objects.create(owner=other, email='lyon@other.com', custom_fields={'city': 'Lyon'})
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner)
+
+    def emails(self, rules):
+        segment = Segment(owner=self.owner, name='tmp', rules=rules)
+        return sorted(matching_contacts(segment, now=self.now).values_list('email', flat=True))
+
+    def test_rule_trees_compile_to_one_filter(self):
+        self.assertEqual(self.emails({'field': 'custom_fields.city', 'op': 'eq', 'value': 'Lyon'}), ['lyon@example.com'])
+        self.assertEqual(self.emails({'field': 'custom_fields.age', 'op': 'lt', 'value': 30}), ['paris@sample.org'])
+        self.assertEqual(self.emails({'field': 'custom_fields.city', 'op': 'exists', 'value': False}), ['bare@example.com'])
+        self.assertEqual(self.emails({'any': [{'field': 'last_clicked_at', 'op': 'within_days', 'value': 7},
+                                              {'field': 'email', 'op': 'endswith', 'value': '.org'}]}),
+                         ['lyon@example.com', 'paris@sample.org'])
+        self.assertEqual(self.emails({'all': [{'field': 'email', 'op': 'contains', 'value': 'example'},
+                                              {'not': {'field': 'first_name', 'op': 'eq', 'value': 'Ana'}}]}),
+                         ['bare@example.com'])
+        segment = Segment(owner=self.owner, name='tmp', rules={'field': 'email', 'op': 'contains', 'value': 'e'})
+        contacts = matching_contacts(segment)
+        with self.assertNumQueries(1):
+            list(contacts)
+
+    def test_invalid_rules_are_rejected(self):
+        for rules in ({'field': 'password', 'op': 'eq', 'value': 'x'},
+                      {'field': 'custom_fields.a__b', 'op': 'eq', 'value': 1},
+                      {'field': 'email', 'op': 'gt', 'value': 'x'},
+                      {'all': []},
+                      {'field': 'last_opened_at', 'op': 'within_days', 'value': 'soon'}):
+            with self.assertRaises(SegmentRuleError):
+                validate_rules(rules)
+        response = self.client.post(reverse('segment-list'), {'name': 'Bad', 'rules': {'any': 'x'}}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_materialized_membership_is_refreshed_by_diff(self):
+        response = self.client.post(reverse('segment-list'), {
+            'name': 'Lyon', 'materialized': True,
+            'rules': {'field': 'custom_fields.city', 'op': 'eq', 'value': 'Lyon'},
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['member_count'], 1)
+        segment = Segment.objects.get(pk=response.data['id'])
+
+        # Editing a contact through the API re-checks just that contact
+        self.client.patch(reverse('contact-detail', kwargs={'pk': self.paris.id}),
+                          {'custom_fields': {'city': 'Lyon'}}, format='json')
+        self.assertEqual(set(segment.memberships.values_list('contact_id', flat=True)), {self.lyon.id, self.paris.id})
+        segment.refresh_from_db()
+        self.assertEqual(segment.member_count, 2)
+
+        Contact.objects.filter(pk=self.lyon.pk).update(custom_fields={'city': 'Nice'})
+        self.assertEqual(refresh_segment(segment), (0, 1))
+        self.assertEqual(refresh_segment(segment), (0, 0)) # Nothing to rewrite
+        members = self.client.get(reverse('segment-contacts', kwargs={'pk': segment.id})).data['results']
+        self.assertEqual([c['email'] for c in members], ['paris@sample.org'])
+
+    def test_engagement_updates_materialized_segments(self):
+        segment = Segment.objects.create(owner=self.owner, name='Openers', materialized=True,
+                                         rules={'field': 'last_opened_at', 'op': 'within_days', 'value': 30})
+        refresh_segment(segment)
+        self.assertFalse(SegmentMembership.objects.filter(segment=segment).exists())
+        sink = EngagementSink()
+        sink.add(self.bare.id, 'opened', timezone.now())
+        sink.flush()
+        self.assertEqual(list(segment.memberships.values_list('contact_id', flat=True)), [self.bare.id])
+
+    def test_engagement_only_refreshes_segments_with_engagement_rules(self):
+        Segment.objects.create(owner=self.owner, name='Lyon', materialized=True,
+                               rules={'field': 'custom_fields.city', 'op': 'eq', 'value': 'Lyon'})
+        Segment.objects.create(owner=self.owner, name='Engaged', materialized=True,
+                               rules={'not': {'field': 'engagement_score', 'op': 'lt', 'value': 1}})
+        sink = EngagementSink()
+        sink.add(self.bare.id, 'clicked', timezone.now())
+        with patch('contacts_api.segments.refresh_segment', return_value=(0, 0)) as refresh:
+            sink.flush()
+        self.assertEqual([call.args[0].name for call in refresh.call_args_list], ['Engaged'])
+
+
+class IndexedCustomFieldTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='indexer', password='password')
+        self.retail = Contact.objects.create(owner=self.owner, email='shop@example.com',
+                                             custom_fields={'industry': 'Retail', 'employees': '120'})
+        self.bank = Contact.objects.create(owner=self.owner, email='bank@example.com',
+                                           custom_fields={'industry': 'Finance', 'employees': 5000})
+        Contact.objects.create(owner=self.owner, email='none@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner)
+
+    def promote(self, key, value_type='text'):
+        from .tasks import backfill_custom_field_index
+        with patch('contacts_api.views.backfill_custom_field_index.delay', side_effect=backfill_custom_field_index):
+            response = self.client.post(reverse('indexed-field-list'), {'key': key, 'value_type': value_type}, format='json')
+        self.assertEqual(response.status_code, 202)
+        return IndexedCustomField.objects.get(pk=response.data['id'])
+
+    def list_emails(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('contact-list'), params)
+        self.assertEqual(response.status_code, 200)
+        used_index = any('contactfieldvalue' in query['sql'] for query in queries.captured_queries)
+        return sorted(c['email'] for c in response.data['results']), used_index
+
+    def test_backfill_and_typed_values(self):
+        employees = self.promote('employees', 'number')
+        self.assertEqual(employees.status, 'ready')
+        self.assertEqual(sorted(ContactFieldValue.objects.filter(field=employees).values_list('value_number', flat=True)),
+                         [120.0, 5000.0]) # Numeric strings from CSV imports are numbers too
+        segment = Segment(owner=self.owner, name='Large', rules={'field': 'custom_fields.employees', 'op': 'gte', 'value': 1000})
+        self.assertIn('contactfieldvalue', str(matching_contacts(segment).query))
+        self.assertEqual(list(matching_contacts(segment).values_list('email', flat=True)), ['bank@example.com'])
+
+    def test_list_filter_uses_index_once_promoted_and_follows_edits(self):
+        self.assertEqual(self.list_emails({'custom_fields__industry': 'Retail'}), (['shop@example.com'], False))
+        self.promote('industry')
+        self.assertEqual(self.list_emails({'custom_fields__industry': 'Retail'}), (['shop@example.com'], True))
+
+        self.client.patch(reverse('contact-detail', kwargs={'pk': self.bank.id}),
+                          {'custom_fields': {'industry': 'Retail'}}, format='json')
+        self.assertEqual(self.list_emails({'custom_fields__industry': 'Retail'})[0], ['bank@example.com', 'shop@example.com'])
+        self.assertEqual(self.client.get(reverse('contact-list'), {'custom_fields__a__b': 'x'}).status_code, 400)
+
+    def test_imported_contacts_are_indexed(self):
+        field = self.promote('industry')
+        import pandas as pd
+        ContactImporter(self.owner).import_frame(pd.DataFrame({'email': ['new@example.com'], 'industry': ['Energy']}))
+        self.assertTrue(ContactFieldValue.objects.filter(field=field, value_text='Energy',
+                                                         contact__email='new@example.com').exists())
+
+
+class ContactBulkTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='bulker', password='password')
+        other = User.objects.create_user(username='other-bulker', password='password')
+        self.contacts = Contact.objects.bulk_create([
+            Contact(owner=self.owner, email=f'bulk{i}@example.com',
+                    custom_fields={'tier': 'gold' if i % 2 else 'basic', 'prefs': {'weekly': True}})
+            for i in range(6)
+        ])
+        self.foreign = Contact.objects.create(owner=other, email='foreign@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner)
+
+    def test_update_by_ids_merges_custom_fields_in_one_statement(self):
+        ids = [c.id for c in self.contacts[:3]] + [self.foreign.id]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('contact-bulk-update'), {
+                'ids': ids, 'allow_email': False, 'custom_fields': {'tier': 'vip', 'prefs': {'monthly': True}, 'old': None},
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'updated': 3}) # Other owners' contacts are ignored
+        self.assertEqual(sum(query['sql'].startswith('UPDATE "contacts_api_contact"') for query in queries.captured_queries), 1)
+        contact = Contact.objects.get(pk=self.contacts[0].pk)
+        self.assertFalse(contact.allow_email)
+        self.assertEqual(contact.custom_fields, {'tier': 'vip', 'prefs': {'monthly': True}}) # Top-level merge
+        self.assertTrue(Contact.objects.get(pk=self.contacts[5].pk).allow_email)
+        self.assertTrue(Contact.objects.get(pk=self.foreign.pk).allow_email)
+
+    def test_delete_by_filter_updates_segment_counts(self):
+        segment = Segment.objects.create(owner=self.owner, name='All', materialized=True,
+                                         rules={'field': 'email', 'op': 'endswith', 'value': '@example.com'})
+        refresh_segment(segment)
+        response = self.client.post(reverse('contact-bulk-delete'),
+                                    {'filter': {'field': 'custom_fields.tier', 'op': 'eq', 'value': 'gold'}}, format='json')
+        self.assertEqual(response.data, {'deleted': 3})
+        self.assertEqual(Contact.objects.filter(owner=self.owner).count(), 3)
+        segment.refresh_from_db()
+        self.assertEqual(segment.member_count, 3)
+
+    def test_delete_rebuilds_stats_of_campaigns_that_lose_events(self):
+        from campaigns_api.aggregates import get_campaign_stats, record_event
+        from campaigns_api.models import Campaign, CampaignAnalytics
+        campaign = Campaign.objects.create(owner=self.owner, name='Bulk stats')
+        for contact in self.contacts[:3]:
+            record_event(CampaignAnalytics.objects.create(campaign=campaign, contact=contact, event_type='sent',
+                                                          event_timestamp=timezone.now()))
+        self.assertEqual(get_campaign_stats(campaign).unique_sent, 3)
+        self.client.post(reverse('contact-bulk-delete'), {'ids': [c.id for c in self.contacts[:2]]}, format='json')
+        self.assertEqual(get_campaign_stats(campaign).unique_sent, 1)
+
+    @override_settings(CONTACT_BULK_INLINE_LIMIT=2, CONTACT_BULK_CHUNK_SIZE=4)
+    def test_large_requests_run_as_chunked_jobs(self):
+        from .tasks import run_contact_bulk_job
+        with patch('contacts_api.views.run_contact_bulk_job.delay', side_effect=run_contact_bulk_job):
+            response = self.client.post(reverse('contact-bulk-update'), {
+                'filter': {'field': 'email', 'op': 'contains', 'value': 'bulk'}, 'custom_fields': {'tier': 'lapsed'},
+            }, format='json')
+        self.assertEqual(response.status_code, 202)
+        job = self.client.get(reverse('bulk-job-detail', kwargs={'pk': response.data['job_id']})).data
+        self.assertEqual((job['status'], job['matched'], job['affected']), ('completed', 6, 6))
+        self.assertEqual(Contact.objects.filter(custom_fields__tier='lapsed').count(), 6)
+
+    def test_invalid_requests(self):
+        url = reverse('contact-bulk-update')
+        self.assertEqual(self.client.post(url, {'ids': [self.contacts[0].id]}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'ids': [1], 'filter': {}, 'allow_email': True}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'ids': [1], 'custom_fields': {'a__b': 1}}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(reverse('contact-bulk-delete'), {'segment_id': 999}, format='json').status_code, 400)
+
+
+class ContactDedupTests(TestCase):
+    def setUp(self):
+        from campaigns_api.models import Campaign
+        self.owner = User.objects.create_user(username='deduper', password='password')
+        self.other = User.objects.create_user(username='other-deduper', password='password')
+        now = timezone.now()
+        self.original = Contact.objects.create(owner=self.owner, email='John@X.com', first_name='John',
+                                               custom_fields={'city': 'Lyon', 'tier': 'basic'},
+                                               created_at=now - timedelta(days=2))
+        self.duplicate = Contact.objects.create(owner=self.owner, email='john@x.com ', last_name='Doe', allow_email=False,
+                                                custom_fields={'tier': 'gold', 'plan': ''}, created_at=now - timedelta(days=1))
+        self.unrelated = Contact.objects.create(owner=self.owner, email=' Ann@X.com')
+        self.foreign = Contact.objects.create(owner=self.other, email='john@x.com')
+        self.campaign = Campaign.objects.create(owner=self.owner, name='Dedup')
+
+    def _event(self, contact, event_type):
+        from campaigns_api.models import CampaignAnalytics
+        return CampaignAnalytics.objects.create(campaign=self.campaign, contact=contact, event_type=event_type,
+                                                event_timestamp=timezone.now())
+
+    def test_clusters_are_per_owner_normalized_email(self):
+        from .dedup import duplicate_clusters
+        self.assertEqual(list(duplicate_clusters()),
+                         [{'owner_id': self.owner.id, 'normalized_email': 'john@x.com', 'contacts': 2}])
+
+    def test_merge_combines_fields_and_repoints_events(self):
+        from campaigns_api.aggregates import rebuild_campaign_stats
+        from campaigns_api.models import CampaignAnalytics, CampaignStats
+        from .dedup import dedupe_contacts
+        for contact in (self.original, self.duplicate):
+            self._event(contact, 'sent')
+        self._event(self.duplicate, 'opened')
+        rebuild_campaign_stats([self.campaign.id])
+        self.assertEqual(CampaignStats.objects.get(campaign=self.campaign).unique_sent, 2)
+
+        summary = dedupe_contacts()
+        self.assertEqual((summary['clusters'], summary['merged'], summary['events_repointed']), (1, 1, 2))
+        self.assertFalse(Contact.objects.filter(pk=self.duplicate.pk).exists())
+        survivor = Contact.objects.get(pk=self.original.pk)
+        # The other owner already has the normalized address as stored, so the survivor keeps its own
+        self.assertEqual(survivor.email, 'John@X.com')
+        self.assertEqual((survivor.first_name, survivor.last_name), ('John', 'Doe'))
+        self.assertEqual(survivor.custom_fields, {'city': 'Lyon', 'tier': 'gold'}) # Newer values win, empty ones do not
+        self.assertFalse(survivor.allow_email)
+        self.assertIsNotNone(survivor.last_opened_at)
+        self.assertEqual(CampaignAnalytics.objects.filter(contact=survivor).count(), 3)
+        stats = CampaignStats.objects.get(campaign=self.campaign)
+        self.assertEqual((stats.unique_sent, stats.unique_opened), (1, 1))
+        self.assertEqual(Contact.objects.get(pk=self.unrelated.pk).email, 'ann@x.com')
+
+    def test_survivor_takes_normalized_email_when_free(self):
+        from .dedup import dedupe_contacts
+        self.foreign.delete()
+        dedupe_contacts(owner_ids=[self.owner.id])
+        self.assertEqual(Contact.objects.get(pk=self.original.pk).email, 'john@x.com')
+
+    def test_clusters_of_two_owners_with_the_same_address(self):
+        from .dedup import dedupe_contacts
+        self.foreign.delete()
+        first = Contact.objects.create(owner=self.other, email='JOHN@X.COM')
+        Contact.objects.create(owner=self.other, email=' john@X.com')
+        summary = dedupe_contacts()
+        self.assertEqual((summary['clusters'], summary['merged']), (2, 2))
+        self.assertEqual(Contact.objects.get(pk=self.original.pk).email, 'john@x.com') # First survivor wins
+        self.assertEqual(Contact.objects.get(pk=first.pk).email, 'JOHN@X.COM') # The other keeps its stored form
+
+    def test_dry_run_changes_nothing(self):
+        out = io.StringIO()
+        from django.core.management import call_command
+        call_command('dedupe_contacts', '--dry-run', stdout=out)
+        self.assertIn('1 duplicate clusters, 1 contacts would be merged', out.getvalue())
+        self.assertEqual(Contact.objects.count(), 4)
+
+
+class EmailValidationTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='validator', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner)
+
+    def test_checks_syntax_typos_disposable_and_role_accounts(self):
+        from .email_validation import validate_emails
+        results = validate_emails(['Ann@Example.com', 'bad@@example.com', 'a..b@example.com', None, 'kim@gmial.com',
+                                   'lee@hotmail.con', 'x@mailinator.com', 'y@eu.mailinator.com', 'info+news@example.com',
+                                   'me@mail.com'])
+        self.assertEqual(list(zip(results['status'], results['reason'])), [
+            ('valid', ''), ('invalid', 'syntax'), ('invalid', 'syntax'), ('invalid', 'syntax'), ('risky', 'typo'),
+            ('invalid', 'typo'), ('risky', 'disposable'), ('risky', 'disposable'), ('risky', 'role'), ('valid', ''),
+        ])
+        self.assertEqual(results['suggestion'].tolist()[4:6], ['kim@gmail.com', 'lee@hotmail.com'])
+
+    def test_lookalike_domains_are_not_skipped(self):
+        from .email_validation import skip_statuses, validate_emails
+        results = validate_emails(['bob@life.com', 'bob@love.com', 'bob@zoo.com', 'bob@gmial.com'])
+        self.assertEqual(results['status'].tolist(), ['risky'] * 4)
+        self.assertEqual(results['suggestion'].tolist(), ['bob@live.com', 'bob@live.com', 'bob@zoho.com', 'bob@gmail.com'])
+        self.assertFalse(set(results['status']) & set(skip_statuses()))
+
+    def test_api_and_import_writes_store_the_status(self):
+        response = self.client.post(reverse('contact-list'), {'email': 'sam@gmial.com'}, format='json')
+        self.assertEqual((response.data['email_status'], response.data['email_suggestion']), ('risky', 'sam@gmail.com'))
+        response = self.client.patch(reverse('contact-detail', kwargs={'pk': response.data['id']}),
+                                     {'email': 'sam@gmail.com'}, format='json')
+        self.assertEqual((response.data['email_status'], response.data['email_suggestion']), ('valid', None))
+
+        import pandas as pd
+        ContactImporter(self.owner).import_frame(pd.DataFrame({'email': ['support@acme.io', 'zoe@acme.io']}))
+        self.assertEqual(Contact.objects.get(email='support@acme.io').email_status_reason, 'role')
+        response = self.client.get(reverse('contact-list'), {'email_status': 'valid'})
+        self.assertEqual(sorted(c['email'] for c in response.data['results']), ['sam@gmail.com', 'zoe@acme.io'])
+
+    def test_command_checks_unvalidated_contacts(self):
+        from django.core.management import call_command
+        Contact.objects.bulk_create([Contact(owner=self.owner, email=f'user{i}@example.com') for i in range(3)]
+                                    + [Contact(owner=self.owner, email='x@yopmail.com')])
+        out = io.StringIO()
+        call_command('validate_contact_emails', '--batch-size', '2', stdout=out)
+        self.assertIn('Validated 4 contact emails (1 risky, 3 valid)', out.getvalue())
+        self.assertFalse(Contact.objects.filter(email_status='unknown').exists())
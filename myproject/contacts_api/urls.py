@@ -1,14 +1,20 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ContactViewSet, ContactUploadView # Import the new view
+from .views import (ContactViewSet, ContactUploadView, ContactBulkJobViewSet, ImportJobViewSet, IndexedCustomFieldViewSet,
+                    SegmentViewSet)
 
 # Create a router and register our viewsets with it.
 router = DefaultRouter()
 router.register(r'contacts', ContactViewSet, basename='contact')
+router.register(r'imports', ImportJobViewSet, basename='import-job')
+router.register(r'segments', SegmentViewSet, basename='segment')
+router.register(r'indexed-fields', IndexedCustomFieldViewSet, basename='indexed-field')
+router.register(r'bulk-jobs', ContactBulkJobViewSet, basename='bulk-job')
 
 # The API URLs are now determined automatically by the router.
 # For custom views like ContactUploadView, we add them separately.
+# The upload route goes first: the router's `contacts/<pk>/` detail route would otherwise match it.
 urlpatterns = [
-    path('', include(router.urls)),
     path('contacts/upload/', ContactUploadView.as_view(), name='contact-upload'),
+    path('', include(router.urls)),
 ]
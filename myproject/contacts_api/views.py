@@ -1,53 +1,173 @@
 from rest_framework import viewsets, permissions, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import FileUploadParser, MultiPartParser
-from .models import Contact
-from .serializers import ContactSerializer
-import pandas as pd
-from django.db import IntegrityError
+from rest_framework.reverse import reverse
+from myproject.pagination import CreatedAtCursorPagination
+from .bulk import BulkRequestError, bulk_inline_limit, count_target, run_bulk, validate_changes, validate_target
+from .custom_field_index import ready_fields, sync_contact_fields
+from .email_validation import email_validation_fields
+from .engagement import engagement_q
+from .importer import create_import_job, discard_import_job
+from .models import Contact, ContactBulkJob, ImportJob, IndexedCustomField, Segment
+from .search import search_contacts
+from .segments import (SegmentRuleError, clear_segment, compile_rules, forget_contacts, refresh_contact_segments,
+                       refresh_segment, segment_contacts, validate_rules)
+from .serializers import (ContactBulkJobSerializer, ContactSerializer, ImportJobSerializer, IndexedCustomFieldSerializer,
+                          SegmentSerializer)
+from .tasks import backfill_custom_field_index, import_contacts, run_contact_bulk_job
+import logging
+from django.conf import settings
 from django.contrib.auth.models import User # Required if we create user instances
 
+logger = logging.getLogger(__name__)
+
 class ContactViewSet(viewsets.ModelViewSet):
     """
     API endpoint that allows contacts to be viewed or edited.
     """
     serializer_class = ContactSerializer
     permission_classes = [permissions.IsAuthenticated] # Only authenticated users can access
+    pagination_class = CreatedAtCursorPagination # ?cursor= keyset pages on (created_at, id)
 
     def get_queryset(self):
         """
         This view should return a list of all the contacts
         for the currently authenticated user.
+        Optional filters: ?min_engagement_score=<float> and ?engaged_within_days=<int>
+        (opened or clicked within the last N days); both use indexed engagement columns.
+        ?custom_fields__<key>=<value> matches a custom field exactly, from the side table
+        index when the key is promoted (IndexedCustomField), otherwise from the JSON.
+        ?email_status=<unknown|valid|risky|invalid> filters on the offline validation result.
         """
-        return Contact.objects.filter(owner=self.request.user).order_by('-created_at')
+        queryset = Contact.objects.filter(owner=self.request.user).order_by('-created_at')
+        params = self.request.query_params
+        min_score = params.get('min_engagement_score')
+        within_days = params.get('engaged_within_days')
+        if min_score is not None or within_days is not None:
+            try:
+                min_score = float(min_score) if min_score is not None else None
+                within_days = int(within_days) if within_days is not None else None
+            except ValueError:
+                raise ValidationError({'error': 'min_engagement_score must be a number and engaged_within_days an integer.'})
+            queryset = queryset.filter(engagement_q(min_score=min_score, engaged_within_days=within_days))
+
+        email_status = params.get('email_status')
+        if email_status is not None:
+            if email_status not in dict(Contact.EMAIL_STATUS_CHOICES):
+                raise ValidationError({'error': f"email_status must be one of {', '.join(dict(Contact.EMAIL_STATUS_CHOICES))}."})
+            queryset = queryset.filter(email_status=email_status)
+
+        custom_rules = [
+            {'field': f"custom_fields.{name[len('custom_fields__'):]}", 'op': 'eq', 'value': value}
+            for name, value in params.items() if name.startswith('custom_fields__')
+        ]
+        if custom_rules:
+            try:
+                validate_rules({'all': custom_rules})
+            except SegmentRuleError as e:
+                raise ValidationError({'error': str(e)})
+            queryset = queryset.filter(compile_rules({'all': custom_rules}, indexed=ready_fields(self.request.user.id)))
+        return queryset
 
     def perform_create(self, serializer):
         """
         Save the owner of the contact as the current logged-in user.
         """
-        serializer.save(owner=self.request.user)
-
-    # perform_update and perform_destroy can be left as default
-    # as they will correctly update/delete instances owned by the user
-    # due to the queryset filtering.
-    # If you had more complex logic, like preventing updates to certain fields
-    # or custom deletion logic, you would override them.
-    #
-    # Example:
-    # def perform_update(self, serializer):
-    #     # instance = serializer.instance
-    #     # if instance.owner != self.request.user:
-    #     #     raise PermissionDenied("You do not have permission to edit this contact.")
-    #     serializer.save()
-    #
-    # def perform_destroy(self, instance):
-    #     # if instance.owner != self.request.user:
-    #     #     raise PermissionDenied("You do not have permission to delete this contact.")
-    #     instance.delete()
+        contact = serializer.save(owner=self.request.user, **email_validation_fields(serializer.validated_data['email']))
+        sync_contact_fields([contact])
+        refresh_contact_segments([contact.id])
+
+    def perform_update(self, serializer):
+        email = serializer.validated_data.get('email')
+        if email is not None and email != serializer.instance.email:
+            contact = serializer.save(**email_validation_fields(email))
+        else:
+            contact = serializer.save()
+        sync_contact_fields([contact])
+        refresh_contact_segments([contact.id])
+
+    def perform_destroy(self, instance):
+        forget_contacts([instance.id]) # Keep materialized segment counts right
+        instance.delete()
+
+    @action(detail=False, methods=['post'], url_path='bulk-update')
+    def bulk_update(self, request):
+        """
+        POST {"ids": [...] | "filter": {<segment rules>} | "segment_id": n, "allow_email": bool,
+        "custom_fields": {...}}: set allow_email and/or merge custom_fields (null removes a key).
+        """
+        try:
+            target = validate_target(request.data)
+            changes = validate_changes(request.data)
+        except BulkRequestError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return self._run_bulk('update', target, changes)
+
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """POST {"ids": [...] | "filter": {<segment rules>} | "segment_id": n}: delete the contacts."""
+        try:
+            target = validate_target(request.data)
+        except BulkRequestError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return self._run_bulk('delete', target, {})
+
+    def _run_bulk(self, action_name, target, changes):
+        """Runs small requests inline (200 with the count), queues large ones as a ContactBulkJob (202)."""
+        result_key = 'deleted' if action_name == 'delete' else 'updated'
+        try:
+            matched = count_target(self.request.user.id, target)
+            if matched <= bulk_inline_limit():
+                return Response({result_key: run_bulk(self.request.user.id, action_name, target, changes)})
+        except BulkRequestError as e: # Unknown segment
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = ContactBulkJob.objects.create(owner=self.request.user, action=action_name, target=target,
+                                            changes=changes, matched=matched)
+        try:
+            run_contact_bulk_job.delay(job.id)
+        except Exception as e: # Broker unavailable
+            logger.error(f"Contact bulk {action_name}: could not queue job {job.id}: {e}")
+            job.delete()
+            return Response({"error": "Could not queue the bulk operation; please try again."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({
+            "message": f"Bulk {action_name} queued.",
+            "job_id": job.id,
+            "matched": matched,
+            "status": job.status,
+            "status_url": reverse('bulk-job-detail', kwargs={'pk': job.id}, request=self.request),
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        """
+        GET /api/contacts/search/?q=<terms>&limit=<n>: the user's contacts whose email, name or
+        custom_fields values match every term as a prefix, newest first (contacts_api/search.py).
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', getattr(settings, 'API_PAGE_SIZE', 50)))
+        except ValueError:
+            return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), getattr(settings, 'API_MAX_PAGE_SIZE', 500))
+        contacts = search_contacts(query, owner_id=request.user.id, limit=limit)
+        return Response({'query': query, 'results': self.get_serializer(contacts, many=True).data})
+
+    # perform_update / perform_destroy above need no ownership check: get_queryset only returns
+    # the user's contacts, so other users' contacts are a 404 before reaching them.
 
 
 class ContactUploadView(APIView):
+    """
+    Accepts a CSV/Excel upload and queues it as a background ImportJob. Returns 202 with the
+    job id right away; poll GET /api/contacts/imports/<id>/ for progress and the per-row error report.
+    """
     parser_classes = (MultiPartParser, FileUploadParser) # Allow file uploads
     permission_classes = [permissions.IsAuthenticated]
 
@@ -57,72 +177,111 @@ class ContactUploadView(APIView):
         if not file_obj:
             return Response({"error": "No file provided."}, status=status.HTTP_400_BAD_REQUEST)
 
-        filename = file_obj.name.lower()
-        df = None
+        try:
+            job = create_import_job(request.user, file_obj)
+        except ValueError as e: # Unsupported extension
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            if filename.endswith('.csv'):
-                df = pd.read_csv(file_obj)
-            elif filename.endswith('.xlsx') or filename.endswith('.xls'):
-                df = pd.read_excel(file_obj)
-            else:
-                return Response({"error": "Unsupported file format. Please upload CSV or Excel files."},
-                                status=status.HTTP_400_BAD_REQUEST)
-        except Exception as e:
-            return Response({"error": f"Error reading file: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
-
-        if df is None:
-             return Response({"error": "Could not parse the file."}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Define expected columns and custom fields prefix/logic
-        expected_columns = ['email', 'first_name', 'last_name']
-        # Convert all dataframe column names to lowercase for case-insensitive matching
-        df.columns = [col.lower() for col in df.columns]
-
-        # Check for mandatory 'email' column (after lowercasing)
-        if 'email' not in df.columns:
-            return Response({"error": "Required column 'email' not found in the file."}, status=status.HTTP_400_BAD_REQUEST)
-
-        contacts_created = 0
-        errors = []
-
-        for index, row in df.iterrows():
-            email = row.get('email')
-            if not email or pd.isna(email): # Check for empty or NaN email
-                errors.append({"row": index + 2, "error": "Email is missing."})
-                continue
-
-            # Prepare data for Contact model
-            contact_data = {
-                'owner': request.user,
-                'email': str(email).strip(),
-                'first_name': str(row.get('first_name', '')).strip() if pd.notna(row.get('first_name')) else None,
-                'last_name': str(row.get('last_name', '')).strip() if pd.notna(row.get('last_name')) else None,
-            }
-
-            # Collect custom fields: any column not in expected_columns
-            custom_data = {}
-            for col_name in df.columns:
-                if col_name not in expected_columns:
-                    field_value = row.get(col_name)
-                    # Ensure NaN values are not passed as actual NaN to JSONField
-                    custom_data[col_name] = str(field_value).strip() if pd.notna(field_value) else None
-
-            if custom_data:
-                contact_data['custom_fields'] = custom_data
+            import_contacts.delay(job.id)
+        except Exception as e: # Broker unavailable
+            logger.error(f"Contact upload: could not queue import job {job.id}: {e}")
+            discard_import_job(job, "Could not queue the import; please try again.")
+            return Response({"error": "Could not queue the import; please try again."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-            try:
-                Contact.objects.create(**contact_data)
-                contacts_created += 1
-            except IntegrityError: # Handles unique constraint violation for email
-                errors.append({"row": index + 2, "email": email, "error": "Email already exists for this user or globally."})
-            except Exception as e: # Catch any other model validation or creation errors
-                errors.append({"row": index + 2, "email": email, "error": str(e)})
-
-        summary = {
-            "message": "File processed.",
-            "contacts_successfully_imported": contacts_created,
-            "errors_encountered": len(errors),
-            "error_details": errors
-        }
-        return Response(summary, status=status.HTTP_201_CREATED if contacts_created > 0 else status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "message": "Import queued.",
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": reverse('import-job-detail', kwargs={'pk': job.id}, request=request),
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class ImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Progress and results of the current user's contact imports."""
+    serializer_class = ImportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+
+    def get_queryset(self):
+        return ImportJob.objects.filter(owner=self.request.user).order_by('-created_at')
+
+
+class SegmentViewSet(viewsets.ModelViewSet):
+    """
+    Saved contact segments (rule trees, see contacts_api/segments.py).
+    GET /api/contacts/segments/<id>/contacts/ pages through the members; POST .../refresh/
+    re-diffs a materialized segment's membership.
+    """
+    serializer_class = SegmentSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+
+    def get_queryset(self):
+        return Segment.objects.filter(owner=self.request.user).order_by('-created_at')
+
+    def perform_create(self, serializer):
+        segment = serializer.save(owner=self.request.user)
+        if segment.materialized:
+            refresh_segment(segment)
+
+    def perform_update(self, serializer):
+        segment = serializer.save()
+        if segment.materialized:
+            refresh_segment(segment) # Rules may have changed
+        elif segment.member_count is not None:
+            clear_segment(segment)
+
+    @action(detail=True, methods=['get'])
+    def contacts(self, request, pk=None):
+        segment = self.get_object()
+        page = self.paginate_queryset(segment_contacts(segment))
+        return self.get_paginated_response(ContactSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['post'])
+    def refresh(self, request, pk=None):
+        segment = self.get_object()
+        if not segment.materialized:
+            return Response({'error': 'Only materialized segments have a stored membership to refresh.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        added, removed = refresh_segment(segment)
+        return Response({'segment_id': segment.id, 'added': added, 'removed': removed,
+                         'member_count': segment.member_count, 'last_refreshed_at': segment.last_refreshed_at})
+
+
+class IndexedCustomFieldViewSet(viewsets.ModelViewSet):
+    """
+    Promoted custom_fields keys of the current user (contacts_api/custom_field_index.py).
+    Creating one queues its backfill; filters use it once its status is 'ready'.
+    """
+    serializer_class = IndexedCustomFieldSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    http_method_names = ['get', 'post', 'delete', 'head', 'options'] # Change a key by deleting and re-adding it
+
+    def get_queryset(self):
+        return IndexedCustomField.objects.filter(owner=self.request.user).order_by('-created_at')
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        field = serializer.save(owner=request.user)
+        try:
+            backfill_custom_field_index.delay(field.id)
+        except Exception as e: # Broker unavailable
+            logger.error(f"Custom field index: could not queue backfill of field {field.id}: {e}")
+            field.delete()
+            return Response({"error": "Could not queue the backfill; please try again."},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(self.get_serializer(field).data, status=status.HTTP_202_ACCEPTED)
+
+
+class ContactBulkJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Progress of the current user's queued bulk updates and deletes."""
+    serializer_class = ContactBulkJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+
+    def get_queryset(self):
+        return ContactBulkJob.objects.filter(owner=self.request.user).order_by('-created_at')
@@ -158,3 +158,98 @@ DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'test@example.com')
 
 # For testing purposes, we can use a mock mode
 USE_MOCK_SES = os.environ.get('USE_MOCK_SES', 'True').lower() == 'true'
+
+# Analytics payload storage (see campaigns_api/event_storage.py)
+# 'inline' keeps raw SES payloads in CampaignAnalytics.details, 'compressed' moves them to a
+# zlib-compressed side table, 'drop' keeps only the typed columns (bounce type, click URL, user agent).
+ANALYTICS_RAW_PAYLOAD_MODE = os.environ.get('ANALYTICS_RAW_PAYLOAD_MODE', 'inline')
+ANALYTICS_RAW_PAYLOAD_SAMPLE_RATE = float(os.environ.get('ANALYTICS_RAW_PAYLOAD_SAMPLE_RATE', '1.0'))
+ANALYTICS_RAW_PAYLOAD_RETENTION_DAYS = int(os.environ.get('ANALYTICS_RAW_PAYLOAD_RETENTION_DAYS', '0')) # 0 = keep forever
+
+# Hourly engagement rollups older than this are pruned; daily rollups are kept (see prune_hourly_rollups).
+ANALYTICS_HOURLY_ROLLUP_RETENTION_DAYS = int(os.environ.get('ANALYTICS_HOURLY_ROLLUP_RETENTION_DAYS', '30'))
+
+# HyperLogLog sketches behind `approx=true` stats (see campaigns_api/sketches.py).
+# Precision p gives 2**p bytes per sketch and ~1.04/sqrt(2**p) relative error (12: 4 KB, ~1.6%).
+# Changing it only affects new sketches; old ones are folded to the lower precision when merged
+# (its error applies) until `rebuild_campaign_stats` re-sketches them.
+ANALYTICS_HLL_ENABLED = os.environ.get('ANALYTICS_HLL_ENABLED', 'True').lower() == 'true'
+ANALYTICS_HLL_PRECISION = int(os.environ.get('ANALYTICS_HLL_PRECISION', '12'))
+
+# Campaign report responses (stats, timeline, links, funnel) are cached until the campaign records
+# new events (see campaigns_api/report_cache.py). A stale entry is served for up to STALE_SECONDS while
+# a Celery task refreshes it (0 = always recompute synchronously). Hit rates: `manage.py report_cache_stats`.
+ANALYTICS_REPORT_CACHE_ENABLED = os.environ.get('ANALYTICS_REPORT_CACHE_ENABLED', 'True').lower() == 'true'
+ANALYTICS_REPORT_CACHE_TIMEOUT = int(os.environ.get('ANALYTICS_REPORT_CACHE_TIMEOUT', '3600'))
+ANALYTICS_REPORT_CACHE_STALE_SECONDS = int(os.environ.get('ANALYTICS_REPORT_CACHE_STALE_SECONDS', '30'))
+
+# Ingestion (Celery workers, SQS consumer) invalidates cached reports through the cache, so production
+# needs a backend shared by all processes. Without REDIS_CACHE_URL each process has its own local memory cache.
+if os.environ.get('REDIS_CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_CACHE_URL'],
+        }
+    }
+
+# Archival of old analytics events to Parquet (see campaigns_api/archive.py). 0 disables archiving.
+# Keep the age well beyond the window in which opens/clicks still arrive for a send.
+ANALYTICS_ARCHIVE_AFTER_DAYS = int(os.environ.get('ANALYTICS_ARCHIVE_AFTER_DAYS', '0'))
+ANALYTICS_ARCHIVE_DIR = os.environ.get('ANALYTICS_ARCHIVE_DIR', str(BASE_DIR / 'analytics_archive'))
+ANALYTICS_ARCHIVE_COMPRESSION = os.environ.get('ANALYTICS_ARCHIVE_COMPRESSION', 'zstd')
+
+# Contact engagement columns maintained from opens/clicks (see contacts_api/engagement.py).
+# The score halves every HALF_LIFE_DAYS; recent_*_count covers the last WINDOW_DAYS.
+# Run `python manage.py rebuild_contact_engagement` after changing any of these.
+CONTACT_ENGAGEMENT_HALF_LIFE_DAYS = float(os.environ.get('CONTACT_ENGAGEMENT_HALF_LIFE_DAYS', '30'))
+CONTACT_ENGAGEMENT_WINDOW_DAYS = int(os.environ.get('CONTACT_ENGAGEMENT_WINDOW_DAYS', '90'))
+CONTACT_ENGAGEMENT_OPEN_WEIGHT = float(os.environ.get('CONTACT_ENGAGEMENT_OPEN_WEIGHT', '1.0'))
+CONTACT_ENGAGEMENT_CLICK_WEIGHT = float(os.environ.get('CONTACT_ENGAGEMENT_CLICK_WEIGHT', '3.0'))
+
+# Contact uploads run as background ImportJobs (see contacts_api/importer.py): the file is stored in
+# CONTACT_IMPORT_DIR, read CHUNK_SIZE rows at a time, and new contacts are inserted with bulk_create in
+# batches of BATCH_SIZE. At most MAX_ERRORS per-row errors are kept on the job.
+CONTACT_IMPORT_BATCH_SIZE = int(os.environ.get('CONTACT_IMPORT_BATCH_SIZE', '1000'))
+CONTACT_IMPORT_CHUNK_SIZE = int(os.environ.get('CONTACT_IMPORT_CHUNK_SIZE', '10000'))
+CONTACT_IMPORT_MAX_ERRORS = int(os.environ.get('CONTACT_IMPORT_MAX_ERRORS', '1000'))
+CONTACT_IMPORT_DIR = os.environ.get('CONTACT_IMPORT_DIR', str(BASE_DIR / 'contact_imports'))
+
+# Materialized contact segments (see contacts_api/segments.py) are refreshed by diff, inserting new
+# members in batches of SEGMENT_REFRESH_BATCH_SIZE. Schedule the `refresh_segments` task (e.g. hourly)
+# so rules relative to now (within_days, engagement_score) stay current.
+SEGMENT_REFRESH_BATCH_SIZE = int(os.environ.get('SEGMENT_REFRESH_BATCH_SIZE', '5000'))
+
+# Promoted custom_fields keys (see contacts_api/custom_field_index.py) are backfilled into their typed,
+# indexed side table CUSTOM_FIELD_INDEX_BATCH_SIZE rows at a time.
+CUSTOM_FIELD_INDEX_BATCH_SIZE = int(os.environ.get('CUSTOM_FIELD_INDEX_BATCH_SIZE', '5000'))
+
+# Bulk contact update/delete (see contacts_api/bulk.py): up to CONTACT_BULK_INLINE_LIMIT contacts run in the
+# request, larger requests become a background ContactBulkJob. Either way contacts are written CHUNK_SIZE per statement.
+CONTACT_BULK_INLINE_LIMIT = int(os.environ.get('CONTACT_BULK_INLINE_LIMIT', '5000'))
+CONTACT_BULK_CHUNK_SIZE = int(os.environ.get('CONTACT_BULK_CHUNK_SIZE', '5000'))
+
+# Duplicate contact merge (see contacts_api/dedup.py): clusters of duplicates merged per transaction.
+CONTACT_DEDUP_BATCH_SIZE = int(os.environ.get('CONTACT_DEDUP_BATCH_SIZE', '500'))
+
+# Offline email validation (see contacts_api/email_validation.py). send_campaign_task leaves out contacts whose
+# email_status is in EMAIL_VALIDATION_SKIP_STATUSES (comma-separated; add 'risky' to also skip disposable, role and
+# likely-typo addresses). EMAIL_DISPOSABLE_DOMAINS_FILE optionally extends the built-in disposable list, one per line.
+EMAIL_VALIDATION_SKIP_STATUSES = [s.strip() for s in os.environ.get('EMAIL_VALIDATION_SKIP_STATUSES', 'invalid').split(',') if s.strip()]
+EMAIL_VALIDATION_BATCH_SIZE = int(os.environ.get('EMAIL_VALIDATION_BATCH_SIZE', '5000'))
+EMAIL_DISPOSABLE_DOMAINS_FILE = os.environ.get('EMAIL_DISPOSABLE_DOMAINS_FILE') or None
+
+# List endpoints (contacts, campaigns, templates, import jobs) page with a `?cursor=` keyset on
+# (created_at, id) (see myproject/pagination.py). Clients may ask for `?page_size=` up to API_MAX_PAGE_SIZE.
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', '50'))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', '500'))
+
+# How AsyncSESWebhookView hands verified events to ingestion: 'inline' (sync_to_async in-process)
+# or 'celery' (enqueue ingest_ses_event_task and return immediately).
+SES_WEBHOOK_ASYNC_INGESTION = os.environ.get('SES_WEBHOOK_ASYNC_INGESTION', 'inline')
+
+# SES event ingestion via SQS (pull mode, alternative to the SNS HTTP webhook)
+# Run `python manage.py consume_ses_events` or schedule the `poll_ses_event_queue` task with Celery beat.
+# AWS_SQS_ENDPOINT_URL can point at a local stand-in such as moto_server or localstack.
+SES_EVENTS_SQS_QUEUE_URL = os.environ.get('SES_EVENTS_SQS_QUEUE_URL', '')
+AWS_SQS_ENDPOINT_URL = os.environ.get('AWS_SQS_ENDPOINT_URL', '')
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import EmailTemplate
+from .models import EmailTemplate, TemplateLink
 
 @admin.register(EmailTemplate)
 class EmailTemplateAdmin(admin.ModelAdmin):
@@ -32,3 +32,10 @@ class EmailTemplateAdmin(admin.ModelAdmin):
         if obj: # Editing an existing object
             return self.readonly_fields + ('owner',) # Make owner readonly after creation
         return self.readonly_fields
+
+
+@admin.register(TemplateLink)
+class TemplateLinkAdmin(admin.ModelAdmin):
+    list_display = ('id', 'template', 'url', 'created_at')
+    search_fields = ('url', 'template__name')
+    readonly_fields = ('template', 'url', 'url_hash', 'created_at')
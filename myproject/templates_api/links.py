@@ -0,0 +1,54 @@
+"""
+Tracked links of an email template.
+
+Every http(s) href in a template's HTML becomes a TemplateLink row with a stable id, so click
+events can reference an integer link id instead of a URL string buried in the SES payload.
+Rows are only ever added: when a template is edited, links that disappear keep their id
+and the clicks already recorded against them.
+"""
+import hashlib
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+
+class _LinkExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.urls = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag.lower() in ('a', 'area'):
+            href = dict(attrs).get('href')
+            if href:
+                self.urls.append(href.strip())
+
+
+def url_hash(url):
+    """Fixed-width key for a URL; URLs can exceed what a unique index accepts."""
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def is_trackable(url):
+    # Personalised URLs ({{ ... }}) render differently for every contact, so there is nothing stable to track.
+    if not url or '{{' in url or '{%' in url:
+        return False
+    return urlparse(url).scheme in ('http', 'https')
+
+
+def extract_links(html):
+    """Trackable hrefs in document order, without duplicates."""
+    parser = _LinkExtractor()
+    parser.feed(html or '')
+    parser.close()
+    return [url for url in dict.fromkeys(parser.urls) if is_trackable(url)]
+
+
+def sync_template_links(template):
+    """Adds a TemplateLink for every new URL in the template. Returns the number of links created."""
+    from .models import TemplateLink
+    urls = extract_links(template.body_html)
+    known = set(TemplateLink.objects.filter(template=template).values_list('url_hash', flat=True))
+    new_links = [TemplateLink(template=template, url=url, url_hash=url_hash(url))
+                 for url in urls if url_hash(url) not in known]
+    TemplateLink.objects.bulk_create(new_links, ignore_conflicts=True) # Concurrent saves may race on the same URL
+    return len(new_links)
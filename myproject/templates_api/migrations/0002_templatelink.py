@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def extract_existing_links(apps, schema_editor):
+    from templates_api.links import extract_links, url_hash
+    EmailTemplate = apps.get_model('templates_api', 'EmailTemplate')
+    TemplateLink = apps.get_model('templates_api', 'TemplateLink')
+    for template in EmailTemplate.objects.only('id', 'body_html').iterator():
+        TemplateLink.objects.bulk_create(
+            [TemplateLink(template_id=template.id, url=url, url_hash=url_hash(url)) for url in extract_links(template.body_html)],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TemplateLink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.CharField(max_length=2048)),
+                ('url_hash', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='links', to='templates_api.emailtemplate')),
+            ],
+            options={
+                'verbose_name': 'Template Link',
+                'verbose_name_plural': 'Template Links',
+                'ordering': ['id'],
+                'unique_together': {('template', 'url_hash')},
+            },
+        ),
+        migrations.RunPython(extract_existing_links, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates_api', '0002_templatelink'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emailtemplate',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='templates_a_owner_i_647319_idx'),
+        ),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from .links import sync_template_links
+
 class EmailTemplate(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='email_templates')
     name = models.CharField(max_length=255)
@@ -16,5 +18,32 @@ class EmailTemplate(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = [['owner', 'name']] # Template name should be unique per owner
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id']), # Keyset pagination of the list endpoint
+        ]
         verbose_name = "Email Template"
         verbose_name_plural = "Email Templates"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        sync_template_links(self) # Keep the tracked link table in step with body_html
+
+
+class TemplateLink(models.Model):
+    """
+    A trackable URL found in a template's HTML (templates_api/links.py). Click events
+    reference these ids; rows are never removed when the template changes.
+    """
+    template = models.ForeignKey(EmailTemplate, on_delete=models.CASCADE, related_name='links')
+    url = models.CharField(max_length=2048)
+    url_hash = models.CharField(max_length=64) # sha256 of url, for the unique lookup
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [['template', 'url_hash']]
+        ordering = ['id']
+        verbose_name = "Template Link"
+        verbose_name_plural = "Template Links"
+
+    def __str__(self):
+        return f"{self.template_id}: {self.url}"
@@ -1,6 +1,7 @@
 from rest_framework import viewsets, permissions
 from .models import EmailTemplate
 from .serializers import EmailTemplateSerializer
+from myproject.pagination import CreatedAtCursorPagination
 
 class EmailTemplateViewSet(viewsets.ModelViewSet):
     """
@@ -8,6 +9,7 @@ class EmailTemplateViewSet(viewsets.ModelViewSet):
     """
     serializer_class = EmailTemplateSerializer
     permission_classes = [permissions.IsAuthenticated] # Only authenticated users can access
+    pagination_class = CreatedAtCursorPagination # ?cursor= keyset pages on (created_at, id)
 
     def get_queryset(self):
         """